@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+import threading
+import dataclasses
+from typing import Optional, List, Dict, Set, Tuple, Iterator
+
+from WebsiteChangesDetector import WebsiteRevisions, RevisionInfo, text_digest
+from RSSEntryDetector import RSSEntries, FeedValidators, FeedHighWaterMark, PendingEntry
+from TargetSchedules import TargetSchedules, TargetSchedule, TargetCheck
+from WebSub import WebSubSubscriptions, WebSubSubscription, subscription_id
+
+_MAX_PARAMETERS = 500
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    selector TEXT NOT NULL,
+    text TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    fingerprint TEXT,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revisions_target ON revisions (target_key, id);
+CREATE TABLE IF NOT EXISTS rss_entries (
+    feed_key TEXT NOT NULL,
+    entry_key TEXT NOT NULL,
+    checked_at INTEGER NOT NULL,
+    PRIMARY KEY (feed_key, entry_key)
+);
+CREATE TABLE IF NOT EXISTS rss_feeds (
+    feed_key TEXT PRIMARY KEY,
+    validators TEXT,
+    high_water_mark TEXT
+);
+CREATE TABLE IF NOT EXISTS rss_pending_entries (
+    feed_key TEXT PRIMARY KEY,
+    entries TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    target_id TEXT PRIMARY KEY,
+    schedule TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule_checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target_id TEXT NOT NULL,
+    checked_at INTEGER NOT NULL,
+    changed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS websub_subscriptions (
+    subscription_id TEXT PRIMARY KEY,
+    subscription TEXT NOT NULL,
+    token TEXT
+);
+'''
+_MIGRATIONS = [
+    ('websub_subscriptions', 'token', 'ALTER TABLE websub_subscriptions ADD COLUMN token TEXT'),
+]
+_INDEXES = '''
+CREATE UNIQUE INDEX IF NOT EXISTS websub_subscriptions_token ON websub_subscriptions (token);
+'''
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class SQLiteStore:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        for table, column, sql in _MIGRATIONS:
+            if column not in {r[1] for r in self._connection.execute(f'PRAGMA table_info({table})')}:
+                self._connection.execute(sql)
+        self._connection.executescript(_INDEXES)
+
+    def execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                yield self._connection
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+
+    def execute_many(self, sql: str, params: List[tuple]):
+        with self.transaction() as connection:
+            connection.executemany(sql, params)
+
+    def insert(self, sql: str, params: tuple = ()) -> Optional[int]:
+        with self._lock:
+            return self._connection.execute(sql, params).lastrowid
+
+
+class WebsiteRevisionsOnSQLite(WebsiteRevisions):
+    def __init__(self, store: SQLiteStore):
+        self._store = store
+
+    @staticmethod
+    def _target_key(url: str, selector: str) -> str:
+        return _sha256(f'{url}::{selector}')
+
+    def get(self, url: str, selector: str) -> Optional[str]:
+        rows = self._store.execute(
+            'SELECT text FROM revisions WHERE target_key = ? ORDER BY id DESC LIMIT 1',
+            (WebsiteRevisionsOnSQLite._target_key(url, selector),))
+        return rows[0][0] if rows else None
+
+    def get_info(self, url: str, selector: str) -> Optional[RevisionInfo]:
+        rows = self._store.execute(
+            'SELECT id, digest, fingerprint FROM revisions WHERE target_key = ? ORDER BY id DESC LIMIT 1',
+            (WebsiteRevisionsOnSQLite._target_key(url, selector),))
+        if not rows:
+            return None
+        revision_id, digest, fingerprint = rows[0]
+        return RevisionInfo(digest, int(fingerprint, 16) if fingerprint is not None else None, str(revision_id))
+
+    def revision_key(self, url: str, selector: str) -> Optional[str]:
+        return WebsiteRevisionsOnSQLite._target_key(url, selector)
+
+    def list_revisions(self, url: str, selector: str) -> List[Tuple[int, int, str]]:
+        return self._store.execute(
+            'SELECT id, created_at, digest FROM revisions WHERE target_key = ? ORDER BY id',
+            (WebsiteRevisionsOnSQLite._target_key(url, selector),))
+
+    def get_revision(self, url: str, selector: str, revision: int) -> Optional[str]:
+        return self.read_revision(WebsiteRevisionsOnSQLite._target_key(url, selector), str(revision))
+
+    def read_revision(self, revision_key: str, version: str) -> Optional[str]:
+        rows = self._store.execute(
+            'SELECT text FROM revisions WHERE target_key = ? AND id = ?', (revision_key, int(version)))
+        return rows[0][0] if rows else None
+
+    def update(
+        self,
+        url: str,
+        selector: str,
+        selected_source: str,
+        digest: Optional[str] = None,
+        fingerprint: Optional[int] = None
+    ) -> Optional[str]:
+        revision_id = self._store.insert(
+            'INSERT INTO revisions (target_key, url, selector, text, digest, fingerprint, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                WebsiteRevisionsOnSQLite._target_key(url, selector),
+                url,
+                selector,
+                selected_source,
+                digest or text_digest(selected_source),
+                f'{fingerprint:016x}' if fingerprint is not None else None,
+                int(time.time()),
+            ))
+        return str(revision_id)
+
+
+class RSSEntriesOnSQLite(RSSEntries):
+    def __init__(self, store: SQLiteStore):
+        self._store = store
+
+    @staticmethod
+    def _entry_key(entry_url: Optional[str]) -> str:
+        return _sha256(entry_url) if entry_url else ''
+
+    def has_checked(self, feed_url: str, entry_url: Optional[str] = None) -> bool:
+        return self._has_keys(feed_url, [RSSEntriesOnSQLite._entry_key(entry_url)])[0]
+
+    def has_checked_many(self, feed_url: str, entry_urls: List[str]) -> List[bool]:
+        return self._has_keys(feed_url, [RSSEntriesOnSQLite._entry_key(u) for u in entry_urls])
+
+    def _has_keys(self, feed_url: str, keys: List[str]) -> List[bool]:
+        if not keys:
+            return []
+        found: Set[str] = set()
+        for i in range(0, len(keys), _MAX_PARAMETERS):
+            chunk = keys[i:i + _MAX_PARAMETERS]
+            rows = self._store.execute(
+                f'SELECT entry_key FROM rss_entries WHERE feed_key = ? AND entry_key IN ({",".join("?" * len(chunk))})',
+                (_sha256(feed_url), *chunk))
+            found.update(r[0] for r in rows)
+        return [k in found for k in keys]
+
+    def check(self, feed_url: str, entry_url: Optional[str]):
+        self.check_many(feed_url, [entry_url] if entry_url else [])
+
+    def check_many(self, feed_url: str, entry_urls: List[str]):
+        now = int(time.time())
+        feed_key = _sha256(feed_url)
+        params = [(feed_key, '', now)]
+        params.extend((feed_key, RSSEntriesOnSQLite._entry_key(u), now) for u in entry_urls if u)
+        self._store.execute_many(
+            'INSERT OR REPLACE INTO rss_entries (feed_key, entry_key, checked_at) VALUES (?, ?, ?)', params)
+
+    def _feed_column(self, feed_url: str, column: str) -> Optional[dict]:
+        rows = self._store.execute(f'SELECT {column} FROM rss_feeds WHERE feed_key = ?', (_sha256(feed_url),))
+        if not rows or rows[0][0] is None:
+            return None
+        return json.loads(rows[0][0])
+
+    def _put_feed_column(self, feed_url: str, column: str, value: dict):
+        feed_key = _sha256(feed_url)
+        self._store.execute('INSERT OR IGNORE INTO rss_feeds (feed_key) VALUES (?)', (feed_key,))
+        self._store.execute(f'UPDATE rss_feeds SET {column} = ? WHERE feed_key = ?', (json.dumps(value), feed_key))
+
+    def get_validators(self, feed_url: str) -> Optional[FeedValidators]:
+        dic = self._feed_column(feed_url, 'validators')
+        return FeedValidators(**dic) if dic is not None else None
+
+    def put_validators(self, feed_url: str, validators: FeedValidators):
+        self._put_feed_column(feed_url, 'validators', dataclasses.asdict(validators))
+
+    def get_high_water_mark(self, feed_url: str) -> Optional[FeedHighWaterMark]:
+        dic = self._feed_column(feed_url, 'high_water_mark')
+        return FeedHighWaterMark(**dic) if dic is not None else None
+
+    def put_high_water_mark(self, feed_url: str, high_water_mark: FeedHighWaterMark):
+        self._put_feed_column(feed_url, 'high_water_mark', dataclasses.asdict(high_water_mark))
+
+    def get_pending_entries(self, feed_url: str) -> List[PendingEntry]:
+        rows = self._store.execute('SELECT entries FROM rss_pending_entries WHERE feed_key = ?', (_sha256(feed_url),))
+        return [PendingEntry.from_dict(p) for p in json.loads(rows[0][0])] if rows else []
+
+    def put_pending_entries(self, feed_url: str, entries: List[PendingEntry]):
+        if not entries:
+            self._store.execute('DELETE FROM rss_pending_entries WHERE feed_key = ?', (_sha256(feed_url),))
+            return
+        self._store.execute(
+            'INSERT OR REPLACE INTO rss_pending_entries (feed_key, entries) VALUES (?, ?)',
+            (_sha256(feed_url), json.dumps([dataclasses.asdict(p) for p in entries])))
+
+
+class TargetSchedulesOnSQLite(TargetSchedules):
+    def __init__(self, store: SQLiteStore):
+        self._store = store
+
+    def report(self, target_id: str, changed: bool):
+        self._store.insert(
+            'INSERT INTO schedule_checks (target_id, checked_at, changed) VALUES (?, ?, ?)',
+            (target_id, int(time.time()), int(changed)))
+
+    def checks(self) -> List[TargetCheck]:
+        rows = self._store.execute('SELECT id, target_id, checked_at, changed FROM schedule_checks ORDER BY checked_at')
+        return [TargetCheck(target_id, checked_at, changed == 1, str(i)) for i, target_id, checked_at, changed in rows]
+
+    def delete_checks(self, checks: List[TargetCheck]):
+        self._store.execute_many('DELETE FROM schedule_checks WHERE id = ?', [(int(c.object_key),) for c in checks])
+
+    def load(self) -> Dict[str, TargetSchedule]:
+        rows = self._store.execute('SELECT target_id, schedule FROM schedules')
+        return {target_id: TargetSchedule(**json.loads(schedule)) for target_id, schedule in rows}
+
+    def save(self, schedules: Dict[str, TargetSchedule]):
+        with self._store.transaction() as connection:
+            connection.execute('DELETE FROM schedules')
+            connection.executemany(
+                'INSERT INTO schedules (target_id, schedule) VALUES (?, ?)',
+                [(k, json.dumps(dataclasses.asdict(v))) for k, v in schedules.items()])
+
+
+class WebSubSubscriptionsOnSQLite(WebSubSubscriptions):
+    def __init__(self, store: SQLiteStore):
+        self._store = store
+
+    def get(self, feed_url: str) -> Optional[WebSubSubscription]:
+        rows = self._store.execute(
+            'SELECT subscription FROM websub_subscriptions WHERE subscription_id = ?', (subscription_id(feed_url),))
+        return WebSubSubscription(**json.loads(rows[0][0])) if rows else None
+
+    def get_by_token(self, token: str) -> Optional[WebSubSubscription]:
+        if not token:
+            return None
+        rows = self._store.execute('SELECT subscription FROM websub_subscriptions WHERE token = ?', (token,))
+        return WebSubSubscription(**json.loads(rows[0][0])) if rows else None
+
+    def put(self, subscription: WebSubSubscription):
+        self._store.execute(
+            'INSERT OR REPLACE INTO websub_subscriptions (subscription_id, subscription, token) VALUES (?, ?, ?)',
+            (subscription.subscription_id, json.dumps(dataclasses.asdict(subscription)), subscription.token or None))
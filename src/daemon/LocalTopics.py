@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import uuid
+import threading
+from typing import Callable, Dict
+
+Subscriber = Callable[[str, str], None]
+
+
+class LocalTopics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Subscriber] = {}
+
+    def subscribe(self, topic: str, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers[topic] = subscriber
+
+    def publish(self, TopicArn: str, Message: str, **_) -> dict:
+        with self._lock:
+            subscriber = self._subscribers.get(TopicArn)
+        if subscriber is None:
+            raise ValueError(f'no subscriber for topic: {TopicArn}')
+        message_id = str(uuid.uuid4())
+        subscriber(message_id, Message)
+        return {'MessageId': message_id}
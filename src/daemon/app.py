@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import logging
+import argparse
+import threading
+import dataclasses
+from pathlib import Path
+from typing import Optional, List
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SRC = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(SRC / p) for p in (
+    'layers/pip_modules/python',
+    'layers/browser_kit/python',
+    'detect_website_changes',
+    'detect_rss_entry',
+    'handle_events',
+    'task_scheduler',
+    'websub_callback',
+    'daemon',
+)]
+
+TOPIC_DETECT_WEBSITE_CHANGES = 'local:detect-website-changes'
+TOPIC_DETECT_RSS_ENTRY = 'local:detect-rss-entry'
+TOPIC_HANDLE_EVENTS = 'local:handle-events'
+TOPIC_TWEET = 'local:tweet'
+
+import yaml
+
+from WebMonitorConfig import WebMonitorConfig
+from WebMonitor import DetectWebsiteChangesEvent, DetectRSSEntryEvent
+from MessageEnvelope import unwrap
+from BrowserManager import BrowserManager
+from PageFetcher import PageFetcher, FETCH_MODE_STATIC, FETCH_MODE_BROWSER
+from WaitStrategies import Deadline
+from WebsiteChangesDetector import WebsiteChangesDetector
+from RSSEntryDetector import RSSNewEntryDetector, RelatedRSSEntryDetector, match_stages, STAGE_BROWSER
+from WebSub import WebSubSubscriber
+from LocalStorage import SQLiteStore, WebsiteRevisionsOnSQLite, RSSEntriesOnSQLite, TargetSchedulesOnSQLite
+from LocalStorage import WebSubSubscriptionsOnSQLite
+from LocalTopics import LocalTopics
+import TaskScheduler as task_scheduler
+import WebsiteChangesHandler as detect_website_changes
+import RSSEntryHandler as detect_rss_entry
+import EventsHandler as handle_events
+import WebSubCallback as websub_callback
+
+
+def needs_browser(topic: str, message: dict) -> bool:
+    fetch_mode = message.get('fetch_mode', FETCH_MODE_BROWSER)
+    if topic == TOPIC_DETECT_RSS_ENTRY:
+        return STAGE_BROWSER in match_stages(message.get('match_stages'), fetch_mode)
+    return fetch_mode != FETCH_MODE_STATIC
+
+
+@dataclasses.dataclass(frozen=True)
+class WorkItem:
+    topic: str
+    message_id: str
+    body: str
+    attempts: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class DaemonConfig:
+    config_path: str
+    data_dir: str
+    interval: int = 20 * 60
+    browser_workers: int = 1
+    workers: int = 8
+    notification_window: float = 60.0
+    notification_batch_size: int = 100
+    timeout: float = 120.0
+    max_attempts: int = 3
+    once: bool = False
+    websub_listen: Optional[str] = None
+    websub_callback_url: Optional[str] = None
+
+
+class LocalMonitorConfig:
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._config: Optional[WebMonitorConfig] = None
+
+    def current(self) -> WebMonitorConfig:
+        with self._lock:
+            version = str(os.stat(self._path).st_mtime_ns)
+            if self._config is None or self._config.version != version:
+                with open(self._path, encoding='utf-8') as f:
+                    self._config = WebMonitorConfig(yaml.safe_load(f) or {}, version)
+            return self._config
+
+
+class Daemon:
+    def __init__(self, config: DaemonConfig, logger: logging.Logger):
+        self._config = config
+        self._logger = logger
+        self._monitor_config = LocalMonitorConfig(config.config_path)
+        os.makedirs(config.data_dir, exist_ok=True)
+        store = SQLiteStore(os.path.join(config.data_dir, 'web-monitor.sqlite3'))
+        self._revisions = WebsiteRevisionsOnSQLite(store)
+        self._entries = RSSEntriesOnSQLite(store)
+        self._schedules = TargetSchedulesOnSQLite(store)
+        self._subscriptions = WebSubSubscriptionsOnSQLite(store)
+        self._websub: Optional[WebSubSubscriber] = None
+        if config.websub_listen:
+            callback_url = config.websub_callback_url or f'http://{config.websub_listen}/websub'
+            self._websub = WebSubSubscriber(self._subscriptions, callback_url, logger)
+        self._notifications_path = os.path.join(config.data_dir, 'notifications.jsonl')
+        self._notifications_lock = threading.Lock()
+        self._browser_queue: queue.Queue = queue.Queue()
+        self._static_queue: queue.Queue = queue.Queue()
+        self._events_queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._topics = LocalTopics()
+        self._topics.subscribe(TOPIC_DETECT_WEBSITE_CHANGES, self._router(TOPIC_DETECT_WEBSITE_CHANGES))
+        self._topics.subscribe(TOPIC_DETECT_RSS_ENTRY, self._router(TOPIC_DETECT_RSS_ENTRY))
+        self._topics.subscribe(
+            TOPIC_HANDLE_EVENTS, lambda message_id, body: self._events_queue.put(
+                WorkItem(TOPIC_HANDLE_EVENTS, message_id, body)))
+        self._topics.subscribe(TOPIC_TWEET, self._write_notification)
+
+    def _router(self, topic: str):
+        def route(message_id: str, body: str):
+            q = self._browser_queue if needs_browser(topic, unwrap(json.loads(body))) else self._static_queue
+            q.put(WorkItem(topic, message_id, body))
+
+        return route
+
+    def _write_notification(self, message_id: str, body: str):
+        with self._notifications_lock:
+            with open(self._notifications_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'message_id': message_id, 'message': json.loads(body)}, ensure_ascii=False) + '\n')
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:daemon:notification',
+            'details': {'message_id': message_id, 'message': json.loads(body)}
+        }, ensure_ascii=False))
+
+    def _context(self):
+        ctx = self._local
+        if not hasattr(ctx, 'fetcher'):
+            ctx.browser = BrowserManager(logger=self._logger)
+            ctx.fetcher = PageFetcher(ctx.browser)
+            ctx.website_detector = WebsiteChangesDetector(ctx.fetcher, self._revisions)
+            ctx.new_entry_detector = RSSNewEntryDetector(self._entries)
+            ctx.related_entry_detector = RelatedRSSEntryDetector(ctx.fetcher)
+        return ctx
+
+    def _detect(self, item: WorkItem):
+        ctx = self._context()
+        message = unwrap(json.loads(item.body))
+        deadline = Deadline.after(self._config.timeout)
+        if item.topic == TOPIC_DETECT_WEBSITE_CHANGES:
+            site = DetectWebsiteChangesEvent.from_message(message)
+            if site is None:
+                raise ValueError(f'invalid message: {item.message_id}')
+            site_config = detect_website_changes.DetectWebsiteChangesConfig(
+                self._topics, TOPIC_HANDLE_EVENTS, self._logger, self._schedules)
+            detect_website_changes.handle(site, ctx.website_detector, site_config, deadline)
+        else:
+            rss = DetectRSSEntryEvent.from_message(message)
+            if rss is None:
+                raise ValueError(f'invalid message: {item.message_id}')
+            rss_config = detect_rss_entry.DetectRSSEntryConfig(
+                self._topics, TOPIC_HANDLE_EVENTS, self._logger, self._schedules, None, self._websub)
+            detect_rss_entry.handle(rss, ctx.new_entry_detector, ctx.related_entry_detector, rss_config, deadline)
+
+    def _retry(self, q: queue.Queue, item: WorkItem, error: Exception):
+        self._logger.exception(json.dumps({
+            'event': 'web-monitor:daemon:error',
+            'details': {
+                'topic': item.topic,
+                'message_id': item.message_id,
+                'attempts': item.attempts + 1,
+                'error': repr(error),
+            }
+        }, ensure_ascii=False))
+        if item.attempts + 1 < self._config.max_attempts:
+            q.put(dataclasses.replace(item, attempts=item.attempts + 1))
+
+    def _detector_worker(self, q: queue.Queue):
+        try:
+            while True:
+                item = q.get()
+                try:
+                    if item is None:
+                        return
+                    if not self._stop.is_set():
+                        self._detect(item)
+                except Exception as e:
+                    self._retry(q, item, e)
+                finally:
+                    q.task_done()
+        finally:
+            if hasattr(self._local, 'browser'):
+                self._local.browser.close()
+
+    def _take_batch(self) -> List[WorkItem]:
+        try:
+            batch = [self._events_queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        window_ends = time.monotonic() + self._config.notification_window
+        while len(batch) < self._config.notification_batch_size:
+            remaining = window_ends - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._events_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _notification_worker(self):
+        handle_config = handle_events.HandleEventsConfig(self._topics, TOPIC_TWEET, self._logger)
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if not batch:
+                continue
+            event = {'Records': [
+                {'messageId': i.message_id, 'body': i.body, 'eventSource': 'aws:sqs'} for i in batch
+            ]}
+            try:
+                result = handle_events.handle(event, self._monitor_config.current(), handle_config)
+                failed = {f['itemIdentifier'] for f in result['batchItemFailures']}
+                for item in batch:
+                    if item.message_id in failed:
+                        self._retry(self._events_queue, item, RuntimeError('notification failed'))
+            except Exception as e:
+                for item in batch:
+                    self._retry(self._events_queue, item, e)
+            finally:
+                for _ in batch:
+                    self._events_queue.task_done()
+
+    def schedule(self):
+        task_config = task_scheduler.TaskSchedulerConfig(
+            self._topics, TOPIC_DETECT_WEBSITE_CHANGES, TOPIC_DETECT_RSS_ENTRY, self._logger, self._schedules, None,
+            self._subscriptions if self._websub is not None else None)
+        task_scheduler.handle(self._monitor_config.current(), task_config)
+
+    def _callback_server(self, listen: str) -> ThreadingHTTPServer:
+        monitor_config = self._monitor_config
+        callback_config = websub_callback.WebSubCallbackConfig(
+            self._topics, TOPIC_DETECT_RSS_ENTRY, self._subscriptions, self._logger)
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip('/').split('/')
+                if len(parts) != 2 or parts[0] != 'websub':
+                    self.send_error(404)
+                    return
+                request = websub_callback.CallbackRequest(
+                    method=self.command,
+                    token=parts[1],
+                    query=dict(parse_qsl(url.query)),
+                    headers={k.lower(): v for k, v in self.headers.items()},
+                    body=self.rfile.read(int(self.headers.get('Content-Length') or 0)),
+                )
+                response = websub_callback.handle(request, monitor_config.current(), callback_config)
+                body = response.body.encode('utf-8')
+                self.send_response(response.status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *_):
+                pass
+
+        host, port = listen.rsplit(':', 1)
+        return ThreadingHTTPServer((host, int(port)), CallbackHandler)
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self):
+        threads = [threading.Thread(target=self._notification_worker, daemon=True)]
+        server = None
+        if self._config.websub_listen:
+            server = self._callback_server(self._config.websub_listen)
+            threads.append(threading.Thread(target=server.serve_forever, daemon=True))
+        detectors = [
+            threading.Thread(target=self._detector_worker, args=(self._browser_queue,), daemon=True)
+            for _ in range(self._config.browser_workers)
+        ] + [
+            threading.Thread(target=self._detector_worker, args=(self._static_queue,), daemon=True)
+            for _ in range(self._config.workers)
+        ]
+        for t in threads + detectors:
+            t.start()
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.schedule()
+            except Exception as e:
+                self._logger.exception(json.dumps({
+                    'event': 'web-monitor:daemon:schedule:error',
+                    'details': {'error': repr(e)}
+                }, ensure_ascii=False))
+            if self._config.once:
+                self._browser_queue.join()
+                self._static_queue.join()
+                self._events_queue.join()
+                break
+            self._stop.wait(max(0.0, self._config.interval - (time.monotonic() - started)))
+        self._stop.set()
+        if server is not None:
+            server.shutdown()
+        for _ in range(self._config.browser_workers):
+            self._browser_queue.put(None)
+        for _ in range(self._config.workers):
+            self._static_queue.put(None)
+        for t in detectors:
+            t.join()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='website-monitor')
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run', help='run the whole pipeline in a single process')
+    run.add_argument('--config', required=True, help='path to the monitor config YAML')
+    run.add_argument('--data-dir', default='.website-monitor', help='directory for the SQLite store and notifications')
+    run.add_argument('--interval', type=int, default=20 * 60, help='seconds between scheduler runs')
+    run.add_argument('--browser-workers', type=int, default=1)
+    run.add_argument('--workers', type=int, default=8, help='workers for static (non-browser) fetches')
+    run.add_argument('--notification-window', type=float, default=60.0)
+    run.add_argument('--notification-batch-size', type=int, default=100)
+    run.add_argument('--timeout', type=float, default=120.0, help='per-target detection timeout in seconds')
+    run.add_argument('--once', action='store_true', help='run one scheduler pass, drain the queues and exit')
+    run.add_argument('--websub-listen', help='HOST:PORT to serve WebSub callbacks on; enables WebSub subscriptions')
+    run.add_argument('--websub-callback-url', help='public base URL of the callback server, if not HOST:PORT')
+    args = parser.parse_args(argv)
+    if args.command != 'run':
+        parser.print_help()
+        return 2
+
+    logger = logging.getLogger('website-monitor')
+    handler = logging.StreamHandler()
+    logger.setLevel(logging.INFO)
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    daemon = Daemon(DaemonConfig(
+        config_path=args.config,
+        data_dir=args.data_dir,
+        interval=args.interval,
+        browser_workers=args.browser_workers,
+        workers=args.workers,
+        notification_window=args.notification_window,
+        notification_batch_size=args.notification_batch_size,
+        timeout=args.timeout,
+        once=args.once,
+        websub_listen=args.websub_listen,
+        websub_callback_url=args.websub_callback_url,
+    ), logger)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
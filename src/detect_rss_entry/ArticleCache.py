@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import time
+import hashlib
+import dataclasses
+
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Sequence
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from botocore.exceptions import ClientError
+
+_TRACKING_PARAMETERS = ('fbclid', 'gclid', 'yclid', 'mc_cid', 'mc_eid')
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in _TRACKING_PARAMETERS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+def evaluation_scope(selector: str, keywords: List[str], stages: Sequence[str]) -> str:
+    scope = json.dumps([selector, sorted(set(keywords)), list(stages)], ensure_ascii=False)
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class ArticleEvaluation:
+    url: str
+    feed_url: str
+    matched_keyword: Optional[str]
+    evaluated_at: int
+    matched_stage: Optional[str] = None
+    scope: str = ''
+
+
+class ArticleCache:
+    def __init__(self, s3_bucket, ttl_seconds: int = 7 * 24 * 60 * 60, max_items: int = 256):
+        self._bucket = s3_bucket
+        self._ttl_seconds = ttl_seconds
+        self._max_items = max_items
+        self._texts: OrderedDict[str, Tuple[int, str]] = OrderedDict()
+
+    @staticmethod
+    def _text_key(url: str, selector: str, stage: str) -> str:
+        return hashlib.sha256(f'{canonical_url(url)}::{selector}::{stage}'.encode()).hexdigest()
+
+    @staticmethod
+    def _evaluation_key(url: str, scope: str) -> str:
+        return 'articles/evaluated/' + hashlib.sha256(f'{canonical_url(url)}::{scope}'.encode()).hexdigest()
+
+    def _get_json(self, object_key: str) -> Optional[dict]:
+        try:
+            res = self._bucket.Object(object_key).get()
+            return json.loads(res['Body'].read().decode('utf-8'))
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return None
+
+    def _put_json(self, object_key: str, dic: dict):
+        self._bucket.Object(object_key).put(
+            Body=json.dumps(dic, ensure_ascii=False).encode('utf-8'),
+            ContentEncoding='utf-8',
+            ContentType='application/json'
+        )
+
+    def _is_fresh(self, cached_at: int) -> bool:
+        return int(time.time()) - cached_at < self._ttl_seconds
+
+    def _remember(self, key: str, cached_at: int, text: str):
+        self._texts[key] = (cached_at, text)
+        self._texts.move_to_end(key)
+        while len(self._texts) > self._max_items:
+            self._texts.popitem(last=False)
+
+    def get_text(self, url: str, selector: str, stage: str) -> Optional[str]:
+        key = ArticleCache._text_key(url, selector, stage)
+        cached = self._texts.get(key)
+        if cached is not None and self._is_fresh(cached[0]):
+            self._texts.move_to_end(key)
+            return cached[1]
+        dic = self._get_json('articles/text/' + key)
+        if dic is None or not self._is_fresh(dic['cached_at']):
+            return None
+        self._remember(key, dic['cached_at'], dic['text'])
+        return dic['text']
+
+    def put_text(self, url: str, selector: str, stage: str, text: str):
+        key = ArticleCache._text_key(url, selector, stage)
+        cached_at = int(time.time())
+        self._remember(key, cached_at, text)
+        self._put_json('articles/text/' + key, {'url': url, 'cached_at': cached_at, 'text': text})
+
+    def get_evaluation(self, url: str, scope: str) -> Optional[ArticleEvaluation]:
+        dic = self._get_json(ArticleCache._evaluation_key(url, scope))
+        if dic is None or not self._is_fresh(dic['evaluated_at']):
+            return None
+        return ArticleEvaluation(**dic)
+
+    def put_evaluation(self, evaluation: ArticleEvaluation):
+        self._put_json(ArticleCache._evaluation_key(evaluation.url, evaluation.scope), dataclasses.asdict(evaluation))
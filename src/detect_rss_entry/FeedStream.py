@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import datetime
+import dataclasses
+
+from email.utils import parsedate_to_datetime
+from typing import Optional, Iterable, Iterator, Tuple
+from xml.etree import ElementTree
+
+_ENTRY_TAGS = ('item', 'entry')
+_PUBLISHED_TAGS = ('pubDate', 'published', 'updated', 'date')
+_SUMMARY_TAGS = ('description', 'summary')
+_CONTENT_TAGS = ('encoded', 'content')
+
+
+@dataclasses.dataclass(frozen=True)
+class StreamedEntry:
+    link: str
+    title: str
+    guid: Optional[str]
+    published_at: Optional[int]
+    summary: str = ''
+    content: str = ''
+    tags: Tuple[str, ...] = ()
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_date(text: Optional[str]) -> Optional[int]:
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return int(parsedate_to_datetime(text).timestamp())
+    except (TypeError, ValueError):
+        pass
+    try:
+        d = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=datetime.timezone.utc)
+    return int(d.timestamp())
+
+
+def _entry(element: ElementTree.Element) -> Optional[StreamedEntry]:
+    link = title = guid = published = None
+    summary = content = ''
+    tags = []
+    for child in element:
+        name = _local_name(child.tag)
+        if name == 'title':
+            title = (child.text or '').strip()
+        elif name == 'link':
+            rel = child.get('rel', 'alternate')
+            href = child.get('href')
+            if href is not None and rel == 'alternate':
+                link = href
+            elif href is None and child.text:
+                link = child.text.strip()
+        elif name in ('guid', 'id'):
+            guid = (child.text or '').strip()
+        elif name in _PUBLISHED_TAGS and published is None:
+            published = _parse_date(child.text)
+        elif name in _SUMMARY_TAGS and not summary:
+            summary = ''.join(child.itertext()).strip()
+        elif name in _CONTENT_TAGS and not content:
+            content = ''.join(child.itertext()).strip()
+        elif name == 'category':
+            tag = child.get('term') or (child.text or '').strip()
+            if tag:
+                tags.append(tag)
+    link = link or element.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
+    if not link:
+        return None
+    return StreamedEntry(link, title or '', guid or link, published, summary, content, tuple(tags))
+
+
+def iter_entries(chunks: Iterable[bytes]) -> Iterator[StreamedEntry]:
+    parser: ElementTree.XMLPullParser = ElementTree.XMLPullParser(events=('end',))
+
+    def read_events() -> Iterator[StreamedEntry]:
+        for event in parser.read_events():
+            element = event[-1]
+            if not isinstance(element, ElementTree.Element) or _local_name(element.tag) not in _ENTRY_TAGS:
+                continue
+            entry = _entry(element)
+            element.clear()
+            if entry is not None:
+                yield entry
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from read_events()
+    parser.close()
+    yield from read_events()
@@ -2,23 +2,124 @@
 
 from __future__ import annotations
 
-import re
 import json
+import time
+import struct
 import hashlib
+import requests
 import feedparser
 import dataclasses
 
 from abc import *
-from typing import Optional, List
+from typing import Any, Optional, List, Dict, Set, Tuple, Union
 from logging import Logger
+from xml.etree.ElementTree import ParseError
+from bs4 import BeautifulSoup
 from botocore.exceptions import ClientError
-from WebDriverWrapper import WebDriverWrapper
+from PageFetcher import PageFetcher, FetchOptions, ElementNotFoundError, FETCH_MODE_STATIC, FETCH_MODE_BROWSER
+from WaitStrategies import Deadline
+from WebDriverWrapper import FindElementTimeout
+from KeywordMatcher import compile_keywords
+from AsyncFetchEngine import AsyncFetchEngine, FetchRequest, FetchResponse
+from HttpClient import HttpClient, HttpStatusError, shared_client
+from ArticleCache import ArticleCache, ArticleEvaluation, evaluation_scope
+from ConcurrentStorage import pooled_s3_client, map_concurrently
+from FeedStream import StreamedEntry, iter_entries
+from WebSub import WebSubLinks, discover_links
+
+
+STAGE_TITLE = 'title'
+STAGE_FEED = 'feed'
+STAGE_STATIC = 'static'
+STAGE_BROWSER = 'browser'
+MATCH_STAGES = (STAGE_TITLE, STAGE_FEED, STAGE_STATIC, STAGE_BROWSER)
+PENDING_ENTRY_MAX_ATTEMPTS = 3
+
+
+def match_stages(stages: Optional[List[str]], fetch_mode: str) -> Tuple[str, ...]:
+    if stages:
+        return tuple(s for s in stages if s in MATCH_STAGES)
+    if fetch_mode == FETCH_MODE_STATIC:
+        return STAGE_TITLE, STAGE_FEED, STAGE_STATIC
+    return MATCH_STAGES
+
+
+def unique_entries(entries: list) -> list:
+    unique: Dict[str, Any] = {}
+    for e in entries:
+        if e.get('link'):
+            unique.setdefault(e.link, e)
+    return list(unique.values())
+
+
+def feed_text(value: Optional[str]) -> str:
+    if not value:
+        return ''
+    if '<' not in value:
+        return value.strip()
+    return BeautifulSoup(value, 'html.parser').get_text(' ', strip=True)
 
 
 @dataclasses.dataclass(frozen=True)
 class RSSEntry:
     url: str
     title: str
+    summary: str = ''
+    content: str = ''
+    tags: Tuple[str, ...] = ()
+
+    @staticmethod
+    def from_parsed(entry) -> RSSEntry:
+        return RSSEntry(
+            url=entry.link,
+            title=entry.get('title', ''),
+            summary=feed_text(entry.get('summary')),
+            content=feed_text('\n'.join(c.get('value', '') for c in entry.get('content', []))),
+            tags=tuple(t['term'] for t in entry.get('tags', []) if t.get('term')),
+        )
+
+    @staticmethod
+    def from_streamed(entry: StreamedEntry) -> RSSEntry:
+        return RSSEntry(entry.link, entry.title, feed_text(entry.summary), feed_text(entry.content), entry.tags)
+
+    @property
+    def feed_text(self) -> str:
+        return '\n'.join([*self.tags, self.summary, self.content])
+
+
+@dataclasses.dataclass(frozen=True)
+class PendingEntry:
+    entry: RSSEntry
+    attempts: int
+
+    @staticmethod
+    def from_dict(dic: dict) -> PendingEntry:
+        entry = dic['entry']
+        return PendingEntry(RSSEntry(**{**entry, 'tags': tuple(entry.get('tags', ()))}), dic['attempts'])
+
+
+@dataclasses.dataclass(frozen=True)
+class EntryMatch:
+    keyword: str
+    stage: str
+
+
+@dataclasses.dataclass(frozen=True)
+class EntryTimeout:
+    url: str
+    stage: str
+
+
+@dataclasses.dataclass(frozen=True)
+class FeedValidators:
+    etag: Optional[str] = None
+    modified: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class FeedHighWaterMark:
+    guid: Optional[str] = None
+    published_at: Optional[int] = None
 
 
 class RSSEntries(metaclass=ABCMeta):
@@ -30,11 +131,45 @@ class RSSEntries(metaclass=ABCMeta):
     def check(self, feed_url: str, entry_url: Optional[str]):
         pass
 
+    def has_checked_many(self, feed_url: str, entry_urls: List[str]) -> List[bool]:
+        return [self.has_checked(feed_url, u) for u in entry_urls]
+
+    def check_many(self, feed_url: str, entry_urls: List[str]):
+        for u in entry_urls:
+            self.check(feed_url, u)
+
+    def preload(self, feed_urls: List[str]):
+        pass
+
+    @abstractmethod
+    def get_validators(self, feed_url: str) -> Optional[FeedValidators]:
+        pass
+
+    @abstractmethod
+    def put_validators(self, feed_url: str, validators: FeedValidators):
+        pass
+
+    def get_high_water_mark(self, feed_url: str) -> Optional[FeedHighWaterMark]:
+        return None
+
+    def put_high_water_mark(self, feed_url: str, high_water_mark: FeedHighWaterMark):
+        pass
+
+    def get_pending_entries(self, feed_url: str) -> List[PendingEntry]:
+        return []
+
+    def put_pending_entries(self, feed_url: str, entries: List[PendingEntry]):
+        pass
+
+    def flush(self, feed_url: str):
+        pass
+
 
 class RSSEntriesOnS3(RSSEntries):
     def __init__(self, s3_bucket, logger: Logger):
         self._bucket = s3_bucket
         self._logger = logger
+        self._client = pooled_s3_client()
 
     @staticmethod
     def _object_key(feed_url: str, entry_url: Optional[str]):
@@ -44,6 +179,10 @@ class RSSEntriesOnS3(RSSEntries):
             object_key = f'{object_key}/{entry_url_hash}'
         return object_key
 
+    @staticmethod
+    def _validators_key(feed_url: str):
+        return RSSEntriesOnS3._object_key(feed_url, None) + '/validators'
+
     def has_checked(self, feed_url: str, entry_url: Optional[str] = None) -> bool:
         try:
             self._bucket.Object(RSSEntriesOnS3._object_key(feed_url, entry_url)).get()
@@ -70,34 +209,520 @@ class RSSEntriesOnS3(RSSEntries):
             ContentType='text/plane'
         )
 
+    def _exists(self, object_key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self._bucket.name, Key=object_key)
+            return True
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code not in ('404', 'NoSuchKey'):
+                raise e
+            return False
+
+    def has_checked_many(self, feed_url: str, entry_urls: List[str]) -> List[bool]:
+        return map_concurrently(lambda u: self._exists(RSSEntriesOnS3._object_key(feed_url, u)), entry_urls)
+
+    def check_many(self, feed_url: str, entry_urls: List[str]):
+        object_keys = [RSSEntriesOnS3._object_key(feed_url, u) for u in entry_urls]
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:RSSEntriesOnS3:check_many',
+            'details': {
+                'feed_url': feed_url,
+                'entries': len(object_keys),
+            }
+        }, ensure_ascii=False))
+        map_concurrently(
+            lambda k: self._client.put_object(Bucket=self._bucket.name, Key=k, Body=b'', ContentType='text/plain'),
+            object_keys
+        )
+
+    def get_validators(self, feed_url: str) -> Optional[FeedValidators]:
+        try:
+            res = self._bucket.Object(RSSEntriesOnS3._validators_key(feed_url)).get()
+            return FeedValidators(**json.loads(res['Body'].read().decode('utf-8')))
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return None
+
+    def put_validators(self, feed_url: str, validators: FeedValidators):
+        self._bucket.Object(RSSEntriesOnS3._validators_key(feed_url)).put(
+            Body=json.dumps(dataclasses.asdict(validators)).encode('utf-8'),
+            ContentEncoding='utf-8',
+            ContentType='application/json'
+        )
+
+
+@dataclasses.dataclass
+class _FeedManifest:
+    entries: Dict[bytes, int]
+    validators: Optional[FeedValidators] = None
+    high_water_mark: Optional[FeedHighWaterMark] = None
+    pending: List[PendingEntry] = dataclasses.field(default_factory=list)
+    exists: bool = False
+    dirty: bool = False
+    object_etag: Optional[str] = None
+    legacy_keys: List[str] = dataclasses.field(default_factory=list)
+
+
+class RSSEntriesManifestOnS3(RSSEntries):
+    _MAGIC = b'RSM1'
+    _HEADER = struct.Struct('>4sI')
+    _RECORD = struct.Struct('>8sI')
+    _REFRESH_SECONDS = 24 * 60 * 60
+    _DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, s3_bucket, logger: Logger, retention_days: int = 90, max_entries: int = 5000):
+        self._bucket = s3_bucket
+        self._logger = logger
+        self._retention_seconds = retention_days * 24 * 60 * 60
+        self._max_entries = max_entries
+        self._manifests: Dict[str, _FeedManifest] = {}
+        self._client = pooled_s3_client()
+
+    @staticmethod
+    def _object_key(feed_url: str):
+        return 'manifests/' + hashlib.sha256(feed_url.encode()).hexdigest()
+
+    @staticmethod
+    def _entry_hash(entry_url: str) -> bytes:
+        return hashlib.sha256(entry_url.encode()).digest()[:RSSEntriesManifestOnS3._RECORD.size - 4]
+
+    @staticmethod
+    def _encode(manifest: _FeedManifest) -> bytes:
+        header = json.dumps({
+            'validators': dataclasses.asdict(manifest.validators or FeedValidators()),
+            'high_water_mark': dataclasses.asdict(manifest.high_water_mark or FeedHighWaterMark()),
+            'pending': [dataclasses.asdict(p) for p in manifest.pending],
+        }).encode('utf-8')
+        records = [RSSEntriesManifestOnS3._RECORD.pack(h, t) for h, t in sorted(manifest.entries.items())]
+        return RSSEntriesManifestOnS3._HEADER.pack(RSSEntriesManifestOnS3._MAGIC, len(header)) + header + b''.join(records)
+
+    @staticmethod
+    def _decode(body: bytes, object_etag: Optional[str]) -> _FeedManifest:
+        magic, header_size = RSSEntriesManifestOnS3._HEADER.unpack_from(body)
+        if magic != RSSEntriesManifestOnS3._MAGIC:
+            raise ValueError(f'unknown manifest format: {magic}')
+        offset = RSSEntriesManifestOnS3._HEADER.size
+        header = json.loads(body[offset:offset + header_size].decode('utf-8'))
+        validators = FeedValidators(**header['validators'])
+        high_water_mark = FeedHighWaterMark(**header.get('high_water_mark', {}))
+        pending = [PendingEntry.from_dict(p) for p in header.get('pending', [])]
+        entries = {
+            h: t for h, t in RSSEntriesManifestOnS3._RECORD.iter_unpack(body[offset + header_size:])
+        }
+        return _FeedManifest(entries, validators, high_water_mark, pending, exists=True, object_etag=object_etag)
+
+    def _fetch(self, feed_url: str) -> Optional[_FeedManifest]:
+        try:
+            res = self._client.get_object(Bucket=self._bucket.name, Key=RSSEntriesManifestOnS3._object_key(feed_url))
+            return RSSEntriesManifestOnS3._decode(res['Body'].read(), res['ETag'])
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return None
+
+    def _migrate(self, feed_url: str) -> _FeedManifest:
+        manifest = _FeedManifest({})
+        prefix = RSSEntriesOnS3._object_key(feed_url, None) + '/'
+        for obj in self._bucket.objects.filter(Prefix=prefix):
+            manifest.legacy_keys.append(obj.key)
+            name = obj.key[len(prefix):]
+            if name == 'validators':
+                manifest.validators = FeedValidators(**json.loads(obj.get()['Body'].read().decode('utf-8')))
+                continue
+            entry_hash = bytes.fromhex(name)[:RSSEntriesManifestOnS3._RECORD.size - 4]
+            manifest.entries[entry_hash] = int(obj.last_modified.timestamp())
+        if manifest.legacy_keys:
+            manifest.exists = bool(manifest.entries)
+            manifest.dirty = True
+            self._logger.info(json.dumps({
+                'event': 'web-monitor:RSSEntriesManifestOnS3:migrate',
+                'details': {
+                    'feed_url': feed_url,
+                    'entries': len(manifest.entries),
+                    'legacy_objects': len(manifest.legacy_keys),
+                }
+            }, ensure_ascii=False))
+        return manifest
+
+    def _manifest(self, feed_url: str) -> _FeedManifest:
+        manifest = self._manifests.get(feed_url)
+        if manifest is None:
+            manifest = self._fetch(feed_url) or self._migrate(feed_url)
+            self._manifests[feed_url] = manifest
+        return manifest
+
+    def preload(self, feed_urls: List[str]):
+        missing = [u for u in dict.fromkeys(feed_urls) if u not in self._manifests]
+        for feed_url, manifest in zip(missing, map_concurrently(self._fetch, missing)):
+            self._manifests[feed_url] = manifest or self._migrate(feed_url)
+
+    def has_checked(self, feed_url: str, entry_url: Optional[str] = None) -> bool:
+        manifest = self._manifest(feed_url)
+        if entry_url is None:
+            return manifest.exists
+        entry_hash = RSSEntriesManifestOnS3._entry_hash(entry_url)
+        last_seen = manifest.entries.get(entry_hash)
+        if last_seen is None:
+            return False
+        now = int(time.time())
+        if now - last_seen > RSSEntriesManifestOnS3._REFRESH_SECONDS:
+            manifest.entries[entry_hash] = now
+            manifest.dirty = True
+        return True
+
+    def check(self, feed_url: str, entry_url: Optional[str]):
+        manifest = self._manifest(feed_url)
+        manifest.exists = True
+        manifest.dirty = True
+        if entry_url:
+            manifest.entries[RSSEntriesManifestOnS3._entry_hash(entry_url)] = int(time.time())
+
+    def get_validators(self, feed_url: str) -> Optional[FeedValidators]:
+        return self._manifest(feed_url).validators
+
+    def put_validators(self, feed_url: str, validators: FeedValidators):
+        manifest = self._manifest(feed_url)
+        manifest.validators = validators
+        manifest.dirty = True
+
+    def get_high_water_mark(self, feed_url: str) -> Optional[FeedHighWaterMark]:
+        return self._manifest(feed_url).high_water_mark
+
+    def put_high_water_mark(self, feed_url: str, high_water_mark: FeedHighWaterMark):
+        manifest = self._manifest(feed_url)
+        manifest.high_water_mark = high_water_mark
+        manifest.dirty = True
+
+    def get_pending_entries(self, feed_url: str) -> List[PendingEntry]:
+        return self._manifest(feed_url).pending
+
+    def put_pending_entries(self, feed_url: str, entries: List[PendingEntry]):
+        manifest = self._manifest(feed_url)
+        manifest.pending = entries
+        manifest.dirty = True
+
+    def _prune(self, manifest: _FeedManifest):
+        expires = int(time.time()) - self._retention_seconds
+        entries = [(h, t) for h, t in manifest.entries.items() if t >= expires]
+        entries.sort(key=lambda e: e[1], reverse=True)
+        manifest.entries = dict(entries[:self._max_entries])
+
+    def _remote_etag(self, object_key: str) -> Optional[str]:
+        try:
+            return self._bucket.meta.client.head_object(Bucket=self._bucket.name, Key=object_key)['ETag']
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code not in ('404', 'NoSuchKey'):
+                raise e
+            return None
+
+    def _delete_legacy_objects(self, feed_url: str, manifest: _FeedManifest):
+        keys = manifest.legacy_keys
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:RSSEntriesManifestOnS3:delete_legacy_objects',
+            'details': {
+                'feed_url': feed_url,
+                'objects': len(keys),
+            }
+        }, ensure_ascii=False))
+        size = RSSEntriesManifestOnS3._DELETE_BATCH_SIZE
+        map_concurrently(
+            lambda batch: self._client.delete_objects(
+                Bucket=self._bucket.name, Delete={'Objects': [{'Key': k} for k in batch], 'Quiet': True}),
+            [keys[i:i + size] for i in range(0, len(keys), size)]
+        )
+        manifest.legacy_keys = []
+
+    def flush(self, feed_url: str):
+        manifest = self._manifests.get(feed_url)
+        if manifest is None or not manifest.dirty:
+            return
+        object_key = RSSEntriesManifestOnS3._object_key(feed_url)
+        # The pinned boto3 has no conditional PUT, so the last writer wins. Merging the entries another
+        # invocation wrote since our read only narrows the window in which its update can be lost.
+        if self._remote_etag(object_key) != manifest.object_etag:
+            remote = self._fetch(feed_url)
+            if remote is not None:
+                for h, t in remote.entries.items():
+                    manifest.entries[h] = max(t, manifest.entries.get(h, 0))
+        self._prune(manifest)
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:RSSEntriesManifestOnS3:flush',
+            'details': {
+                'feed_url': feed_url,
+                'object_key': object_key,
+                'entries': len(manifest.entries),
+            }
+        }, ensure_ascii=False))
+        res = self._bucket.Object(object_key).put(
+            Body=RSSEntriesManifestOnS3._encode(manifest),
+            ContentType='application/octet-stream'
+        )
+        manifest.object_etag = res.get('ETag')
+        manifest.dirty = False
+        if manifest.legacy_keys:
+            self._delete_legacy_objects(feed_url, manifest)
+
 
 class RSSNewEntryDetector:
-    def __init__(self, entries: RSSEntries):
+    _STREAM_BATCH = 20
+
+    def __init__(
+        self,
+        entries: RSSEntries,
+        engine: Optional[AsyncFetchEngine] = None,
+        client: Optional[HttpClient] = None
+    ):
         self._entries = entries
+        self._engine = engine
+        self._client = client or shared_client()
+        self._prefetched: Dict[str, FetchResponse] = {}
+        self._links: Dict[str, Optional[WebSubLinks]] = {}
+
+    def websub_links(self, feed_url: str) -> Optional[WebSubLinks]:
+        return self._links.pop(feed_url, None)
+
+    def pending_entries(self, feed_url: str) -> List[RSSEntry]:
+        return [p.entry for p in self._entries.get_pending_entries(feed_url)]
+
+    def defer_entries(self, feed_url: str, timed_out: List[RSSEntry]):
+        previous = self._entries.get_pending_entries(feed_url)
+        attempts = {p.entry.url: p.attempts for p in previous}
+        pending = [PendingEntry(e, attempts.get(e.url, 0) + 1) for e in timed_out]
+        pending = [p for p in pending if p.attempts < PENDING_ENTRY_MAX_ATTEMPTS]
+        if not previous and not pending:
+            return
+        self._entries.put_pending_entries(feed_url, pending)
+        self._entries.flush(feed_url)
+
+    @staticmethod
+    def _conditional_headers(validators: FeedValidators) -> Dict[str, str]:
+        headers = {}
+        if validators.etag:
+            headers['If-None-Match'] = validators.etag
+        if validators.modified:
+            headers['If-Modified-Since'] = validators.modified
+        return headers
+
+    def prefetch(self, feed_urls: List[str], timeout: Optional[float] = None):
+        self._prefetched.clear()
+        if self._engine is None:
+            return
+        self._entries.preload(feed_urls)
+        fetch_requests = []
+        for feed_url in dict.fromkeys(feed_urls):
+            validators = self._entries.get_validators(feed_url) or FeedValidators()
+            fetch_requests.append(FetchRequest(feed_url, RSSNewEntryDetector._conditional_headers(validators)))
+        for res in self._engine.fetch_all(fetch_requests, timeout=timeout):
+            if res.ok:
+                self._prefetched[res.request.url] = res
+
+    def _parse(
+        self,
+        feed_url: str,
+        validators: FeedValidators
+    ) -> Tuple[Optional[feedparser.FeedParserDict], FeedValidators]:
+        prefetched = self._prefetched.get(feed_url)
+        if prefetched is not None:
+            status, headers, body = prefetched.status, prefetched.headers, prefetched.body
+        else:
+            res = self._client.get(feed_url, headers=RSSNewEntryDetector._conditional_headers(validators))
+            if res.status != 304:
+                res.raise_for_status()
+            status, headers, body = res.status, res.headers, res.body
+        if status == 304:
+            self._links[feed_url] = discover_links(feed_url, [], headers)
+            return None, validators
+        headers = {k.lower(): v for k, v in headers.items()}
+        parsed = feedparser.parse(body, response_headers=headers)
+        self._links[feed_url] = discover_links(feed_url, parsed.feed.get('links', []), headers)
+        return parsed, FeedValidators(headers.get('etag'), headers.get('last-modified'))
+
+    @staticmethod
+    def _reached_high_water_mark(entry: StreamedEntry, high_water_mark: FeedHighWaterMark, stream_mode: str) -> bool:
+        if stream_mode == 'guid':
+            return high_water_mark.guid is not None and entry.guid == high_water_mark.guid
+        if stream_mode == 'published':
+            return high_water_mark.published_at is not None and entry.published_at is not None \
+                and entry.published_at <= high_water_mark.published_at
+        return False
 
-    def detect_new_entries(self, feed_url: str) -> List[RSSEntry]:
+    def _take_unchecked(self, feed_url: str, batch: List[StreamedEntry], streamed: List[StreamedEntry]) -> bool:
+        checked = self._entries.has_checked_many(feed_url, [e.link for e in batch])
+        for entry, has_checked in zip(batch, checked):
+            if has_checked:
+                return True
+            streamed.append(entry)
+        return False
+
+    def _detect_streamed_entries(self, feed_url: str, stream_mode: str) -> List[RSSEntry]:
+        streamed: List[StreamedEntry] = []
+        batch: List[StreamedEntry] = []
+        links: Set[str] = set()
+        stopped = False
+        validators = self._entries.get_validators(feed_url) or FeedValidators()
+        high_water_mark = self._entries.get_high_water_mark(feed_url) or FeedHighWaterMark()
+        with self._client.stream(feed_url, headers=RSSNewEntryDetector._conditional_headers(validators)) as res:
+            self._links[feed_url] = discover_links(feed_url, [], res.headers)
+            if res.status == 304:
+                self._entries.flush(feed_url)
+                return []
+            res.raise_for_status()
+            latest_validators = FeedValidators(res.headers.get('etag'), res.headers.get('last-modified'))
+            for entry in iter_entries(res.iter_chunks()):
+                if RSSNewEntryDetector._reached_high_water_mark(entry, high_water_mark, stream_mode):
+                    stopped = True
+                    break
+                if entry.link in links:
+                    continue
+                links.add(entry.link)
+                batch.append(entry)
+                if len(batch) == RSSNewEntryDetector._STREAM_BATCH:
+                    stopped = self._take_unchecked(feed_url, batch, streamed)
+                    batch = []
+                    if stopped:
+                        break
+            if batch:
+                stopped = self._take_unchecked(feed_url, batch, streamed) or stopped
+        self._entries.check_many(feed_url, [e.link for e in streamed])
+        if streamed:
+            newest = streamed[0]
+            self._entries.put_high_water_mark(feed_url, FeedHighWaterMark(newest.guid, newest.published_at))
+        if latest_validators != validators:
+            self._entries.put_validators(feed_url, latest_validators)
+        self._entries.flush(feed_url)
+        entries = [RSSEntry.from_streamed(e) for e in streamed]
+        return entries if stopped else []
+
+    def detect_new_entries(self, feed_url: str, stream_mode: Optional[str] = None) -> List[RSSEntry]:
+        if stream_mode and feed_url not in self._prefetched:
+            try:
+                return self._detect_streamed_entries(feed_url, stream_mode)
+            except ParseError:
+                pass
         entries = []
         is_new_feed = True
-        res = feedparser.parse(feed_url)
-        for entry in res.entries:
-            if self._entries.has_checked(feed_url, entry.link):
+        validators = self._entries.get_validators(feed_url) or FeedValidators()
+        res, latest_validators = self._parse(feed_url, validators)
+        if res is None:
+            self._entries.flush(feed_url)
+            return []
+        feed_entries = unique_entries(res.entries)
+        checked = self._entries.has_checked_many(feed_url, [e.link for e in feed_entries])
+        for entry, has_checked in zip(feed_entries, checked):
+            if has_checked:
                 is_new_feed = False
                 continue
-            self._entries.check(feed_url, entry.link)
-            entries.append(RSSEntry(entry.link, entry.title))
+            entries.append(RSSEntry.from_parsed(entry))
+        self._entries.check_many(feed_url, [e.url for e in entries])
+        if latest_validators != validators:
+            self._entries.put_validators(feed_url, latest_validators)
+        self._entries.flush(feed_url)
         return entries if not is_new_feed else []
 
+    def detect_pushed_entries(self, feed_url: str, content: bytes) -> List[RSSEntry]:
+        is_known_feed = self._entries.has_checked(feed_url)
+        parsed = feedparser.parse(content)
+        feed_entries = unique_entries(parsed.entries)
+        checked = self._entries.has_checked_many(feed_url, [e.link for e in feed_entries])
+        entries = [RSSEntry.from_parsed(e) for e, c in zip(feed_entries, checked) if not c]
+        self._entries.check_many(feed_url, [e.url for e in entries])
+        self._entries.flush(feed_url)
+        return entries if is_known_feed else []
+
 
 class RelatedRSSEntryDetector:
-    def __init__(self, driver: WebDriverWrapper):
-        self._driver = driver
-
-    def matched_keyword(self, entry: RSSEntry, selector: str, keywords: List[str]) -> Optional[str]:
-        for k in keywords:
-            if re.findall(k, entry.title):
-                return k
-        text = self._driver.find_element(entry.url, selector).selected_text
-        for k in keywords:
-            if re.findall(k, text):
-                return k
-        return None
+    def __init__(self, fetcher: PageFetcher, cache: Optional[ArticleCache] = None):
+        self._fetcher = fetcher
+        self._cache = cache
+
+    def _evaluated(
+        self,
+        entry: RSSEntry,
+        feed_url: str,
+        scope: str,
+        matched: Optional[EntryMatch]
+    ) -> Optional[EntryMatch]:
+        if self._cache is not None:
+            self._cache.put_evaluation(ArticleEvaluation(
+                entry.url,
+                feed_url,
+                matched.keyword if matched is not None else None,
+                int(time.time()),
+                matched.stage if matched is not None else None,
+                scope,
+            ))
+        return matched
+
+    def _selected_text(
+        self,
+        entry: RSSEntry,
+        selector: str,
+        stage: str,
+        options: FetchOptions,
+        deadline: Optional[Deadline]
+    ) -> Optional[str]:
+        if self._cache is not None:
+            text = self._cache.get_text(entry.url, selector, stage)
+            if text is not None:
+                return text
+        if stage == STAGE_STATIC:
+            options = FetchOptions(fetch_mode=FETCH_MODE_STATIC, timeout_seconds=options.timeout_seconds)
+            try:
+                current = self._fetcher.find_element(entry.url, selector, options, deadline)
+            except (ElementNotFoundError, HttpStatusError, requests.RequestException):
+                return ''
+        else:
+            options = dataclasses.replace(options, fetch_mode=FETCH_MODE_BROWSER)
+            current = self._fetcher.find_element(entry.url, selector, options, deadline)
+        if isinstance(current, FindElementTimeout):
+            return None
+        if self._cache is not None:
+            self._cache.put_text(entry.url, selector, stage, current.selected_text)
+        return current.selected_text
+
+    def _stage_text(
+        self,
+        entry: RSSEntry,
+        selector: str,
+        stage: str,
+        options: FetchOptions,
+        deadline: Optional[Deadline]
+    ) -> Optional[str]:
+        if stage == STAGE_TITLE:
+            return entry.title
+        if stage == STAGE_FEED:
+            return entry.feed_text
+        return self._selected_text(entry, selector, stage, options, deadline)
+
+    def match(
+        self,
+        entry: RSSEntry,
+        selector: str,
+        keywords: List[str],
+        stages: Optional[List[str]] = None,
+        options: FetchOptions = FetchOptions(),
+        deadline: Optional[Deadline] = None,
+        feed_url: str = ''
+    ) -> Union[EntryMatch, EntryTimeout, None]:
+        entry_stages = match_stages(stages, options.fetch_mode)
+        scope = evaluation_scope(selector, keywords, entry_stages)
+        if self._cache is not None and self._cache.get_evaluation(entry.url, scope) is not None:
+            return None
+        matcher = compile_keywords(tuple(keywords))
+        timed_out: Optional[EntryTimeout] = None
+        for stage in entry_stages:
+            text = self._stage_text(entry, selector, stage, options, deadline)
+            if text is None:
+                timed_out = timed_out or EntryTimeout(entry.url, stage)
+                continue
+            matched = matcher.match(text)
+            if matched is not None:
+                return self._evaluated(entry, feed_url, scope, EntryMatch(matched, stage))
+        if timed_out is not None:
+            return timed_out
+        return self._evaluated(entry, feed_url, scope, None)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import base64
+import logging
+import dataclasses
+from typing import List, Optional
+
+from WebMonitor import DetectRSSEntryEvent, DetectRSSEntryResult
+from MessageEnvelope import MessageEnvelope
+from EventRecords import EventRecord
+from TargetSchedules import TargetSchedules, rss_target_id
+from RSSEntryDetector import RSSNewEntryDetector, RelatedRSSEntryDetector, EntryTimeout
+from PageFetcher import FetchOptions
+from WaitStrategies import Deadline
+from WebSub import WebSubSubscriber
+
+
+@dataclasses.dataclass(frozen=True)
+class DetectRSSEntryConfig:
+    sns_client: any
+    next_topic: str
+    logger: logging.Logger
+    schedules: Optional[TargetSchedules] = None
+    envelope: Optional[MessageEnvelope] = None
+    websub: Optional[WebSubSubscriber] = None
+
+
+def parse_events(event: dict) -> List[DetectRSSEntryEvent]:
+    events = []
+    for record in event.get('Records', []):
+        try:
+            e = DetectRSSEntryEvent.from_message(EventRecord.from_record(record).message)
+        except (KeyError, ValueError):
+            continue
+        if e is not None:
+            events.append(e)
+    return events
+
+
+def handle(
+    event: DetectRSSEntryEvent,
+    new_entry_detector: RSSNewEntryDetector,
+    related_entry_detector: RelatedRSSEntryDetector,
+    config: DetectRSSEntryConfig,
+    deadline: Optional[Deadline] = None
+) -> List[DetectRSSEntryResult]:
+    matched_entries = []
+    if event.pushed_content:
+        entries = new_entry_detector.detect_pushed_entries(event.feed_url, base64.b64decode(event.pushed_content))
+    else:
+        entries = new_entry_detector.detect_new_entries(event.feed_url, event.stream_mode)
+        if event.websub and config.websub is not None:
+            subscribe(event.feed_url, new_entry_detector, config.websub, config.logger)
+    entries_dic = [{'url': e.url, 'title': e.title} for e in entries]
+    config.logger.info(json.dumps({
+            'event': 'web-monitor:detect_rss_entry:handle:new_entries',
+            'details': {
+                'entries': entries_dic
+            }
+        }, ensure_ascii=False))
+    options = FetchOptions.build(event.fetch_mode, event.load_profile, event.wait)
+    new_urls = {e.url for e in entries}
+    candidates = entries + [e for e in new_entry_detector.pending_entries(event.feed_url) if e.url not in new_urls]
+    timed_out = []
+    for e in candidates:
+        matched = related_entry_detector.match(
+            e, event.selector, event.keywords, event.match_stages, options, deadline, event.feed_url)
+        if isinstance(matched, EntryTimeout):
+            timed_out.append(e)
+        elif matched is not None:
+            res = DetectRSSEntryResult(e.url, event.feed_url, event.selector, e.title, matched.keyword, matched.stage)
+            matched_entries.append(res)
+            notify_message(config.sns_client, config.next_topic, dataclasses.asdict(res), config.logger, config.envelope)
+    new_entry_detector.defer_entries(event.feed_url, timed_out)
+    if event.adaptive_schedule and config.schedules is not None:
+        config.schedules.report(rss_target_id(event.feed_url), len(entries) > 0)
+    return matched_entries
+
+
+def subscribe(feed_url: str, new_entry_detector: RSSNewEntryDetector, websub: WebSubSubscriber, logger: logging.Logger):
+    try:
+        websub.ensure_subscribed(feed_url, new_entry_detector.websub_links(feed_url))
+    except Exception as e:
+        logger.warning(json.dumps({
+            'event': 'web-monitor:detect_rss_entry:subscribe:error',
+            'details': {
+                'feed_url': feed_url,
+                'error': repr(e),
+            }
+        }, ensure_ascii=False))
+
+
+def notify_message(
+    sns,
+    topic: str,
+    message: dict,
+    logger: logging.Logger,
+    message_envelope: Optional[MessageEnvelope] = None
+):
+    if message_envelope is not None:
+        j = message_envelope.wrap(message)
+    else:
+        j = json.dumps(message, ensure_ascii=False)
+    res = sns.publish(
+        TopicArn=topic,
+        Message=j,
+    )
+    logger.info(json.dumps({
+        'event': 'web-monitor:detect_rss_entry:notify_message:message_id',
+        'details': {'message': message, 'return': res}
+    }, ensure_ascii=False))
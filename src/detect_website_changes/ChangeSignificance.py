@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import re
+import struct
+import operator
+import hashlib
+import dataclasses
+
+from collections import Counter
+from functools import lru_cache
+from typing import Optional, Tuple, Iterator, Pattern
+
+SIMHASH_BITS = 64
+_WHITESPACE = re.compile(r'\s+')
+_NUMBER = re.compile(r'\d+(?:[.,:]\d+)*')
+_MASK = (1 << SIMHASH_BITS) - 1
+_GOLDEN_RATIO = 0x9E3779B97F4A7C15
+_TOKEN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]|\w+')
+
+
+@dataclasses.dataclass(frozen=True)
+class Normalizer:
+    strip_patterns: Tuple[Pattern, ...] = ()
+    collapse_whitespace: bool = False
+    mask_numbers: bool = False
+
+    @staticmethod
+    def from_dict(dic: Optional[dict]) -> Normalizer:
+        dic = dic or {}
+        return _build_normalizer(
+            tuple(dic.get('strip', [])),
+            dic.get('collapse_whitespace', False),
+            dic.get('mask_numbers', False),
+        )
+
+    def normalize(self, text: str) -> str:
+        for p in self.strip_patterns:
+            text = p.sub('', text)
+        if self.mask_numbers:
+            text = _NUMBER.sub('0', text)
+        if self.collapse_whitespace:
+            text = _WHITESPACE.sub(' ', text).strip()
+        return text
+
+
+@lru_cache(maxsize=256)
+def _build_normalizer(strip: Tuple[str, ...], collapse_whitespace: bool, mask_numbers: bool) -> Normalizer:
+    return Normalizer(tuple(re.compile(p) for p in strip), collapse_whitespace, mask_numbers)
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=SIMHASH_BITS // 8).digest(), 'big')
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    tokens = _TOKEN.findall(text) or ['']
+    token_hashes = {t: _token_hash(t) for t in set(tokens)}
+    shingles: Iterator[int] = iter(())
+    for k in range(min(shingle_size, len(tokens))):
+        multiplier = (_GOLDEN_RATIO * (2 * k + 1)) & _MASK
+        weighted = {t: h * multiplier & _MASK for t, h in token_hashes.items()}
+        column = map(weighted.__getitem__, tokens[k:])
+        shingles = column if k == 0 else map(operator.xor, shingles, column)
+    unique = set(shingles)
+    width = SIMHASH_BITS // 8
+    digests = struct.pack(f'>{len(unique)}Q', *unique)
+    half = len(unique) / 2
+    fingerprint = 0
+    for position in range(width):
+        byte_counts = Counter(digests[position::width])
+        for bit in range(8):
+            ones = sum(n for value, n in byte_counts.items() if value & (0x80 >> bit))
+            if ones > half:
+                fingerprint |= 1 << (SIMHASH_BITS - 1 - (position * 8 + bit))
+    return fingerprint
+
+
+def similarity(a: int, b: int) -> float:
+    return 1.0 - bin(a ^ b).count('1') / SIMHASH_BITS
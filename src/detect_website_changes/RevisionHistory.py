@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import time
+import zlib
+import hashlib
+import difflib
+import threading
+import dataclasses
+
+from collections import OrderedDict
+from typing import Optional, List, Tuple
+from logging import Logger
+from botocore.exceptions import ClientError
+
+from WebsiteChangesDetector import WebsiteRevisions, WebsiteRevisionsOnS3, RevisionInfo, text_digest
+from ConcurrentStorage import pooled_s3_client, map_concurrently
+
+
+def encode_delta(base: str, text: str) -> List[list]:
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(['c', i1, i2])
+        elif j2 > j1:
+            ops.append(['i', ''.join(lines[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: List[list]) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == 'c':
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return ''.join(parts)
+
+
+@dataclasses.dataclass(frozen=True)
+class RevisionEntry:
+    revision: int
+    created_at: int
+    digest: str
+    keyframe: int
+    size: int
+    stored_bytes: int
+    fingerprint: Optional[str] = None
+
+    @property
+    def is_keyframe(self) -> bool:
+        return self.revision == self.keyframe
+
+
+class WebsiteRevisionHistoryOnS3(WebsiteRevisions):
+    def __init__(
+        self,
+        s3_bucket,
+        logger: Logger,
+        keyframe_interval: int = 20,
+        max_delta_ratio: float = 0.5,
+        max_revisions: int = 500,
+        max_cached_keyframes: int = 32,
+        max_cached_indexes: int = 256
+    ):
+        self._bucket = s3_bucket
+        self._logger = logger
+        self._legacy = WebsiteRevisionsOnS3(s3_bucket, logger)
+        self._keyframe_interval = keyframe_interval
+        self._max_delta_ratio = max_delta_ratio
+        self._max_revisions = max_revisions
+        self._max_cached_keyframes = max_cached_keyframes
+        self._max_cached_indexes = max_cached_indexes
+        self._keyframes: OrderedDict[Tuple[str, int], str] = OrderedDict()
+        self._keyframes_lock = threading.Lock()
+        self._indexes: OrderedDict[str, Optional[List[RevisionEntry]]] = OrderedDict()
+        self._indexes_lock = threading.Lock()
+        self._client = pooled_s3_client()
+
+    @staticmethod
+    def _prefix(url: str, selector: str) -> str:
+        return f'history/{hashlib.sha256(f"{url}::{selector}".encode()).hexdigest()}/'
+
+    @staticmethod
+    def _revision_object_key(prefix: str, entry: RevisionEntry) -> str:
+        return f'{prefix}{entry.revision:08d}.{"k" if entry.is_keyframe else "d"}'
+
+    def _get_object(self, object_key: str) -> Optional[dict]:
+        try:
+            return self._client.get_object(Bucket=self._bucket.name, Key=object_key)
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return None
+
+    def _get_bytes(self, object_key: str) -> Optional[bytes]:
+        res = self._get_object(object_key)
+        return res['Body'].read() if res is not None else None
+
+    def _remember_index(self, prefix: str, entries: Optional[List[RevisionEntry]]):
+        with self._indexes_lock:
+            self._indexes[prefix] = entries
+            self._indexes.move_to_end(prefix)
+            while len(self._indexes) > self._max_cached_indexes:
+                self._indexes.popitem(last=False)
+
+    def _load_index(self, prefix: str) -> Optional[List[RevisionEntry]]:
+        res = self._get_object(prefix + 'index.json')
+        entries = None
+        if res is not None:
+            revisions = json.loads(res['Body'].read().decode('utf-8'))['revisions']
+            entries = [RevisionEntry(**e) for e in revisions]
+        self._remember_index(prefix, entries)
+        return entries
+
+    def _cached_index(self, prefix: str) -> Optional[List[RevisionEntry]]:
+        with self._indexes_lock:
+            if prefix in self._indexes:
+                return self._indexes[prefix]
+        return self._load_index(prefix)
+
+    def _save_index(self, prefix: str, entries: List[RevisionEntry]):
+        self._client.put_object(
+            Bucket=self._bucket.name,
+            Key=prefix + 'index.json',
+            Body=json.dumps({'revisions': [dataclasses.asdict(e) for e in entries]}).encode('utf-8'),
+            ContentEncoding='utf-8',
+            ContentType='application/json'
+        )
+
+    def _put_revision(self, prefix: str, entry: RevisionEntry, body: bytes):
+        self._client.put_object(
+            Bucket=self._bucket.name,
+            Key=WebsiteRevisionHistoryOnS3._revision_object_key(prefix, entry),
+            Body=body,
+            ContentType='application/zlib'
+        )
+
+    def _delete_revisions(self, prefix: str, entries: List[RevisionEntry]):
+        if not entries:
+            return
+        with self._keyframes_lock:
+            for e in entries:
+                self._keyframes.pop((prefix, e.revision), None)
+        self._client.delete_objects(Bucket=self._bucket.name, Delete={
+            'Objects': [{'Key': WebsiteRevisionHistoryOnS3._revision_object_key(prefix, e)} for e in entries],
+            'Quiet': True,
+        })
+
+    def _remember_keyframe(self, prefix: str, revision: int, text: str):
+        with self._keyframes_lock:
+            self._keyframes[(prefix, revision)] = text
+            self._keyframes.move_to_end((prefix, revision))
+            while len(self._keyframes) > self._max_cached_keyframes:
+                self._keyframes.popitem(last=False)
+
+    def _keyframe_text(self, prefix: str, entry: RevisionEntry) -> str:
+        with self._keyframes_lock:
+            cached = self._keyframes.get((prefix, entry.keyframe))
+        if cached is not None:
+            return cached
+        body = self._get_bytes(f'{prefix}{entry.keyframe:08d}.k')
+        if body is None:
+            raise KeyError(f'missing keyframe {entry.keyframe} under {prefix}')
+        text = zlib.decompress(body).decode('utf-8')
+        self._remember_keyframe(prefix, entry.keyframe, text)
+        return text
+
+    def _reconstruct(self, prefix: str, entry: RevisionEntry) -> str:
+        base = self._keyframe_text(prefix, entry)
+        if entry.is_keyframe:
+            return base
+        body = self._get_bytes(WebsiteRevisionHistoryOnS3._revision_object_key(prefix, entry))
+        if body is None:
+            raise KeyError(f'missing delta {entry.revision} under {prefix}')
+        return apply_delta(base, json.loads(zlib.decompress(body).decode('utf-8')))
+
+    def list_revisions(self, url: str, selector: str) -> List[RevisionEntry]:
+        return self._load_index(WebsiteRevisionHistoryOnS3._prefix(url, selector)) or []
+
+    def get_revision(self, url: str, selector: str, revision: int) -> Optional[str]:
+        return self.read_revision(WebsiteRevisionHistoryOnS3._prefix(url, selector), str(revision))
+
+    def read_revision(self, revision_key: str, version: str) -> Optional[str]:
+        for entry in self._load_index(revision_key) or []:
+            if str(entry.revision) == version:
+                return self._reconstruct(revision_key, entry)
+        return None
+
+    def get(self, url: str, selector: str) -> Optional[str]:
+        prefix = WebsiteRevisionHistoryOnS3._prefix(url, selector)
+        entries = self._cached_index(prefix)
+        if not entries:
+            return self._legacy.get(url, selector)
+        return self._reconstruct(prefix, entries[-1])
+
+    def get_info(self, url: str, selector: str) -> Optional[RevisionInfo]:
+        entries = self._load_index(WebsiteRevisionHistoryOnS3._prefix(url, selector))
+        if not entries:
+            legacy_info = self._legacy.get_info(url, selector)
+            return dataclasses.replace(legacy_info, version='0') if legacy_info is not None else None
+        latest = entries[-1]
+        return RevisionInfo(
+            digest=latest.digest,
+            fingerprint=int(latest.fingerprint, 16) if latest.fingerprint is not None else None,
+            version=str(latest.revision),
+        )
+
+    def revision_key(self, url: str, selector: str) -> Optional[str]:
+        return WebsiteRevisionHistoryOnS3._prefix(url, selector)
+
+    def get_many(self, targets: List[Tuple[str, str]]) -> List[Optional[str]]:
+        return map_concurrently(lambda t: self.get(*t), targets)
+
+    def get_info_many(self, targets: List[Tuple[str, str]]) -> List[Optional[RevisionInfo]]:
+        return map_concurrently(lambda t: self.get_info(*t), targets)
+
+    def update_many(self, revisions: List[Tuple[str, str, str, Optional[str], Optional[int]]]) -> List[Optional[str]]:
+        return map_concurrently(lambda r: self.update(*r), revisions)
+
+    def _append(
+        self,
+        prefix: str,
+        entries: List[RevisionEntry],
+        text: str,
+        digest: str,
+        fingerprint: Optional[int]
+    ) -> RevisionEntry:
+        revision = entries[-1].revision + 1 if entries else 0
+        created_at = int(time.time())
+        fingerprint_hex = f'{fingerprint:016x}' if fingerprint is not None else None
+        full = zlib.compress(text.encode('utf-8'), 9)
+        body = full
+        keyframe = revision
+        latest = entries[-1] if entries else None
+        if latest is not None and revision - latest.keyframe < self._keyframe_interval:
+            base = self._keyframe_text(prefix, latest)
+            delta = zlib.compress(json.dumps(encode_delta(base, text), ensure_ascii=False).encode('utf-8'), 9)
+            if len(delta) <= len(full) * self._max_delta_ratio:
+                body = delta
+                keyframe = latest.keyframe
+        entry = RevisionEntry(revision, created_at, digest, keyframe, len(text), len(body), fingerprint_hex)
+        self._put_revision(prefix, entry, body)
+        if entry.is_keyframe:
+            self._remember_keyframe(prefix, entry.revision, text)
+        entries.append(entry)
+        return entry
+
+    def _prune(self, entries: List[RevisionEntry]) -> Tuple[List[RevisionEntry], List[RevisionEntry]]:
+        removed: List[RevisionEntry] = []
+        while len(entries) > self._max_revisions:
+            next_keyframe = next((i for i, e in enumerate(entries) if i > 0 and e.is_keyframe), None)
+            if next_keyframe is None:
+                break
+            removed.extend(entries[:next_keyframe])
+            entries = entries[next_keyframe:]
+        return entries, removed
+
+    def update(
+        self,
+        url: str,
+        selector: str,
+        selected_source: str,
+        digest: Optional[str] = None,
+        fingerprint: Optional[int] = None
+    ) -> Optional[str]:
+        prefix = WebsiteRevisionHistoryOnS3._prefix(url, selector)
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:WebsiteRevisionHistoryOnS3:update',
+            'details': {
+                'url': url,
+                'selector': selector,
+                'prefix': prefix,
+            }
+        }, ensure_ascii=False))
+        entries = self._cached_index(prefix)
+        kept = list(entries or [])
+        migrated = False
+        if entries is None:
+            legacy_info = self._legacy.get_info(url, selector)
+            if legacy_info is not None:
+                legacy_text = legacy_info.text if legacy_info.text is not None else self._legacy.get(url, selector)
+                if legacy_text is not None:
+                    legacy_digest = legacy_info.digest or text_digest(legacy_text)
+                    self._append(prefix, kept, legacy_text, legacy_digest, legacy_info.fingerprint)
+                    migrated = True
+        entry = self._append(prefix, kept, selected_source, digest or text_digest(selected_source), fingerprint)
+        kept, removed = self._prune(kept)
+        self._save_index(prefix, kept)
+        self._remember_index(prefix, kept)
+        self._delete_revisions(prefix, removed)
+        if migrated:
+            self._legacy.delete(url, selector)
+        return str(entry.revision)
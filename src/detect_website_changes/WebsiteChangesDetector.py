@@ -3,15 +3,68 @@
 from __future__ import annotations
 
 import json
+import difflib
 import hashlib
+import dataclasses
 
 from abc import *
-from typing import Optional
+from typing import Optional, List, Dict, Tuple
 from logging import Logger
 from botocore.exceptions import ClientError
-from WebDriverWrapper import WebDriverWrapper
+from PageFetcher import PageFetcher, FetchOptions
+from WaitStrategies import Deadline
+from WebDriverWrapper import FindElementTimeout, WebDriverWrapperFindElementResult
 
-from WebMonitor import DetectWebsiteChangesResult
+from WebMonitor import DetectWebsiteChangesResult, changed_chars
+from ChangeSignificance import Normalizer, simhash, similarity
+from ConcurrentStorage import pooled_s3_client, map_concurrently
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class ChangeSummary:
+    diff: str
+    diff_truncated: bool
+    chars_added: int
+    chars_removed: int
+
+
+def summarize_changes(
+    previous: str,
+    current: str,
+    max_lines: int = 50,
+    max_chars: int = 8 * 1024,
+    context_lines: int = 1
+) -> ChangeSummary:
+    lines: List[str] = []
+    size = 0
+    truncated = False
+    diff = difflib.unified_diff(
+        previous.splitlines(), current.splitlines(), 'previous', 'current', n=context_lines, lineterm='')
+    for line in diff:
+        if len(lines) >= max_lines or size + len(line) + 1 > max_chars:
+            truncated = True
+            break
+        lines.append(line)
+        size += len(line) + 1
+    chars_added, chars_removed = changed_chars(previous, current)
+    return ChangeSummary('\n'.join(lines), truncated, chars_added, chars_removed)
+
+
+@dataclasses.dataclass(frozen=True)
+class RevisionInfo:
+    digest: Optional[str]
+    fingerprint: Optional[int] = None
+    version: Optional[str] = None
+    text: Optional[str] = None
+
+    def normalized_digest(self, normalizer: Normalizer) -> Optional[str]:
+        if self.digest is not None or self.text is None:
+            return self.digest
+        return text_digest(normalizer.normalize(self.text))
 
 
 class WebsiteRevisions(metaclass=ABCMeta):
@@ -19,8 +72,34 @@ class WebsiteRevisions(metaclass=ABCMeta):
     def get(self, url: str, selector: str) -> Optional[str]:
         pass
 
+    def get_info(self, url: str, selector: str) -> Optional[RevisionInfo]:
+        text = self.get(url, selector)
+        return RevisionInfo(None, text=text) if text is not None else None
+
+    def revision_key(self, url: str, selector: str) -> Optional[str]:
+        return None
+
+    def read_revision(self, revision_key: str, version: str) -> Optional[str]:
+        return None
+
+    def get_many(self, targets: List[Tuple[str, str]]) -> List[Optional[str]]:
+        return [self.get(url, selector) for url, selector in targets]
+
+    def get_info_many(self, targets: List[Tuple[str, str]]) -> List[Optional[RevisionInfo]]:
+        return [self.get_info(url, selector) for url, selector in targets]
+
+    def update_many(self, revisions: List[Tuple[str, str, str, Optional[str], Optional[int]]]) -> List[Optional[str]]:
+        return [self.update(*r) for r in revisions]
+
     @abstractmethod
-    def update(self, url: str, selector: str, selected_source: str):
+    def update(
+        self,
+        url: str,
+        selector: str,
+        selected_source: str,
+        digest: Optional[str] = None,
+        fingerprint: Optional[int] = None
+    ) -> Optional[str]:
         pass
 
 
@@ -28,6 +107,7 @@ class WebsiteRevisionsOnS3(WebsiteRevisions):
     def __init__(self, s3_bucket, logger: Logger):
         self._bucket = s3_bucket
         self._logger = logger
+        self._client = pooled_s3_client()
 
     @staticmethod
     def _object_key(url: str, selector: str):
@@ -35,7 +115,8 @@ class WebsiteRevisionsOnS3(WebsiteRevisions):
 
     def get(self, url: str, selector: str) -> Optional[str]:
         try:
-            res = self._bucket.Object(WebsiteRevisionsOnS3._object_key(url, selector)).get()
+            object_key = WebsiteRevisionsOnS3._object_key(url, selector)
+            res = self._client.get_object(Bucket=self._bucket.name, Key=object_key)
             return res['Body'].read().decode('utf-8')
         except ClientError as e:
             error_code = e.response['Error']['Code']
@@ -43,7 +124,53 @@ class WebsiteRevisionsOnS3(WebsiteRevisions):
                 raise e
             return None
 
-    def update(self, url: str, selector: str, selected_source: str):
+    def get_info(self, url: str, selector: str) -> Optional[RevisionInfo]:
+        res = self._head(url, selector)
+        if res is None:
+            return None
+        metadata = res.get('Metadata', {})
+        digest = metadata.get('sha256')
+        if digest is None:
+            text = self.get(url, selector)
+            return RevisionInfo(None, version=res.get('VersionId'), text=text) if text is not None else None
+        fingerprint = metadata.get('simhash')
+        return RevisionInfo(
+            digest=digest,
+            fingerprint=int(fingerprint, 16) if fingerprint is not None else None,
+            version=res.get('VersionId'),
+        )
+
+    def _head(self, url: str, selector: str) -> Optional[dict]:
+        object_key = WebsiteRevisionsOnS3._object_key(url, selector)
+        try:
+            return self._client.head_object(Bucket=self._bucket.name, Key=object_key)
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code not in ('404', 'NoSuchKey'):
+                raise e
+            return None
+
+    def revision_key(self, url: str, selector: str) -> Optional[str]:
+        return WebsiteRevisionsOnS3._object_key(url, selector)
+
+    def read_revision(self, revision_key: str, version: str) -> Optional[str]:
+        try:
+            res = self._client.get_object(Bucket=self._bucket.name, Key=revision_key, VersionId=version)
+            return res['Body'].read().decode('utf-8')
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code not in ('NoSuchKey', 'NoSuchVersion'):
+                raise e
+            return None
+
+    def update(
+        self,
+        url: str,
+        selector: str,
+        selected_source: str,
+        digest: Optional[str] = None,
+        fingerprint: Optional[int] = None
+    ) -> Optional[str]:
         object_key = WebsiteRevisionsOnS3._object_key(url, selector)
         self._logger.info(json.dumps({
             'event': 'web-monitor:WebsiteRevisionsOnS3:update',
@@ -53,29 +180,126 @@ class WebsiteRevisionsOnS3(WebsiteRevisions):
                 'object_key': object_key,
             }
         }, ensure_ascii=False))
-        self._bucket.Object(object_key).put(
+        metadata = {'sha256': digest or text_digest(selected_source)}
+        if fingerprint is not None:
+            metadata['simhash'] = f'{fingerprint:016x}'
+        res = self._client.put_object(
+            Bucket=self._bucket.name,
+            Key=object_key,
             Body=selected_source.encode('utf-8'),
             ContentEncoding='utf-8',
-            ContentType='text/plane'
+            ContentType='text/plain',
+            Metadata=metadata
         )
+        return res.get('VersionId')
+
+    def delete(self, url: str, selector: str):
+        self._client.delete_object(Bucket=self._bucket.name, Key=WebsiteRevisionsOnS3._object_key(url, selector))
+
+    def get_many(self, targets: List[Tuple[str, str]]) -> List[Optional[str]]:
+        return map_concurrently(lambda t: self.get(*t), targets)
+
+    def get_info_many(self, targets: List[Tuple[str, str]]) -> List[Optional[RevisionInfo]]:
+        return map_concurrently(lambda t: self.get_info(*t), targets)
+
+    def update_many(self, revisions: List[Tuple[str, str, str, Optional[str], Optional[int]]]) -> List[Optional[str]]:
+        return map_concurrently(lambda r: self.update(*r), revisions)
+
+
+@dataclasses.dataclass(frozen=True)
+class SelectorCheck:
+    selector: str
+    title: Optional[str] = None
+    normalizer: Normalizer = Normalizer()
+    similarity_threshold: Optional[float] = None
 
 
 class WebsiteChangesDetector:
-    def __init__(self, driver: WebDriverWrapper, revisions: WebsiteRevisions):
-        self._driver = driver
+    def __init__(self, fetcher: PageFetcher, revisions: WebsiteRevisions, diff_max_lines: int = 50):
+        self._fetcher = fetcher
         self._revisions = revisions
+        self._diff_max_lines = diff_max_lines
 
-    def detect_changes(self, url: str, selector: str, title: Optional[str]) -> DetectWebsiteChangesResult:
-        current = self._driver.find_element(url, selector)
-        latest_revision = self._revisions.get(url, selector)
-        has_changed = current.selected_text != latest_revision
-        if has_changed:
-            self._revisions.update(url, selector, current.selected_text)
-        return DetectWebsiteChangesResult(
-            url=current.url,
-            selector=current.selector,
-            title=title or current.title,
-            has_changed=has_changed,
-            text_previous=latest_revision,
-            text_current=current.selected_text,
-        )
+    def detect_changes(
+        self,
+        url: str,
+        selector: str,
+        title: Optional[str],
+        options: FetchOptions = FetchOptions(),
+        deadline: Optional[Deadline] = None,
+        normalizer: Normalizer = Normalizer(),
+        similarity_threshold: Optional[float] = None
+    ) -> DetectWebsiteChangesResult:
+        check = SelectorCheck(selector, title, normalizer, similarity_threshold)
+        return self.detect_changes_many(url, [check], options, deadline)[0]
+
+    def detect_changes_many(
+        self,
+        url: str,
+        checks: List[SelectorCheck],
+        options: FetchOptions = FetchOptions(),
+        deadline: Optional[Deadline] = None
+    ) -> List[DetectWebsiteChangesResult]:
+        found = self._fetcher.find_elements(url, [c.selector for c in checks], options, deadline)
+        results: Dict[int, DetectWebsiteChangesResult] = {}
+        fetched: Dict[int, WebDriverWrapperFindElementResult] = {}
+        for i, (check, current) in enumerate(zip(checks, found)):
+            if isinstance(current, FindElementTimeout):
+                results[i] = DetectWebsiteChangesResult(url=url, selector=check.selector, title=check.title,
+                                                        timed_out=True)
+            else:
+                fetched[i] = current
+        infos = self._revisions.get_info_many([(url, checks[i].selector) for i in fetched])
+        changed = []
+        for (i, current), latest in zip(fetched.items(), infos):
+            check = checks[i]
+            normalized = check.normalizer.normalize(current.selected_text)
+            current_digest = text_digest(normalized)
+            previous_digest = latest.normalized_digest(check.normalizer) if latest is not None else None
+            has_changed = latest is None or current_digest != previous_digest
+            result = DetectWebsiteChangesResult(
+                url=current.url,
+                selector=current.selector,
+                title=check.title or current.title,
+                has_changed=has_changed,
+                digest_previous=previous_digest,
+                digest_current=current_digest,
+                revision_key=self._revisions.revision_key(url, check.selector),
+                version_previous=latest.version if latest is not None else None,
+            )
+            results[i] = result
+            if not has_changed:
+                continue
+            fingerprint = simhash(normalized) if check.similarity_threshold is not None else None
+            if fingerprint is not None and latest is not None and latest.fingerprint is not None:
+                assert check.similarity_threshold is not None
+                s = similarity(fingerprint, latest.fingerprint)
+                if s >= check.similarity_threshold:
+                    results[i] = dataclasses.replace(result, has_changed=False, similarity=s)
+                    continue
+                results[i] = dataclasses.replace(result, similarity=s)
+            changed.append((i, latest, current_digest, fingerprint))
+        if not changed:
+            return [results[i] for i in range(len(checks))]
+        latest_revisions = {i: latest.text for i, latest, _, _ in changed if latest is not None}
+        previous = [i for i, text in latest_revisions.items() if text is None]
+        latest_revisions.update(zip(previous, self._revisions.get_many([(url, checks[i].selector) for i in previous])))
+        versions = self._revisions.update_many([
+            (url, checks[i].selector, fetched[i].selected_text, current_digest, fingerprint)
+            for i, _, current_digest, fingerprint in changed
+        ])
+        for (i, _, _, _), version_current in zip(changed, versions):
+            selected_text = fetched[i].selected_text
+            latest_revision = latest_revisions.get(i, None)
+            summary = None
+            if latest_revision is not None:
+                summary = summarize_changes(latest_revision, selected_text, self._diff_max_lines)
+            results[i] = dataclasses.replace(
+                results[i],
+                diff=summary.diff if summary is not None else None,
+                diff_truncated=summary.diff_truncated if summary is not None else False,
+                chars_added=summary.chars_added if summary is not None else len(selected_text),
+                chars_removed=summary.chars_removed if summary is not None else 0,
+                version_current=version_current,
+            )
+        return [results[i] for i in range(len(checks))]
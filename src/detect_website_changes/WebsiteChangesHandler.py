@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import logging
+import dataclasses
+from typing import Optional, List
+
+from WebMonitor import DetectWebsiteChangesEvent
+from MessageEnvelope import MessageEnvelope
+from EventRecords import EventRecord
+from TargetSchedules import TargetSchedules, site_target_id
+from WebsiteChangesDetector import WebsiteChangesDetector, DetectWebsiteChangesResult, SelectorCheck
+from PageFetcher import FetchOptions
+from WaitStrategies import Deadline
+from ChangeSignificance import Normalizer
+
+
+@dataclasses.dataclass(frozen=True)
+class DetectWebsiteChangesConfig:
+    sns_client: any
+    next_topic: str
+    logger: logging.Logger
+    schedules: Optional[TargetSchedules] = None
+    envelope: Optional[MessageEnvelope] = None
+
+
+def parse_events(event: dict) -> List[DetectWebsiteChangesEvent]:
+    events = []
+    for record in event.get('Records', []):
+        try:
+            e = DetectWebsiteChangesEvent.from_message(EventRecord.from_record(record).message)
+        except (KeyError, ValueError):
+            continue
+        if e is not None:
+            events.append(e)
+    return events
+
+
+def handle(
+    event: DetectWebsiteChangesEvent,
+    changes_detector: WebsiteChangesDetector,
+    config: DetectWebsiteChangesConfig,
+    deadline: Optional[Deadline] = None
+) -> List[DetectWebsiteChangesResult]:
+    options = FetchOptions.build(event.fetch_mode, event.load_profile, event.wait)
+    checks = [
+        SelectorCheck(s.selector, s.title, Normalizer.from_dict(s.normalize), s.similarity_threshold)
+        for s in event.site_selectors
+    ]
+    results = changes_detector.detect_changes_many(event.url, checks, options, deadline)
+    for check, result in zip(checks, results):
+        if result.timed_out:
+            continue
+        if result.has_changed and result.digest_previous is not None:
+            notify_message(config.sns_client, config.next_topic, dataclasses.asdict(result), config.logger,
+                           config.envelope)
+        if event.adaptive_schedule and config.schedules is not None:
+            config.schedules.report(site_target_id(event.url, check.selector), result.has_changed)
+    return results
+
+
+def notify_message(
+    sns,
+    topic: str,
+    message: dict,
+    logger: logging.Logger,
+    message_envelope: Optional[MessageEnvelope] = None
+):
+    if message_envelope is not None:
+        j = message_envelope.wrap(message)
+    else:
+        j = json.dumps(message, ensure_ascii=False)
+    res = sns.publish(
+        TopicArn=topic,
+        Message=j,
+    )
+    summary = {k: v for k, v in message.items() if k != 'diff'}
+    summary['diff_lines'] = len(message['diff'].splitlines()) if message.get('diff') else 0
+    logger.info(json.dumps({
+        'event': 'web-monitor:detect_website_changes:notify_message:message_id',
+        'details': {'message': summary, 'message_bytes': len(j.encode('utf-8')), 'message_id': res.get('MessageId')}
+    }, ensure_ascii=False))
@@ -7,28 +7,30 @@ import json
 import boto3
 import logging
 import dataclasses
-from typing import Optional
+from typing import Optional, List
 
 from WebMonitor import DetectWebsiteChangesEvent
-from WebsiteChangesDetector import WebsiteRevisionsOnS3
-from WebsiteChangesDetector import WebsiteChangesDetector, DetectWebsiteChangesResult
-from WebDriverWrapper import WebDriverWrapper
+from MessageEnvelope import MessageEnvelope
+from EventRecords import EventRecord, process_records
+from TargetSchedules import TargetSchedulesOnS3
+from RevisionHistory import WebsiteRevisionHistoryOnS3
+from WebsiteChangesDetector import WebsiteChangesDetector
+from BrowserManager import BrowserManager
+from PageFetcher import PageFetcher
+from WaitStrategies import Deadline
+from WebsiteChangesHandler import DetectWebsiteChangesConfig, parse_events, handle
 
 stage = os.environ['Stage']
 bucket_name = os.environ['WebMonitorBucket']
 next_topic = os.environ['NextTopic']
 bucket = boto3.resource('s3').Bucket(bucket_name)
+envelope = MessageEnvelope(bucket)
+browser = BrowserManager()
+fetcher: Optional[PageFetcher] = None
 detector: Optional[WebsiteChangesDetector] = None
 
 
-@dataclasses.dataclass(frozen=True)
-class DetectWebsiteChangesConfig:
-    sns_client: any
-    next_topic: str
-    logger: logging.Logger
-
-
-def lambda_handler(event, _) -> dict:
+def lambda_handler(event, context) -> dict:
     logger = logging.getLogger(__name__)
     handler = logging.StreamHandler()
     log_level = getattr(logging, 'INFO', None)
@@ -37,54 +39,32 @@ def lambda_handler(event, _) -> dict:
     logger.handlers = [handler]
     logger.propagate = False
 
-    record = event['Records'][0]
-    sns = record['Sns']
-    message_id = sns['MessageId']
-    message = json.loads(sns['Message'])
-    logger.info(json.dumps({
-        'event': 'web-monitor:detect_website_changes:lambda_handler',
-        'details': {
-            'message_id': message_id,
-            'message': message,
-        }
-    }, ensure_ascii=False))
-
-    e = DetectWebsiteChangesEvent.from_message(message)
-    global detector
+    global detector, fetcher
+    if fetcher is None:
+        fetcher = PageFetcher(browser)
     if detector is None:
-        driver = WebDriverWrapper()
-        revisions = WebsiteRevisionsOnS3(bucket, logger)
-        detector = WebsiteChangesDetector(driver, revisions)
+        revisions = WebsiteRevisionHistoryOnS3(bucket, logger)
+        detector = WebsiteChangesDetector(fetcher, revisions)
+    changes_detector = detector
     sns_client = boto3.client('sns')
-    config = DetectWebsiteChangesConfig(sns_client, next_topic, logger)
-    result = dataclasses.asdict(handle(e, detector, config))
-    logger.info(json.dumps({
-        'event': 'web-monitor:detect_website_changes:lambda_handler:result',
-        'details': {
-            'result': result,
-        }
-    }, ensure_ascii=False))
-    return result
-
-
-def handle(
-    event: DetectWebsiteChangesEvent,
-    changes_detector: WebsiteChangesDetector,
-    config: DetectWebsiteChangesConfig
-) -> DetectWebsiteChangesResult:
-    result = changes_detector.detect_changes(event.url, event.selector, event.title)
-    if result.has_changed and result.text_previous is not None:
-        notify_message(config.sns_client, config.next_topic, dataclasses.asdict(result), config.logger)
-    return result
+    config = DetectWebsiteChangesConfig(sns_client, next_topic, logger, TargetSchedulesOnS3(bucket, logger), envelope)
+    deadline = Deadline.from_lambda_context(context)
+    static_urls = [e.url for e in parse_events(event) if e.fetch_mode != 'browser']
+    fetcher.prefetch(static_urls, deadline)
 
+    def process(record: EventRecord) -> List[dict]:
+        if deadline.expired:
+            raise TimeoutError(f'no time left for {record.message_id}')
+        e = DetectWebsiteChangesEvent.from_message(record.message)
+        if e is None:
+            raise ValueError(f'invalid message: {record.message_id}')
+        results = [dataclasses.asdict(r) for r in handle(e, changes_detector, config, deadline)]
+        logger.info(json.dumps({
+            'event': 'web-monitor:detect_website_changes:lambda_handler:result',
+            'details': {
+                'results': results,
+            }
+        }, ensure_ascii=False))
+        return results
 
-def notify_message(sns, topic: str, message: dict, logger: logging.Logger):
-    j = json.dumps(message, ensure_ascii=False)
-    res = sns.publish(
-        TopicArn=topic,
-        Message=j,
-    )
-    logger.info(json.dumps({
-        'event': 'web-monitor:detect_website_changes:notify_message:message_id',
-        'details': {'message': message, 'return': res}
-    }, ensure_ascii=False))
+    return process_records(event, process, logger, 'web-monitor:detect_website_changes:lambda_handler')
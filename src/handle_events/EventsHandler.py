@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import logging
+import dataclasses
+from typing import List
+
+from WebMonitorConfig import WebMonitorConfig
+from WebMonitor import DetectWebsiteChangesResult, DetectRSSEntryResult
+from EventRecords import EventRecord, process_records
+from NotificationDigest import PendingNotification, coalesce, render_fitted
+
+
+@dataclasses.dataclass(frozen=True)
+class HandleEventsConfig:
+    sns_client: any
+    tweet_topic: str
+    logger: logging.Logger
+
+
+def handle(event: dict, monitor_config: WebMonitorConfig, handle_config: HandleEventsConfig) -> dict:
+    logger = handle_config.logger
+    digest = monitor_config.digest
+    pending: List[PendingNotification] = []
+
+    def process(record: EventRecord) -> dict:
+        message = record.message
+        t = message['type']
+        p = None
+        if t == 'DetectWebsiteChangesResult':
+            site = DetectWebsiteChangesResult.from_message(message)
+            p = PendingNotification.from_website_changes(site, record.message_id)
+        if t == 'DetectRSSEntryResult':
+            entry = DetectRSSEntryResult(**message)
+            p = PendingNotification.from_rss_entry(entry, record.message_id, digest.group_by)
+        if p is not None:
+            pending.append(p)
+        return {}
+
+    result = process_records(event, process, logger, 'web-monitor:handle_events:lambda_handler')
+    for batch in coalesce(pending, digest.max_items if digest.enabled else 1):
+        try:
+            for status in render_fitted(batch, monitor_config, digest):
+                notify_message(handle_config.sns_client, handle_config.tweet_topic, {'status': status}, logger)
+        except Exception as e:
+            logger.exception(json.dumps({
+                'event': 'web-monitor:handle_events:lambda_handler:notify_error',
+                'details': {
+                    'message_ids': [p.message_id for p in batch],
+                    'error': repr(e),
+                }
+            }, ensure_ascii=False))
+            if any(r.get('eventSource') != 'aws:sqs' for r in event.get('Records', [])):
+                raise e
+            result['batchItemFailures'].extend({'itemIdentifier': p.message_id} for p in batch)
+    return result
+
+
+def notify_message(sns, topic: str, message: dict, logger: logging.Logger):
+    j = json.dumps(message, ensure_ascii=False)
+    res = sns.publish(
+        TopicArn=topic,
+        Message=j,
+    )
+    logger.info(json.dumps({
+        'event': 'web_monitor:handle_events:notify_message:message_id',
+        'details': {'message': message, 'return': res}
+    }, ensure_ascii=False))
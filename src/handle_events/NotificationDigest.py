@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import string
+import dataclasses
+
+from collections import OrderedDict
+from typing import Optional, List, Dict, Tuple
+
+from WebMonitorConfig import WebMonitorConfig, DigestConfig
+from WebMonitor import DetectWebsiteChangesResult, DetectRSSEntryResult
+
+KIND_SITE = 'site'
+KIND_RSS = 'rss'
+
+_MAX_TEMPLATES = 64
+
+_templates_version: Optional[str] = None
+_templates: Dict[Tuple[str, str], string.Template] = {}
+
+
+def compiled_template(monitor_config: WebMonitorConfig, name: str, source: str) -> string.Template:
+    global _templates_version
+    if monitor_config.version != _templates_version or len(_templates) >= _MAX_TEMPLATES:
+        _templates.clear()
+        _templates_version = monitor_config.version
+    key = (name, source)
+    template = _templates.get(key)
+    if template is None:
+        template = string.Template(source)
+        _templates[key] = template
+    return template
+
+
+@dataclasses.dataclass(frozen=True)
+class PendingNotification:
+    kind: str
+    group_key: Tuple[str, str]
+    url: str
+    fields: dict
+    message_id: str
+    dedupe_key: Tuple[Optional[str], ...] = ()
+
+    @staticmethod
+    def from_website_changes(
+        event: DetectWebsiteChangesResult,
+        message_id: str
+    ) -> Optional[PendingNotification]:
+        if not event.has_changed or event.digest_previous is None:
+            return None
+        return PendingNotification(
+            kind=KIND_SITE,
+            group_key=('target', event.url),
+            url=event.url,
+            fields={
+                'title': event.title,
+                'url': event.url,
+                'chars_added': event.chars_added,
+                'chars_removed': event.chars_removed,
+            },
+            message_id=message_id,
+            dedupe_key=(event.url, event.selector),
+        )
+
+    @staticmethod
+    def from_rss_entry(event: DetectRSSEntryResult, message_id: str, group_by: str) -> PendingNotification:
+        if group_by == 'keyword':
+            group_key = ('keyword', event.matched_keyword)
+        else:
+            group_key = ('target', event.feed_url)
+        return PendingNotification(
+            kind=KIND_RSS,
+            group_key=group_key,
+            url=event.url,
+            fields={
+                'title': event.title,
+                'url': event.url,
+                'feed_url': event.feed_url,
+                'selector': event.selector,
+                'matched_keyword': event.matched_keyword,
+                'matched_stage': event.matched_stage,
+            },
+            message_id=message_id,
+            dedupe_key=(event.url,),
+        )
+
+
+def coalesce(pending: List[PendingNotification], max_items: int) -> List[List[PendingNotification]]:
+    groups: OrderedDict[Tuple[str, Tuple[str, str]], List[PendingNotification]] = OrderedDict()
+    seen = set()
+    for p in pending:
+        if p.dedupe_key in seen:
+            continue
+        seen.add(p.dedupe_key)
+        groups.setdefault((p.kind, p.group_key), []).append(p)
+    batches = []
+    for items in groups.values():
+        for i in range(0, len(items), max(1, max_items)):
+            batches.append(items[i:i + max_items])
+    return batches
+
+
+def render(batch: List[PendingNotification], monitor_config: WebMonitorConfig, digest: DigestConfig) -> str:
+    first = batch[0]
+    if len(batch) == 1:
+        if first.kind == KIND_SITE:
+            template = compiled_template(monitor_config, 'site_template', monitor_config.site_template)
+        else:
+            template = compiled_template(monitor_config, 'rss_template', monitor_config.rss_template)
+        return template.substitute(first.fields).strip("\"")
+    item_template = compiled_template(monitor_config, 'digest_item_template', digest.item_template)
+    template = compiled_template(monitor_config, 'digest_template', digest.template)
+    items = '\n'.join(item_template.safe_substitute(p.fields) for p in batch)
+    return template.safe_substitute({
+        'count': len(batch),
+        'group': first.group_key[1],
+        'items': items,
+    }).strip("\"")
+
+
+def render_fitted(
+    batch: List[PendingNotification],
+    monitor_config: WebMonitorConfig,
+    digest: DigestConfig
+) -> List[str]:
+    status = render(batch, monitor_config, digest)
+    if len(batch) == 1 or len(status) <= digest.max_length:
+        return [status]
+    half = len(batch) // 2
+    return render_fitted(batch[:half], monitor_config, digest) + render_fitted(batch[half:], monitor_config, digest)
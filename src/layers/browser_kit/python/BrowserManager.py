@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import os
+import json
+import glob
+import logging
+from typing import Callable, Optional
+from WebDriverWrapper import WebDriverWrapper, LoadProfile
+
+
+def _memory_usage_mb() -> int:
+    total_kb = 0
+    for path in glob.glob('/proc/[0-9]*/status'):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb // 1024
+
+
+def _default_memory_limit_mb() -> Optional[int]:
+    memory_size = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+    return int(int(memory_size) * 0.8) if memory_size else None
+
+
+class BrowserManager:
+    def __init__(
+        self,
+        driver_factory: Callable[[LoadProfile], WebDriverWrapper] = WebDriverWrapper,
+        max_page_loads: int = 50,
+        max_memory_mb: Optional[int] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        self._driver_factory = driver_factory
+        self._max_page_loads = max_page_loads
+        self._max_memory_mb = max_memory_mb or _default_memory_limit_mb()
+        self._logger = logger or logging.getLogger(__name__)
+        self._driver: Optional[WebDriverWrapper] = None
+
+    def _recycle_reason(self, driver: WebDriverWrapper, load_profile: LoadProfile) -> Optional[str]:
+        if driver.load_profile.launch_options != load_profile.launch_options:
+            return 'load_profile'
+        if driver.page_loads >= self._max_page_loads:
+            return 'page_loads'
+        if self._max_memory_mb is not None and _memory_usage_mb() >= self._max_memory_mb:
+            return 'memory'
+        if not driver.is_alive():
+            return 'unhealthy'
+        return None
+
+    def acquire(self, load_profile: LoadProfile = LoadProfile()) -> WebDriverWrapper:
+        if self._driver is not None:
+            reason = self._recycle_reason(self._driver, load_profile)
+            if reason is None:
+                if self._driver.clear_state():
+                    self._driver.apply_load_profile(load_profile)
+                    return self._driver
+                reason = 'state'
+            self._logger.info(json.dumps({
+                'event': 'web-monitor:BrowserManager:recycle',
+                'details': {
+                    'reason': reason,
+                    'page_loads': self._driver.page_loads,
+                }
+            }, ensure_ascii=False))
+            self.close()
+        self._driver = self._driver_factory(load_profile)
+        return self._driver
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
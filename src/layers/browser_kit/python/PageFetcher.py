@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import time
+import requests
+import dataclasses
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag, NavigableString, Comment, Declaration, Doctype, ProcessingInstruction
+from typing import Optional, List, Dict
+from AsyncFetchEngine import AsyncFetchEngine, FetchRequest, FetchResponse
+from HttpClient import HttpClient, HttpStatusError, shared_client, is_timeout
+from BrowserManager import BrowserManager
+from WebDriverWrapper import WebDriverWrapper, WebDriverWrapperFindElementResult, LoadProfile
+from WebDriverWrapper import FindElementTimeout, FindElementResult, normalize_text
+from WaitStrategies import Deadline, WaitStrategy, SelectorPresent, wait_strategy_from_dict
+
+FETCH_MODE_STATIC = 'static'
+FETCH_MODE_BROWSER = 'browser'
+FETCH_MODE_AUTO = 'auto'
+FETCH_MODES = (FETCH_MODE_STATIC, FETCH_MODE_BROWSER, FETCH_MODE_AUTO)
+
+_BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'dd', 'details', 'dialog', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main',
+    'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table', 'tr', 'ul',
+])
+_HIDDEN_TAGS = frozenset(['head', 'noscript', 'script', 'style', 'template'])
+_IGNORED_STRINGS = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+
+def visible_text(element: Tag) -> str:
+    parts = []
+    stack: list = list(reversed(list(element.children)))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, NavigableString):
+            if not isinstance(node, _IGNORED_STRINGS):
+                parts.append(str(node))
+        elif not isinstance(node, Tag):
+            parts.append(node)
+        elif node.name == 'br':
+            parts.append('\n')
+        elif node.name not in _HIDDEN_TAGS:
+            separator = '\n' if node.name in _BLOCK_TAGS else ' ' if node.name in ('td', 'th') else ''
+            stack.append(separator)
+            stack.extend(reversed(list(node.children)))
+            stack.append(separator)
+    return normalize_text(''.join(parts))
+
+
+@dataclasses.dataclass(frozen=True)
+class FetchOptions:
+    fetch_mode: str = FETCH_MODE_BROWSER
+    load_profile: LoadProfile = LoadProfile()
+    wait: WaitStrategy = SelectorPresent()
+    timeout_seconds: Optional[float] = None
+
+    @staticmethod
+    def build(fetch_mode: str, load_profile: Optional[dict], wait: Optional[dict]) -> FetchOptions:
+        return FetchOptions(
+            fetch_mode=fetch_mode,
+            load_profile=LoadProfile.from_dict(load_profile),
+            wait=wait_strategy_from_dict(wait),
+            timeout_seconds=(wait or {}).get('timeout_seconds', None),
+        )
+
+
+class ElementNotFoundError(Exception):
+    pass
+
+
+class StaticPageFetcher:
+    def __init__(
+        self,
+        client: Optional[HttpClient] = None,
+        timeout: float = 10,
+        engine: Optional[AsyncFetchEngine] = None
+    ):
+        self._client = client or shared_client()
+        self._timeout = timeout
+        self._engine = engine or AsyncFetchEngine(self._client, timeout=timeout)
+        self._prefetched: Dict[str, FetchResponse] = {}
+
+    @staticmethod
+    def parse(url: str, content: bytes, selector: str) -> FindElementResult:
+        return StaticPageFetcher.parse_many(url, content, [selector])[0]
+
+    @staticmethod
+    def parse_many(url: str, content: bytes, selectors: List[str]) -> List[FindElementResult]:
+        soup = BeautifulSoup(content, 'html.parser')
+        title = soup.title.get_text().strip() if soup.title else ''
+        results: List[FindElementResult] = []
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element is None:
+                raise ElementNotFoundError(f'{selector} is not found in {url}')
+            results.append(WebDriverWrapperFindElementResult(
+                url=url,
+                title=title,
+                selector=selector,
+                selected_text=visible_text(element),
+            ))
+        return results
+
+    def prefetch(self, urls: List[str], deadline: Optional[Deadline] = None):
+        self._prefetched.clear()
+        if not urls:
+            return
+        deadline = deadline or Deadline.after(self._timeout)
+        fetch_requests = [FetchRequest(url) for url in dict.fromkeys(urls)]
+        for res in self._engine.fetch_all(fetch_requests, timeout=min(self._timeout, deadline.remaining())):
+            if res.ok and res.status != 304:
+                self._prefetched[res.request.url] = res
+
+    def find_element(self, url: str, selector: str, deadline: Optional[Deadline] = None) -> FindElementResult:
+        return self.find_elements(url, [selector], deadline)[0]
+
+    def find_elements(
+        self,
+        url: str,
+        selectors: List[str],
+        deadline: Optional[Deadline] = None
+    ) -> List[FindElementResult]:
+        prefetched = self._prefetched.get(url)
+        if prefetched is not None:
+            return StaticPageFetcher.parse_many(prefetched.url, prefetched.body, selectors)
+        deadline = deadline or Deadline.after(self._timeout)
+        started = time.monotonic()
+        if deadline.expired:
+            return [FindElementTimeout(url, s, 0.0) for s in selectors]
+        try:
+            res = self._client.get(url, timeout=min(self._timeout, deadline.remaining()))
+        except requests.RequestException as e:
+            if not is_timeout(e):
+                raise
+            return [FindElementTimeout(url, s, time.monotonic() - started) for s in selectors]
+        res.raise_for_status()
+        return StaticPageFetcher.parse_many(res.url, res.body, selectors)
+
+
+class PageFetcher:
+    def __init__(self, browser: BrowserManager, static_fetcher: Optional[StaticPageFetcher] = None):
+        self._browser = browser
+        self._static_fetcher = static_fetcher or StaticPageFetcher()
+
+    def prefetch(self, urls: List[str], deadline: Optional[Deadline] = None):
+        self._static_fetcher.prefetch(urls, deadline)
+
+    def _driver(self, options: FetchOptions) -> WebDriverWrapper:
+        return self._browser.acquire(options.load_profile)
+
+    def find_element(
+        self,
+        url: str,
+        selector: str,
+        options: FetchOptions = FetchOptions(),
+        deadline: Optional[Deadline] = None
+    ) -> FindElementResult:
+        return self.find_elements(url, [selector], options, deadline)[0]
+
+    def find_elements(
+        self,
+        url: str,
+        selectors: List[str],
+        options: FetchOptions = FetchOptions(),
+        deadline: Optional[Deadline] = None
+    ) -> List[FindElementResult]:
+        deadline = (deadline or Deadline.after(20)).limit(options.timeout_seconds)
+        if options.fetch_mode == FETCH_MODE_BROWSER:
+            return self._driver(options).find_elements(url, selectors, options.wait, deadline)
+        if options.fetch_mode == FETCH_MODE_STATIC:
+            return self._static_fetcher.find_elements(url, selectors, deadline)
+        if options.fetch_mode == FETCH_MODE_AUTO:
+            try:
+                return self._static_fetcher.find_elements(url, selectors, deadline)
+            except (ElementNotFoundError, HttpStatusError):
+                return self._driver(options).find_elements(url, selectors, options.wait, deadline)
+        raise ValueError(f'unknown fetch_mode: {options.fetch_mode}')
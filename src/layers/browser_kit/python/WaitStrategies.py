@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import time
+
+from abc import *
+from typing import Any, Optional, Dict
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+_POLL_SECONDS = 0.1
+
+
+class Deadline:
+    def __init__(self, expires_at: float):
+        self._expires_at = expires_at
+
+    @staticmethod
+    def after(seconds: float) -> Deadline:
+        return Deadline(time.monotonic() + seconds)
+
+    @staticmethod
+    def from_lambda_context(context, reserve_seconds: float = 2.0, default_seconds: float = 20.0) -> Deadline:
+        try:
+            remaining = context.get_remaining_time_in_millis() / 1000
+        except AttributeError:
+            remaining = default_seconds
+        return Deadline.after(max(0.0, remaining - reserve_seconds))
+
+    def limit(self, seconds: Optional[float]) -> Deadline:
+        if seconds is None:
+            return self
+        return Deadline(min(self._expires_at, time.monotonic() + seconds))
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class WaitStrategy(metaclass=ABCMeta):
+    @abstractmethod
+    def wait(self, web_driver, selector: str, deadline: Deadline):
+        pass
+
+    @staticmethod
+    def _until(deadline: Deadline, condition):
+        while True:
+            if condition():
+                return
+            if deadline.expired:
+                raise TimeoutException()
+            time.sleep(min(_POLL_SECONDS, deadline.remaining()))
+
+
+class SelectorPresent(WaitStrategy):
+    def wait(self, web_driver, selector: str, deadline: Deadline):
+        WebDriverWait(web_driver, deadline.remaining(), poll_frequency=_POLL_SECONDS).until(
+            expected_conditions.presence_of_element_located((By.CSS_SELECTOR, selector)))
+
+
+class TextStable(WaitStrategy):
+    def __init__(self, stable_ms: int = 500):
+        self._stable_seconds = stable_ms / 1000
+
+    def wait(self, web_driver, selector: str, deadline: Deadline):
+        SelectorPresent().wait(web_driver, selector, deadline)
+        state: Dict[str, Any] = {'text': None, 'since': time.monotonic()}
+
+        def is_stable() -> bool:
+            try:
+                text = web_driver.find_element_by_css_selector(selector).text
+            except WebDriverException:
+                text = None
+            now = time.monotonic()
+            if text != state['text']:
+                state['text'] = text
+                state['since'] = now
+            return text is not None and now - state['since'] >= self._stable_seconds
+
+        try:
+            WaitStrategy._until(deadline, is_stable)
+        except TimeoutException:
+            if state['text'] is None:
+                raise
+
+
+class NetworkIdle(WaitStrategy):
+    _RESOURCE_COUNT_SCRIPT = (
+        "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1"
+    )
+
+    def __init__(self, idle_ms: int = 500):
+        self._idle_seconds = idle_ms / 1000
+
+    def wait(self, web_driver, selector: str, deadline: Deadline):
+        state: Dict[str, Any] = {'count': None, 'since': time.monotonic()}
+
+        def is_idle() -> bool:
+            count = web_driver.execute_script(NetworkIdle._RESOURCE_COUNT_SCRIPT)
+            now = time.monotonic()
+            if count != state['count']:
+                state['count'] = count
+                state['since'] = now
+            return count >= 0 and now - state['since'] >= self._idle_seconds
+
+        try:
+            WaitStrategy._until(deadline, is_idle)
+        except TimeoutException:
+            pass
+        SelectorPresent().wait(web_driver, selector, deadline)
+
+
+def wait_strategy_from_dict(dic: Optional[dict]) -> WaitStrategy:
+    dic = dic or {}
+    strategy = dic.get('strategy', 'selector')
+    if strategy == 'selector':
+        return SelectorPresent()
+    if strategy == 'text_stable':
+        return TextStable(dic.get('stable_ms', 500))
+    if strategy == 'network_idle':
+        return NetworkIdle(dic.get('idle_ms', 500))
+    raise ValueError(f'unknown wait strategy: {strategy}')
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import time
 import dataclasses
+from typing import Optional, List, Set, Tuple, Union
+from urllib.parse import urlsplit
 
 from selenium.webdriver import Chrome
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from WaitStrategies import Deadline, WaitStrategy, SelectorPresent
 
 
 @dataclasses.dataclass(frozen=True)
@@ -18,8 +20,73 @@ class WebDriverWrapperFindElementResult:
     selected_text: str
 
 
+@dataclasses.dataclass(frozen=True)
+class FindElementTimeout:
+    url: str
+    selector: str
+    elapsed: float
+
+
+FindElementResult = Union[WebDriverWrapperFindElementResult, FindElementTimeout]
+
+
+def normalize_text(text: str) -> str:
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+_SNAPSHOT_SCRIPT = '''
+return {
+    url: document.location.href,
+    title: document.title,
+    texts: arguments[0].map(function (selector) {
+        var element = document.querySelector(selector);
+        return element === null ? null : element.innerText;
+    })
+};
+'''
+
+
+_RESOURCE_TYPE_URL_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'stylesheet': ['*.css'],
+    'media': ['*.mp4', '*.webm', '*.mp3', '*.m4a', '*.m3u8'],
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadProfile:
+    page_load_strategy: str = 'normal'
+    disable_images: bool = False
+    blocked_url_patterns: Tuple[str, ...] = ()
+    blocked_resource_types: Tuple[str, ...] = ()
+
+    @staticmethod
+    def from_dict(dic: Optional[dict]) -> LoadProfile:
+        if not dic:
+            return LoadProfile()
+        return LoadProfile(
+            page_load_strategy=dic.get('page_load_strategy', 'normal'),
+            disable_images=dic.get('disable_images', False),
+            blocked_url_patterns=tuple(dic.get('blocked_url_patterns', [])),
+            blocked_resource_types=tuple(dic.get('blocked_resource_types', [])),
+        )
+
+    @property
+    def launch_options(self) -> Tuple[str, bool]:
+        return self.page_load_strategy, self.disable_images
+
+    @property
+    def blocked_urls(self) -> List[str]:
+        urls = list(self.blocked_url_patterns)
+        for t in self.blocked_resource_types:
+            urls.extend(_RESOURCE_TYPE_URL_PATTERNS.get(t, []))
+        return urls
+
+
 class WebDriverWrapper:
-    def __init__(self):
+    def __init__(self, load_profile: LoadProfile = LoadProfile()):
         options = Options()
         options.add_argument('--headless')
         options.add_argument("--log-level=0")
@@ -34,17 +101,113 @@ class WebDriverWrapper:
         options.add_argument("--single-process")
         options.add_argument("--ignore-certificate-errors")
         options.binary_location = "/opt/bin/headless-chromium"
+        options.set_capability('pageLoadStrategy', load_profile.page_load_strategy)
+        if load_profile.disable_images:
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
         self._web_driver = Chrome(executable_path="/opt/bin/chromedriver", chrome_options=options)
+        self._load_profile = load_profile
+        self._page_loads = 0
+        self._blocked_urls: List[str] = []
+        self._origins: Set[str] = set()
+        self._block_urls(load_profile.blocked_urls)
 
-    def find_element(self, url: str, selector: str) -> WebDriverWrapperFindElementResult:
-        self._web_driver.get(url)
-        WebDriverWait(self._web_driver, 10).until(
-            expected_conditions.presence_of_element_located((By.CSS_SELECTOR, 'body')))
-        WebDriverWait(self._web_driver, 10).until(
-            expected_conditions.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        return WebDriverWrapperFindElementResult(
-            url=self._web_driver.current_url,
-            title=self._web_driver.title,
-            selector=selector,
-            selected_text=self._web_driver.find_element_by_css_selector(selector).text,
-        )
+    def _block_urls(self, urls: List[str]):
+        if urls == self._blocked_urls:
+            return
+        try:
+            self._web_driver.execute_cdp_cmd('Network.enable', {})
+            self._web_driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': urls})
+            self._blocked_urls = urls
+        except (WebDriverException, AttributeError):
+            pass
+
+    @property
+    def load_profile(self) -> LoadProfile:
+        return self._load_profile
+
+    def apply_load_profile(self, load_profile: LoadProfile):
+        self._block_urls(load_profile.blocked_urls)
+        self._load_profile = load_profile
+
+    @property
+    def page_loads(self) -> int:
+        return self._page_loads
+
+    def is_alive(self) -> bool:
+        try:
+            return self._web_driver.execute_script('return 1') == 1
+        except WebDriverException:
+            return False
+
+    def _visited(self, url: str):
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https') and parts.netloc:
+            self._origins.add(f'{parts.scheme}://{parts.netloc}')
+
+    def clear_state(self) -> bool:
+        try:
+            for origin in sorted(self._origins):
+                self._web_driver.execute_cdp_cmd(
+                    'Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+                self._web_driver.execute_cdp_cmd(
+                    'DOMStorage.clear', {'storageId': {'securityOrigin': origin, 'isLocalStorage': False}})
+            self._web_driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except (WebDriverException, AttributeError):
+            return False
+        self._origins.clear()
+        return True
+
+    def quit(self):
+        try:
+            self._web_driver.quit()
+        except WebDriverException:
+            pass
+
+    def find_element(
+        self,
+        url: str,
+        selector: str,
+        wait: WaitStrategy = SelectorPresent(),
+        deadline: Optional[Deadline] = None
+    ) -> FindElementResult:
+        return self.find_elements(url, [selector], wait, deadline)[0]
+
+    def find_elements(
+        self,
+        url: str,
+        selectors: List[str],
+        wait: WaitStrategy = SelectorPresent(),
+        deadline: Optional[Deadline] = None
+    ) -> List[FindElementResult]:
+        deadline = deadline or Deadline.after(20)
+        started = time.monotonic()
+        self._page_loads += 1
+        self._visited(url)
+        try:
+            self._web_driver.set_page_load_timeout(max(1, int(deadline.remaining())))
+            self._web_driver.get(url)
+        except TimeoutException:
+            return [FindElementTimeout(url, s, time.monotonic() - started) for s in selectors]
+        present = []
+        for i, selector in enumerate(selectors):
+            try:
+                (wait if i == 0 else SelectorPresent()).wait(self._web_driver, selector, deadline)
+                present.append(True)
+            except TimeoutException:
+                present.append(False)
+        snapshot = self._web_driver.execute_script(_SNAPSHOT_SCRIPT, selectors)
+        self._visited(snapshot['url'])
+        elapsed = time.monotonic() - started
+        results: List[FindElementResult] = []
+        for selector, found, text in zip(selectors, present, snapshot['texts']):
+            if not found or text is None:
+                results.append(FindElementTimeout(url, selector, elapsed))
+                continue
+            results.append(WebDriverWrapperFindElementResult(
+                url=snapshot['url'],
+                title=snapshot['title'],
+                selector=selector,
+                selected_text=normalize_text(text),
+            ))
+        return results
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import time
+import asyncio
+import requests
+import functools
+import dataclasses
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Callable, AsyncIterator
+
+from HttpClient import HttpClient, ResponseTooLarge, shared_client
+
+
+@dataclasses.dataclass(frozen=True)
+class FetchRequest:
+    url: str
+    headers: Optional[Dict[str, str]] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class FetchResponse:
+    request: FetchRequest
+    status: Optional[int]
+    url: str
+    headers: Dict[str, str]
+    body: bytes
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and (200 <= self.status < 300 or self.status == 304)
+
+
+class AsyncFetchEngine:
+    def __init__(
+        self,
+        client: Optional[HttpClient] = None,
+        concurrency: int = 16,
+        per_host: int = 4,
+        timeout: float = 10.0
+    ):
+        self._client = client or shared_client()
+        self._concurrency = concurrency
+        self._per_host = per_host
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def _fetch(
+        self,
+        request: FetchRequest,
+        limit: asyncio.Semaphore,
+        host_limits: Dict[str, asyncio.Semaphore],
+        timeout: float
+    ) -> FetchResponse:
+        host = urlsplit(request.url).netloc
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self._per_host))
+        async with limit, host_limit:
+            started = time.monotonic()
+            get = functools.partial(self._client.get, request.url, request.headers, timeout)
+            try:
+                res = await asyncio.wait_for(asyncio.get_event_loop().run_in_executor(self._executor, get), timeout)
+            except (requests.RequestException, asyncio.TimeoutError, ResponseTooLarge) as e:
+                return FetchResponse(request, None, request.url, {}, b'', time.monotonic() - started, repr(e))
+            return FetchResponse(request, res.status, res.url, res.headers, res.body, time.monotonic() - started)
+
+    async def stream(
+        self,
+        fetch_requests: List[FetchRequest],
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[FetchResponse]:
+        limit = asyncio.Semaphore(self._concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        tasks = [
+            asyncio.ensure_future(self._fetch(r, limit, host_limits, timeout or self._timeout))
+            for r in fetch_requests
+        ]
+        for f in asyncio.as_completed(tasks):
+            yield await f
+
+    def fetch_all(
+        self,
+        fetch_requests: List[FetchRequest],
+        on_result: Optional[Callable[[FetchResponse], None]] = None,
+        timeout: Optional[float] = None
+    ) -> List[FetchResponse]:
+        async def run() -> List[FetchResponse]:
+            results = []
+            async for r in self.stream(fetch_requests, timeout):
+                if on_result is not None:
+                    on_result(r)
+                results.append(r)
+            return results
+
+        return asyncio.run(run())
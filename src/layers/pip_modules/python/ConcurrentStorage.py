@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import boto3
+import threading
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, TypeVar
+
+DEFAULT_MAX_WORKERS = 16
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+_lock = threading.Lock()
+_clients: Dict[int, object] = {}
+_executors: Dict[int, ThreadPoolExecutor] = {}
+
+
+def pooled_s3_client(max_pool_connections: int = DEFAULT_MAX_WORKERS):
+    with _lock:
+        client = _clients.get(max_pool_connections)
+        if client is None:
+            client = boto3.client('s3', config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={'max_attempts': 3},
+            ))
+            _clients[max_pool_connections] = client
+        return client
+
+
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    with _lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            _executors[max_workers] = executor
+        return executor
+
+
+def map_concurrently(fn: Callable[[T], R], items: Iterable[T], max_workers: int = DEFAULT_MAX_WORKERS) -> List[R]:
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(i) for i in items]
+    return list(_executor(max_workers).map(fn, items))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import dataclasses
+from logging import Logger
+from typing import Any, Callable, List, Optional
+
+from MessageEnvelope import unwrap, describe
+
+
+@dataclasses.dataclass(frozen=True)
+class EventRecord:
+    message_id: str
+    payload: dict
+    event_source: str
+    _message: List[dict] = dataclasses.field(default_factory=list, compare=False, repr=False)
+
+    @property
+    def message(self) -> dict:
+        if not self._message:
+            self._message.append(unwrap(self.payload))
+        return self._message[0]
+
+    @staticmethod
+    def from_record(record: dict) -> EventRecord:
+        if 'Sns' in record:
+            sns = record['Sns']
+            return EventRecord(sns['MessageId'], json.loads(sns['Message']), 'aws:sns')
+        body = json.loads(record['body'])
+        if body.get('Type') == 'Notification' and 'Message' in body:
+            body = json.loads(body['Message'])
+        return EventRecord(record['messageId'], body, 'aws:sqs')
+
+
+def _record_id(record: dict) -> str:
+    return record.get('messageId') or record.get('Sns', {}).get('MessageId', '')
+
+
+def process_records(event: dict, process: Callable[[EventRecord], Any], logger: Logger, event_name: str) -> dict:
+    results: List[Any] = []
+    retried: List[dict] = []
+    error: Optional[Exception] = None
+    for record in event.get('Records', []):
+        try:
+            r = EventRecord.from_record(record)
+            logger.info(json.dumps({
+                'event': event_name,
+                'details': {
+                    'message_id': r.message_id,
+                    'message': describe(r.payload),
+                }
+            }, ensure_ascii=False))
+            results.append(process(r))
+        except Exception as e:
+            logger.exception(json.dumps({
+                'event': f'{event_name}:error',
+                'details': {
+                    'message_id': _record_id(record),
+                    'error': repr(e),
+                }
+            }, ensure_ascii=False))
+            if record.get('eventSource') == 'aws:sqs':
+                retried.append(record)
+            else:
+                error = e
+    if error is not None:
+        raise error
+    return {
+        'results': results,
+        'batchItemFailures': [{'itemIdentifier': f['messageId']} for f in retried],
+    }
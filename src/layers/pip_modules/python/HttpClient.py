@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import contextlib
+import requests
+import dataclasses
+from typing import Optional, Dict, Iterator
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import TimeoutError as Urllib3TimeoutError, NewConnectionError
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (compatible; website-monitor)'
+
+
+def is_timeout(error: requests.RequestException) -> bool:
+    if isinstance(error, requests.Timeout):
+        return True
+    cause = error.args[0] if error.args else None
+    cause = getattr(cause, 'reason', cause)
+    return isinstance(cause, Urllib3TimeoutError) and not isinstance(cause, NewConnectionError)
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class HttpStatusError(Exception):
+    def __init__(self, url: str, status: int):
+        super().__init__(f'{status} for {url}')
+        self.url = url
+        self.status = status
+
+
+@dataclasses.dataclass(frozen=True)
+class HttpResponse:
+    status: int
+    url: str
+    headers: Dict[str, str]
+    body: bytes
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HttpStatusError(self.url, self.status)
+
+
+class HttpStream:
+    def __init__(self, response: requests.Response, max_body_bytes: int):
+        self._response = response
+        self._max_body_bytes = max_body_bytes
+        self.status: int = response.status_code
+        self.url: str = response.url
+        self.headers: Dict[str, str] = {k.lower(): v for k, v in response.headers.items()}
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HttpStatusError(self.url, self.status)
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        size = 0
+        for chunk in self._response.iter_content(chunk_size):
+            size += len(chunk)
+            if size > self._max_body_bytes:
+                raise ResponseTooLarge(f'{self.url} exceeds {self._max_body_bytes} bytes')
+            yield chunk
+
+    def read(self) -> HttpResponse:
+        return HttpResponse(
+            status=self.status,
+            url=self.url,
+            headers=self.headers,
+            body=b''.join(self.iter_chunks()),
+        )
+
+
+class HttpClient:
+    def __init__(
+        self,
+        pool_connections: int = 16,
+        pool_maxsize: int = 16,
+        retries: int = 2,
+        backoff_factor: float = 0.3,
+        timeout: float = 10,
+        max_body_bytes: int = 10 * 1024 * 1024
+    ):
+        retry = Retry(
+            total=retries,
+            read=False,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            method_whitelist=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._session.headers['User-Agent'] = USER_AGENT
+        self._timeout = timeout
+        self._max_body_bytes = max_body_bytes
+
+    @contextlib.contextmanager
+    def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[HttpStream]:
+        with self._session.get(url, headers=headers, timeout=timeout or self._timeout, stream=True) as res:
+            yield HttpStream(res, self._max_body_bytes)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> HttpResponse:
+        with self.stream(url, headers, timeout) as res:
+            return res.read()
+
+    def post(
+        self,
+        url: str,
+        data: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> HttpResponse:
+        with self._session.post(url, data=data, headers=headers, timeout=timeout or self._timeout, stream=True) as res:
+            return HttpStream(res, self._max_body_bytes).read()
+
+
+_shared_client: Optional[HttpClient] = None
+
+
+def shared_client() -> HttpClient:
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = HttpClient()
+    return _shared_client
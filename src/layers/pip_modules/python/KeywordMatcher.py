@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import re
+import functools
+from typing import Optional, List, Tuple, Pattern
+
+_UNCOMBINABLE = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)')
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Tuple[str, ...]):
+        self._keywords = keywords
+        self._pattern: Optional[Pattern] = None
+        self._patterns: List[Pattern] = [re.compile(k) for k in keywords]
+        if any(_UNCOMBINABLE.search(k) for k in keywords):
+            return
+        try:
+            self._pattern = re.compile('|'.join(f'(?P<_kw{i}>{k})' for i, k in enumerate(keywords)))
+        except re.error:
+            pass
+
+    def match(self, text: str) -> Optional[str]:
+        if not self._keywords:
+            return None
+        candidates = len(self._keywords)
+        if self._pattern is not None:
+            m = self._pattern.search(text)
+            if m is None:
+                return None
+            candidates = next(i for i in range(len(self._keywords)) if m.group(f'_kw{i}') is not None)
+        for k, p in zip(self._keywords[:candidates], self._patterns):
+            if p.search(text):
+                return k
+        return self._keywords[candidates] if candidates < len(self._keywords) else None
+
+
+@functools.lru_cache(maxsize=64)
+def compile_keywords(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
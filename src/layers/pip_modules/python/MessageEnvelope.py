@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import gzip
+import json
+import boto3
+import base64
+import hashlib
+from typing import Optional
+
+ENVELOPE_VERSION = 'web-monitor/envelope-v1'
+ENCODING_GZIP = 'gzip+base64'
+ENCODING_S3 = 's3'
+
+_s3_client = None
+
+
+class EnvelopeIntegrityError(Exception):
+    pass
+
+
+def is_envelope(message: dict) -> bool:
+    return message.get('envelope') == ENVELOPE_VERSION
+
+
+class MessageEnvelope:
+    def __init__(
+        self,
+        s3_bucket=None,
+        compress_threshold: int = 64 * 1024,
+        spill_threshold: int = 192 * 1024,
+        prefix: str = 'messages/'
+    ):
+        self._bucket = s3_bucket
+        self._compress_threshold = compress_threshold
+        self._spill_threshold = spill_threshold
+        self._prefix = prefix
+
+    def wrap(self, message: dict) -> str:
+        j = json.dumps(message, ensure_ascii=False)
+        raw = j.encode('utf-8')
+        if len(raw) <= self._compress_threshold:
+            return j
+        compressed = gzip.compress(raw)
+        encoded = base64.b64encode(compressed).decode('ascii')
+        if len(encoded) <= self._spill_threshold or self._bucket is None:
+            return json.dumps({'envelope': ENVELOPE_VERSION, 'encoding': ENCODING_GZIP, 'body': encoded})
+        digest = hashlib.sha256(compressed).hexdigest()
+        object_key = f'{self._prefix}{digest}'
+        self._bucket.Object(object_key).put(
+            Body=compressed,
+            ContentType='application/gzip'
+        )
+        return json.dumps({
+            'envelope': ENVELOPE_VERSION,
+            'encoding': ENCODING_S3,
+            'bucket': self._bucket.name,
+            'key': object_key,
+            'sha256': digest,
+            'size': len(raw),
+        })
+
+
+def unwrap(message: dict) -> dict:
+    global _s3_client
+    if not is_envelope(message):
+        return message
+    encoding = message['encoding']
+    if encoding == ENCODING_GZIP:
+        compressed = base64.b64decode(message['body'])
+    elif encoding == ENCODING_S3:
+        if _s3_client is None:
+            _s3_client = boto3.client('s3')
+        res = _s3_client.get_object(Bucket=message['bucket'], Key=message['key'])
+        compressed = res['Body'].read()
+        if hashlib.sha256(compressed).hexdigest() != message['sha256']:
+            raise EnvelopeIntegrityError(f'sha256 mismatch for s3://{message["bucket"]}/{message["key"]}')
+    else:
+        raise ValueError(f'unknown envelope encoding: {encoding}')
+    return json.loads(gzip.decompress(compressed).decode('utf-8'))
+
+
+def describe(message: dict) -> dict:
+    if not is_envelope(message):
+        return message
+    return {k: v for k, v in message.items() if k != 'body'}
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import time
+import hashlib
+import dataclasses
+from abc import *
+from logging import Logger
+from typing import Optional, List, Dict
+from botocore.exceptions import ClientError
+
+from WebMonitorConfig import AdaptiveScheduleConfig
+
+
+def site_target_id(url: str, selector: Optional[str]) -> str:
+    return hashlib.sha256(f'{url}::{selector}'.encode()).hexdigest()
+
+
+def rss_target_id(feed_url: str) -> str:
+    return hashlib.sha256(feed_url.encode()).hexdigest()
+
+
+@dataclasses.dataclass
+class TargetSchedule:
+    interval: int
+    next_due: int
+    checks: int = 0
+    changes: int = 0
+    last_checked: Optional[int] = None
+    last_changed: Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class TargetCheck:
+    target_id: str
+    checked_at: int
+    changed: bool
+    object_key: str
+
+
+class TargetSchedules(metaclass=ABCMeta):
+    @abstractmethod
+    def report(self, target_id: str, changed: bool):
+        pass
+
+    @abstractmethod
+    def checks(self) -> List[TargetCheck]:
+        pass
+
+    @abstractmethod
+    def delete_checks(self, checks: List[TargetCheck]):
+        pass
+
+    @abstractmethod
+    def load(self) -> Dict[str, TargetSchedule]:
+        pass
+
+    @abstractmethod
+    def save(self, schedules: Dict[str, TargetSchedule]):
+        pass
+
+
+class TargetSchedulesOnS3(TargetSchedules):
+    _INDEX_KEY = 'schedules/index.json'
+    _FEEDBACK_PREFIX = 'schedules/feedback/'
+
+    def __init__(self, s3_bucket, logger: Logger):
+        self._bucket = s3_bucket
+        self._logger = logger
+
+    def report(self, target_id: str, changed: bool):
+        checked_at = int(time.time())
+        object_key = f'{TargetSchedulesOnS3._FEEDBACK_PREFIX}{target_id}/{checked_at}-{int(changed)}'
+        self._bucket.Object(object_key).put(Body=b'')
+
+    def checks(self) -> List[TargetCheck]:
+        checks = []
+        for obj in self._bucket.objects.filter(Prefix=TargetSchedulesOnS3._FEEDBACK_PREFIX):
+            try:
+                target_id, name = obj.key[len(TargetSchedulesOnS3._FEEDBACK_PREFIX):].split('/')
+                checked_at, changed = name.split('-')
+                checks.append(TargetCheck(target_id, int(checked_at), changed == '1', obj.key))
+            except ValueError:
+                continue
+        return sorted(checks, key=lambda c: c.checked_at)
+
+    def delete_checks(self, checks: List[TargetCheck]):
+        keys = [{'Key': c.object_key} for c in checks]
+        for i in range(0, len(keys), 1000):
+            self._bucket.delete_objects(Delete={'Objects': keys[i:i + 1000], 'Quiet': True})
+
+    def load(self) -> Dict[str, TargetSchedule]:
+        try:
+            res = self._bucket.Object(TargetSchedulesOnS3._INDEX_KEY).get()
+            dic = json.loads(res['Body'].read().decode('utf-8'))
+            return {k: TargetSchedule(**v) for k, v in dic.items()}
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return {}
+
+    def save(self, schedules: Dict[str, TargetSchedule]):
+        self._bucket.Object(TargetSchedulesOnS3._INDEX_KEY).put(
+            Body=json.dumps({k: dataclasses.asdict(v) for k, v in schedules.items()}).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+
+class AdaptiveScheduler:
+    _DUE_SLACK_SECONDS = 60
+
+    def __init__(self, schedules: TargetSchedules, config: AdaptiveScheduleConfig, logger: Logger):
+        self._schedules = schedules
+        self._config = config
+        self._logger = logger
+        self._state: Dict[str, TargetSchedule] = {}
+        self._seen: Dict[str, bool] = {}
+        self._checks: List[TargetCheck] = []
+
+    def load(self):
+        self._state = self._schedules.load()
+        checks = self._schedules.checks()
+        for c in checks:
+            s = self._state.get(c.target_id) or TargetSchedule(self._config.min_interval, c.checked_at)
+            s.checks += 1
+            if c.changed:
+                s.changes += 1
+                s.last_changed = c.checked_at
+                s.interval = self._config.min_interval
+            else:
+                s.interval = int(min(self._config.max_interval, max(self._config.min_interval, s.interval * self._config.backoff)))
+            s.last_checked = c.checked_at
+            s.next_due = c.checked_at + s.interval
+            self._state[c.target_id] = s
+        self._checks = checks
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:AdaptiveScheduler:load',
+            'details': {
+                'targets': len(self._state),
+                'checks': len(checks),
+            }
+        }, ensure_ascii=False))
+
+    def is_due(self, target_id: str, now: int) -> bool:
+        self._seen[target_id] = True
+        s = self._state.get(target_id)
+        if not self._config.enabled or s is None:
+            return True
+        return s.next_due <= now + AdaptiveScheduler._DUE_SLACK_SECONDS
+
+    def dispatched(self, target_id: str, now: int):
+        s = self._state.get(target_id) or TargetSchedule(self._config.min_interval, now)
+        s.next_due = now + s.interval
+        self._state[target_id] = s
+
+    def save(self):
+        self._schedules.save({k: v for k, v in self._state.items() if k in self._seen})
+        self._schedules.delete_checks(self._checks)
+        self._checks = []
@@ -2,8 +2,50 @@
 
 from __future__ import annotations
 
+import difflib
+import hashlib
 import dataclasses
-from typing import Optional, List
+from typing import Optional, List, Tuple
+
+CHAR_DIFF_MAX_CHARS = 20000
+
+
+def changed_chars(previous: str, current: str) -> Tuple[int, int]:
+    previous_lines = previous.splitlines()
+    current_lines = current.splitlines()
+    added = 0
+    removed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, previous_lines, current_lines).get_opcodes():
+        if tag == 'equal':
+            continue
+        before = '\n'.join(previous_lines[i1:i2])
+        after = '\n'.join(current_lines[j1:j2])
+        if tag != 'replace' or len(before) + len(after) > CHAR_DIFF_MAX_CHARS:
+            added += len(after)
+            removed += len(before)
+            continue
+        blocks = difflib.SequenceMatcher(None, before, after, autojunk=False).get_matching_blocks()
+        matched = sum(b.size for b in blocks)
+        added += len(after) - matched
+        removed += len(before) - matched
+    return added, removed
+
+
+@dataclasses.dataclass(frozen=True)
+class SiteSelector:
+    selector: str
+    title: Optional[str] = None
+    normalize: Optional[dict] = None
+    similarity_threshold: Optional[float] = None
+
+    @staticmethod
+    def from_dict(dic: dict) -> SiteSelector:
+        return SiteSelector(
+            selector=dic['selector'],
+            title=dic.get('title', None),
+            normalize=dic.get('normalize', None),
+            similarity_threshold=dic.get('similarity_threshold', None),
+        )
 
 
 @dataclasses.dataclass(frozen=True)
@@ -11,14 +53,35 @@ class DetectWebsiteChangesEvent:
     url: str
     selector: Optional[str]
     title: Optional[str]
+    fetch_mode: str = 'browser'
+    load_profile: Optional[dict] = None
+    wait: Optional[dict] = None
+    normalize: Optional[dict] = None
+    similarity_threshold: Optional[float] = None
+    selectors: Optional[List[SiteSelector]] = None
+    adaptive_schedule: bool = False
+
+    @property
+    def site_selectors(self) -> List[SiteSelector]:
+        if self.selectors:
+            return self.selectors
+        return [SiteSelector(self.selector or 'body', self.title, self.normalize, self.similarity_threshold)]
 
     @staticmethod
     def from_message(message: dict) -> Optional[DetectWebsiteChangesEvent]:
         try:
+            selectors = message.get('selectors', None)
             return DetectWebsiteChangesEvent(
                 url=message['url'],
                 selector=message.get('selector', 'body'),
-                title=message.get('title', None)
+                title=message.get('title', None),
+                fetch_mode=message.get('fetch_mode', 'browser'),
+                load_profile=message.get('load_profile', None),
+                wait=message.get('wait', None),
+                normalize=message.get('normalize', None),
+                similarity_threshold=message.get('similarity_threshold', None),
+                selectors=[SiteSelector.from_dict(s) for s in selectors] if selectors else None,
+                adaptive_schedule=message.get('adaptive_schedule', False),
             )
         except KeyError:
             return None
@@ -29,6 +92,14 @@ class DetectRSSEntryEvent:
     feed_url: str
     selector: str
     keywords: List[str]
+    fetch_mode: str = 'browser'
+    load_profile: Optional[dict] = None
+    wait: Optional[dict] = None
+    stream_mode: Optional[str] = None
+    websub: bool = False
+    pushed_content: Optional[str] = None
+    match_stages: Optional[List[str]] = None
+    adaptive_schedule: bool = False
 
     @staticmethod
     def from_message(message: dict) -> Optional[DetectRSSEntryEvent]:
@@ -36,7 +107,15 @@ class DetectRSSEntryEvent:
             return DetectRSSEntryEvent(
                 feed_url=message['feed_url'],
                 selector=message.get('selector', 'body'),
-                keywords=message['keywords']
+                keywords=message['keywords'],
+                fetch_mode=message.get('fetch_mode', 'browser'),
+                load_profile=message.get('load_profile', None),
+                wait=message.get('wait', None),
+                stream_mode=message.get('stream_mode', None),
+                websub=message.get('websub', False),
+                pushed_content=message.get('pushed_content', None),
+                match_stages=message.get('match_stages', None),
+                adaptive_schedule=message.get('adaptive_schedule', False),
             )
         except KeyError:
             return None
@@ -48,10 +127,36 @@ class DetectWebsiteChangesResult:
     selector: Optional[str]
     title: Optional[str]
     has_changed: bool = False
-    text_previous: Optional[str] = None
-    text_current: Optional[str] = None
+    diff: Optional[str] = None
+    diff_truncated: bool = False
+    chars_added: int = 0
+    chars_removed: int = 0
+    digest_previous: Optional[str] = None
+    digest_current: Optional[str] = None
+    revision_key: Optional[str] = None
+    version_previous: Optional[str] = None
+    version_current: Optional[str] = None
+    similarity: Optional[float] = None
+    timed_out: bool = False
     type: str = 'DetectWebsiteChangesResult'
 
+    @staticmethod
+    def from_message(message: dict) -> DetectWebsiteChangesResult:
+        names = {f.name for f in dataclasses.fields(DetectWebsiteChangesResult)}
+        result = DetectWebsiteChangesResult(**{k: v for k, v in message.items() if k in names})
+        text_previous = message.get('text_previous')
+        text_current = message.get('text_current')
+        if 'digest_previous' in message or text_previous is None or text_current is None:
+            return result
+        chars_added, chars_removed = changed_chars(text_previous, text_current)
+        return dataclasses.replace(
+            result,
+            chars_added=chars_added,
+            chars_removed=chars_removed,
+            digest_previous=hashlib.sha256(text_previous.encode('utf-8')).hexdigest(),
+            digest_current=hashlib.sha256(text_current.encode('utf-8')).hexdigest(),
+        )
+
 
 @dataclasses.dataclass(frozen=True)
 class DetectRSSEntryResult:
@@ -60,4 +165,5 @@ class DetectRSSEntryResult:
     selector: Optional[str]
     title: str
     matched_keyword: str
+    matched_stage: Optional[str] = None
     type: str = 'DetectRSSEntryResult'
@@ -2,27 +2,66 @@
 
 from __future__ import annotations
 
+import time
 import yaml
 import boto3
-import datetime
 import dataclasses
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
+from botocore.exceptions import ClientError
+
+CONFIG_CACHE_TTL_SECONDS = 60
+
+
+@dataclasses.dataclass
+class _CachedConfig:
+    config: WebMonitorConfig
+    fetched_at: float
+
+
+_s3_client = None
+_cache: Dict[Tuple[str, str], _CachedConfig] = {}
 
 
 class WebMonitorConfig:
-    def __init__(self, dic: dict):
+    def __init__(self, dic: dict, version: Optional[str] = None):
         self._dic = dic
+        self._version = version
+        self._site_targets: Optional[List[TargetWebsite]] = None
+        self._rss_targets: Optional[List[TargetRSS]] = None
 
     @staticmethod
-    def initialize(config_bucket: str, config_key_name: str) -> WebMonitorConfig:
-        bucket = boto3.resource('s3').Bucket(config_bucket)
-        timestamp = datetime.datetime.utcnow().timestamp()
-        config_path = '/tmp/config.' + str(timestamp)
-        bucket.download_file(config_key_name, config_path)
-        f = open(config_path, "r")
-        dic = yaml.load(f, Loader=yaml.SafeLoader)
-        f.close()
-        return WebMonitorConfig(dic)
+    def initialize(
+        config_bucket: str,
+        config_key_name: str,
+        ttl: float = CONFIG_CACHE_TTL_SECONDS
+    ) -> WebMonitorConfig:
+        global _s3_client
+        cache_key = (config_bucket, config_key_name)
+        cached = _cache.get(cache_key)
+        now = time.monotonic()
+        if cached is not None and now - cached.fetched_at < ttl:
+            return cached.config
+        if _s3_client is None:
+            _s3_client = boto3.client('s3')
+        params = {'Bucket': config_bucket, 'Key': config_key_name}
+        if cached is not None and cached.config.version:
+            params['IfNoneMatch'] = cached.config.version
+        try:
+            res = _s3_client.get_object(**params)
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if cached is None or error_code not in ('304', 'NotModified'):
+                raise e
+            cached.fetched_at = now
+            return cached.config
+        dic = yaml.load(res['Body'].read(), Loader=yaml.SafeLoader)
+        config = WebMonitorConfig(dic, res.get('ETag'))
+        _cache[cache_key] = _CachedConfig(config, now)
+        return config
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
 
     @property
     def site_template(self) -> str:
@@ -34,6 +73,8 @@ class WebMonitorConfig:
 
     @property
     def site_targets(self) -> List[TargetWebsite]:
+        if self._site_targets is not None:
+            return self._site_targets
         targets = []
         items = self._dic.get('site_targets', [])
         for i in items:
@@ -41,13 +82,22 @@ class WebMonitorConfig:
                 url = i['url']
                 selector = i['selector']
                 title = i.get('title', None)
-                targets.append(TargetWebsite(url, selector, title))
+                fetch_mode = i.get('fetch_mode', 'browser')
+                load_profile = i.get('load_profile', None)
+                wait = i.get('wait', None)
+                normalize = i.get('normalize', None)
+                similarity_threshold = i.get('similarity_threshold', None)
+                targets.append(TargetWebsite(
+                    url, selector, title, fetch_mode, load_profile, wait, normalize, similarity_threshold))
             except KeyError:
                 continue
+        self._site_targets = targets
         return targets
 
     @property
     def rss_targets(self) -> List[TargetRSS]:
+        if self._rss_targets is not None:
+            return self._rss_targets
         targets = []
         items = self._dic.get('rss_targets', [])
         for i in items:
@@ -55,21 +105,69 @@ class WebMonitorConfig:
                 url = i['url']
                 selector = i['selector']
                 keywords = i.get('keywords', [])
-                targets.append(TargetRSS(url, selector, keywords))
+                fetch_mode = i.get('fetch_mode', 'browser')
+                load_profile = i.get('load_profile', None)
+                wait = i.get('wait', None)
+                stream_mode = i.get('stream_mode', None)
+                websub = i.get('websub', True)
+                match_stages = i.get('match_stages', None)
+                targets.append(TargetRSS(
+                    url, selector, keywords, fetch_mode, load_profile, wait, stream_mode, websub, match_stages))
             except KeyError:
                 continue
+        self._rss_targets = targets
         return targets
 
     @property
     def keywords(self) -> List[str]:
         return self._dic.get('keywords', [])
 
+    def rss_keywords(self, target: TargetRSS) -> List[str]:
+        keywords = self.keywords.copy()
+        keywords.extend(target.keywords)
+        return keywords
+
+    @property
+    def websub_enabled(self) -> bool:
+        return self._dic.get('websub', {}).get('enabled', False)
+
+    @property
+    def adaptive_schedule(self) -> AdaptiveScheduleConfig:
+        dic = self._dic.get('adaptive_schedule')
+        if dic is None:
+            return AdaptiveScheduleConfig(enabled=False)
+        return AdaptiveScheduleConfig(
+            enabled=dic.get('enabled', True),
+            min_interval=int(dic.get('min_interval_minutes', 20) * 60),
+            max_interval=int(dic.get('max_interval_minutes', 24 * 60) * 60),
+            backoff=float(dic.get('backoff', 2.0)),
+        )
+
+    @property
+    def digest(self) -> DigestConfig:
+        dic = self._dic.get('message_format', {}).get('digest')
+        if dic is None:
+            return DigestConfig()
+        return DigestConfig(
+            enabled=True,
+            group_by=dic.get('group_by', DigestConfig.group_by),
+            max_items=int(dic.get('max_items', DigestConfig.max_items)),
+            max_length=int(dic.get('max_length', DigestConfig.max_length)),
+            template=dic.get('template', DigestConfig.template),
+            item_template=dic.get('item_template', DigestConfig.item_template),
+        )
+
 
 @dataclasses.dataclass(frozen=True)
 class TargetWebsite:
     url: str
     selector: Optional[str]
     title: Optional[str]
+    fetch_mode: str = 'browser'
+    load_profile: Optional[dict] = None
+    wait: Optional[dict] = None
+    normalize: Optional[dict] = None
+    similarity_threshold: Optional[float] = None
 
 
 @dataclasses.dataclass(frozen=True)
@@ -77,3 +175,27 @@ class TargetRSS:
     url: str
     selector: Optional[str]
     keywords: List[str]
+    fetch_mode: str = 'browser'
+    load_profile: Optional[dict] = None
+    wait: Optional[dict] = None
+    stream_mode: Optional[str] = None
+    websub: bool = True
+    match_stages: Optional[List[str]] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class AdaptiveScheduleConfig:
+    enabled: bool
+    min_interval: int = 20 * 60
+    max_interval: int = 24 * 60 * 60
+    backoff: float = 2.0
+
+
+@dataclasses.dataclass(frozen=True)
+class DigestConfig:
+    enabled: bool = False
+    group_by: str = 'keyword'
+    max_items: int = 10
+    max_length: int = 280
+    template: str = '$count updates: $group\n$items'
+    item_template: str = '$title $url'
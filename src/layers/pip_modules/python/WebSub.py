@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import re
+import hmac
+import json
+import time
+import secrets
+import hashlib
+import dataclasses
+from abc import *
+from typing import Optional, List, Dict
+from logging import Logger
+from urllib.parse import urljoin
+from botocore.exceptions import ClientError
+
+from HttpClient import HttpClient, shared_client
+from ConcurrentStorage import pooled_s3_client, map_concurrently
+
+STATE_PENDING = 'pending'
+STATE_ACTIVE = 'active'
+STATE_DENIED = 'denied'
+
+DEFAULT_LEASE_SECONDS = 10 * 24 * 60 * 60
+RENEW_BEFORE_SECONDS = 24 * 60 * 60
+PENDING_TIMEOUT_SECONDS = 60 * 60
+DENIED_RETRY_SECONDS = 24 * 60 * 60
+
+_LINK_HEADER_PATTERN = re.compile(r'<([^>]*)>\s*((?:;\s*[^;,]+)*)')
+_REL_PATTERN = re.compile(r';\s*rel\s*=\s*"?([^";,]+)"?', re.IGNORECASE)
+_SIGNATURE_ALGORITHMS = {
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'sha384': hashlib.sha384,
+    'sha512': hashlib.sha512,
+}
+
+
+def subscription_id(feed_url: str) -> str:
+    return hashlib.sha256(feed_url.encode()).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class WebSubLinks:
+    hub: str
+    topic: str
+
+
+def discover_links(feed_url: str, feed_links: List[dict], headers: Dict[str, str]) -> Optional[WebSubLinks]:
+    hubs = []
+    topics = []
+    for value in [v for k, v in headers.items() if k.lower() == 'link']:
+        for m in _LINK_HEADER_PATTERN.finditer(value):
+            for rel in _REL_PATTERN.findall(m.group(2)):
+                for r in rel.lower().split():
+                    if r == 'hub':
+                        hubs.append(urljoin(feed_url, m.group(1)))
+                    elif r == 'self':
+                        topics.append(urljoin(feed_url, m.group(1)))
+    for link in feed_links:
+        href = link.get('href')
+        if not href:
+            continue
+        if link.get('rel') == 'hub':
+            hubs.append(urljoin(feed_url, href))
+        elif link.get('rel') == 'self':
+            topics.append(urljoin(feed_url, href))
+    if not hubs:
+        return None
+    return WebSubLinks(hubs[0], topics[0] if topics else feed_url)
+
+
+def sign(secret: str, body: bytes, algorithm: str = 'sha256') -> str:
+    digest = hmac.new(secret.encode('utf-8'), body, _SIGNATURE_ALGORITHMS[algorithm]).hexdigest()
+    return f'{algorithm}={digest}'
+
+
+def verify_signature(secret: str, signature: Optional[str], body: bytes) -> bool:
+    if not signature or '=' not in signature:
+        return False
+    algorithm, _ = signature.split('=', 1)
+    if algorithm.lower() not in _SIGNATURE_ALGORITHMS:
+        return False
+    return hmac.compare_digest(sign(secret, body, algorithm.lower()), signature.lower())
+
+
+@dataclasses.dataclass(frozen=True)
+class WebSubSubscription:
+    feed_url: str
+    topic: str
+    hub: str
+    secret: str
+    state: str
+    requested_at: int
+    lease_expires_at: Optional[int] = None
+    verified_at: Optional[int] = None
+    token: str = ''
+    lease_seconds: Optional[int] = None
+
+    @property
+    def subscription_id(self) -> str:
+        return subscription_id(self.feed_url)
+
+
+def is_pushed(subscription: Optional[WebSubSubscription], now: int) -> bool:
+    return subscription is not None and subscription.state == STATE_ACTIVE and subscription.token != '' \
+        and subscription.lease_expires_at is not None \
+        and subscription.lease_expires_at - now > RENEW_BEFORE_SECONDS
+
+
+def needs_subscription(subscription: Optional[WebSubSubscription], links: WebSubLinks, now: int) -> bool:
+    if subscription is None or subscription.hub != links.hub or subscription.topic != links.topic:
+        return True
+    if not subscription.token:
+        return True
+    if subscription.state == STATE_PENDING:
+        return now - subscription.requested_at > PENDING_TIMEOUT_SECONDS
+    if subscription.state == STATE_DENIED:
+        return now - subscription.requested_at > DENIED_RETRY_SECONDS
+    if now - subscription.requested_at <= PENDING_TIMEOUT_SECONDS:
+        return False
+    return not is_pushed(subscription, now)
+
+
+class WebSubSubscriptions(metaclass=ABCMeta):
+    @abstractmethod
+    def get(self, feed_url: str) -> Optional[WebSubSubscription]:
+        pass
+
+    @abstractmethod
+    def get_by_token(self, token: str) -> Optional[WebSubSubscription]:
+        pass
+
+    @abstractmethod
+    def put(self, subscription: WebSubSubscription):
+        pass
+
+    def get_many(self, feed_urls: List[str]) -> List[Optional[WebSubSubscription]]:
+        return [self.get(u) for u in feed_urls]
+
+
+class WebSubSubscriptionsOnS3(WebSubSubscriptions):
+    def __init__(self, s3_bucket, logger: Logger):
+        self._bucket = s3_bucket
+        self._logger = logger
+        self._client = pooled_s3_client()
+
+    @staticmethod
+    def _object_key(subscription_id: str) -> str:
+        return f'websub/{subscription_id}.json'
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return f'websub/tokens/{hashlib.sha256(token.encode()).hexdigest()}.json'
+
+    def _read(self, object_key: str) -> Optional[dict]:
+        try:
+            res = self._client.get_object(Bucket=self._bucket.name, Key=object_key)
+            return json.loads(res['Body'].read().decode('utf-8'))
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code != 'NoSuchKey':
+                raise e
+            return None
+
+    def get(self, feed_url: str) -> Optional[WebSubSubscription]:
+        dic = self._read(WebSubSubscriptionsOnS3._object_key(subscription_id(feed_url)))
+        return WebSubSubscription(**dic) if dic is not None else None
+
+    def get_by_token(self, token: str) -> Optional[WebSubSubscription]:
+        if not token:
+            return None
+        dic = self._read(WebSubSubscriptionsOnS3._token_key(token))
+        subscription = self.get(dic['feed_url']) if dic is not None else None
+        if subscription is None or not hmac.compare_digest(subscription.token, token):
+            return None
+        return subscription
+
+    def get_many(self, feed_urls: List[str]) -> List[Optional[WebSubSubscription]]:
+        return map_concurrently(self.get, feed_urls)
+
+    def put(self, subscription: WebSubSubscription):
+        object_key = WebSubSubscriptionsOnS3._object_key(subscription.subscription_id)
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:WebSubSubscriptionsOnS3:put',
+            'details': {
+                'feed_url': subscription.feed_url,
+                'hub': subscription.hub,
+                'state': subscription.state,
+                'lease_expires_at': subscription.lease_expires_at,
+                'object_key': object_key,
+            }
+        }, ensure_ascii=False))
+        if subscription.token:
+            self._client.put_object(
+                Bucket=self._bucket.name,
+                Key=WebSubSubscriptionsOnS3._token_key(subscription.token),
+                Body=json.dumps({'feed_url': subscription.feed_url}).encode('utf-8'),
+                ContentType='application/json'
+            )
+        self._client.put_object(
+            Bucket=self._bucket.name,
+            Key=object_key,
+            Body=json.dumps(dataclasses.asdict(subscription)).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+
+class WebSubSubscriber:
+    def __init__(
+        self,
+        subscriptions: WebSubSubscriptions,
+        callback_url: str,
+        logger: Logger,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        client: Optional[HttpClient] = None
+    ):
+        self._subscriptions = subscriptions
+        self._callback_url = callback_url.rstrip('/')
+        self._logger = logger
+        self._lease_seconds = lease_seconds
+        self._client = client or shared_client()
+
+    def callback_url(self, token: str) -> str:
+        return f'{self._callback_url}/{token}'
+
+    def ensure_subscribed(self, feed_url: str, links: Optional[WebSubLinks]) -> Optional[WebSubSubscription]:
+        now = int(time.time())
+        subscription = self._subscriptions.get(feed_url)
+        if links is None and subscription is not None:
+            links = WebSubLinks(subscription.hub, subscription.topic)
+        if links is None or not needs_subscription(subscription, links, now):
+            return subscription
+        renewing = subscription is not None and subscription.token != '' and subscription.verified_at is not None \
+            and subscription.state != STATE_DENIED and subscription.hub == links.hub \
+            and subscription.topic == links.topic
+        previous = subscription if renewing else None
+        subscription = WebSubSubscription(
+            feed_url=feed_url,
+            topic=links.topic,
+            hub=links.hub,
+            secret=previous.secret if previous is not None else secrets.token_hex(32),
+            state=STATE_PENDING,
+            requested_at=now,
+            lease_expires_at=previous.lease_expires_at if previous is not None else None,
+            verified_at=previous.verified_at if previous is not None else None,
+            token=previous.token if previous is not None else secrets.token_urlsafe(32),
+            lease_seconds=self._lease_seconds,
+        )
+        self._subscriptions.put(subscription)
+        res = self._client.post(links.hub, data={
+            'hub.callback': self.callback_url(subscription.token),
+            'hub.mode': 'subscribe',
+            'hub.topic': links.topic,
+            'hub.secret': subscription.secret,
+            'hub.lease_seconds': str(self._lease_seconds),
+        })
+        self._logger.info(json.dumps({
+            'event': 'web-monitor:WebSubSubscriber:subscribe',
+            'details': {
+                'feed_url': feed_url,
+                'hub': links.hub,
+                'topic': links.topic,
+                'renewing': renewing,
+                'status': res.status,
+            }
+        }, ensure_ascii=False))
+        res.raise_for_status()
+        return subscription
+
+
+def verify_intent(
+    subscriptions: WebSubSubscriptions,
+    token: str,
+    mode: Optional[str],
+    topic: Optional[str],
+    lease_seconds: Optional[str]
+) -> bool:
+    subscription = subscriptions.get_by_token(token)
+    if subscription is None or topic != subscription.topic or subscription.state != STATE_PENDING:
+        return False
+    now = int(time.time())
+    if mode == 'denied':
+        subscriptions.put(dataclasses.replace(subscription, state=STATE_DENIED))
+        return True
+    if mode != 'subscribe' or now - subscription.requested_at > PENDING_TIMEOUT_SECONDS:
+        return False
+    lease = subscription.lease_seconds or DEFAULT_LEASE_SECONDS
+    if lease_seconds and lease_seconds.isdigit():
+        lease = min(lease, int(lease_seconds))
+    subscriptions.put(dataclasses.replace(
+        subscription,
+        state=STATE_ACTIVE,
+        lease_expires_at=now + lease,
+        verified_at=now,
+    ))
+    return True
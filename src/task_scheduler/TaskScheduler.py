@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import time
+import logging
+import dataclasses
+from typing import Optional, List, Dict
+
+from WebMonitorConfig import WebMonitorConfig, TargetWebsite
+from WebMonitor import DetectWebsiteChangesEvent, DetectRSSEntryEvent, SiteSelector
+from TargetSchedules import TargetSchedules, AdaptiveScheduler, site_target_id, rss_target_id
+from MessageEnvelope import MessageEnvelope
+from WebSub import WebSubSubscription, WebSubSubscriptions, is_pushed
+
+
+@dataclasses.dataclass(frozen=True)
+class TaskSchedulerConfig:
+    sns_client: any
+    detect_website_changes_topic: str
+    detect_rss_entry_topic: str
+    logger: logging.Logger
+    schedules: TargetSchedules
+    envelope: Optional[MessageEnvelope] = None
+    subscriptions: Optional[WebSubSubscriptions] = None
+
+
+def page_event(sites: List[TargetWebsite], adaptive_schedule: bool = False) -> DetectWebsiteChangesEvent:
+    site = sites[0]
+    selectors = None
+    if len(sites) > 1:
+        selectors = [SiteSelector(s.selector or 'body', s.title, s.normalize, s.similarity_threshold) for s in sites]
+    return DetectWebsiteChangesEvent(site.url, site.selector, site.title, site.fetch_mode, site.load_profile, site.wait,
+                                     site.normalize, site.similarity_threshold, selectors, adaptive_schedule)
+
+
+def handle(monitor_config: WebMonitorConfig, task_config: TaskSchedulerConfig) -> dict:
+    now = int(time.time())
+    adaptive = monitor_config.adaptive_schedule.enabled
+    scheduler = AdaptiveScheduler(task_config.schedules, monitor_config.adaptive_schedule, task_config.logger)
+    if adaptive:
+        scheduler.load()
+    pages: Dict[str, List[TargetWebsite]] = {}
+    for site in monitor_config.site_targets:
+        target_id = site_target_id(site.url, site.selector)
+        if not scheduler.is_due(target_id, now):
+            continue
+        scheduler.dispatched(target_id, now)
+        page_key = json.dumps([site.url, site.fetch_mode, site.load_profile, site.wait], sort_keys=True)
+        pages.setdefault(page_key, []).append(site)
+    for sites in pages.values():
+        notify_message(
+            task_config.sns_client,
+            task_config.detect_website_changes_topic,
+            dataclasses.asdict(page_event(sites, adaptive)),
+            task_config.logger,
+            task_config.envelope
+        )
+    subscriptions: Dict[str, Optional[WebSubSubscription]] = {}
+    if monitor_config.websub_enabled and task_config.subscriptions is not None:
+        websub_urls = [rss.url for rss in monitor_config.rss_targets if rss.websub]
+        subscriptions = dict(zip(websub_urls, task_config.subscriptions.get_many(websub_urls)))
+    for rss in monitor_config.rss_targets:
+        if is_pushed(subscriptions.get(rss.url), now):
+            continue
+        target_id = rss_target_id(rss.url)
+        if not scheduler.is_due(target_id, now):
+            continue
+        scheduler.dispatched(target_id, now)
+        e = DetectRSSEntryEvent(rss.url, rss.selector, monitor_config.rss_keywords(rss), rss.fetch_mode,
+                                rss.load_profile, rss.wait, rss.stream_mode, rss.url in subscriptions,
+                                match_stages=rss.match_stages, adaptive_schedule=adaptive)
+        notify_message(
+            task_config.sns_client,
+            task_config.detect_rss_entry_topic,
+            dataclasses.asdict(e),
+            task_config.logger,
+            task_config.envelope
+        )
+    if adaptive:
+        scheduler.save()
+    return {}
+
+
+def notify_message(
+    sns,
+    topic: str,
+    message: dict,
+    logger: logging.Logger,
+    message_envelope: Optional[MessageEnvelope] = None
+):
+    if message_envelope is not None:
+        j = message_envelope.wrap(message)
+    else:
+        j = json.dumps(message, ensure_ascii=False)
+    res = sns.publish(
+        TopicArn=topic,
+        Message=j,
+    )
+    logger.info(json.dumps({
+        'event': 'web_monitor:notify_message:message_id',
+        'details': {'message': message, 'return': res}
+    }, ensure_ascii=False))
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import base64
+import logging
+import dataclasses
+from typing import Optional, Dict
+
+from WebMonitorConfig import WebMonitorConfig
+from WebMonitor import DetectRSSEntryEvent
+from MessageEnvelope import MessageEnvelope
+from WebSub import WebSubSubscriptions, verify_intent, verify_signature
+
+
+@dataclasses.dataclass(frozen=True)
+class WebSubCallbackConfig:
+    sns_client: any
+    detect_rss_entry_topic: str
+    subscriptions: WebSubSubscriptions
+    logger: logging.Logger
+    envelope: Optional[MessageEnvelope] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class CallbackRequest:
+    method: str
+    token: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes
+
+    @staticmethod
+    def from_api_gateway(event: dict) -> CallbackRequest:
+        body = event.get('body') or ''
+        if event.get('isBase64Encoded', False):
+            body = base64.b64decode(body)
+        else:
+            body = body.encode('utf-8')
+        return CallbackRequest(
+            method=event['httpMethod'],
+            token=(event.get('pathParameters') or {}).get('token', ''),
+            query=event.get('queryStringParameters') or {},
+            headers={k.lower(): v for k, v in (event.get('headers') or {}).items()},
+            body=body,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class CallbackResponse:
+    status: int
+    body: str = ''
+
+    def to_api_gateway(self) -> dict:
+        return {
+            'statusCode': self.status,
+            'headers': {'Content-Type': 'text/plain'},
+            'body': self.body,
+        }
+
+
+def handle(
+    request: CallbackRequest,
+    monitor_config: WebMonitorConfig,
+    config: WebSubCallbackConfig
+) -> CallbackResponse:
+    if request.method == 'GET':
+        return verify(request, config)
+    if request.method == 'POST':
+        return distribute(request, monitor_config, config)
+    return CallbackResponse(405)
+
+
+def verify(request: CallbackRequest, config: WebSubCallbackConfig) -> CallbackResponse:
+    mode = request.query.get('hub.mode')
+    topic = request.query.get('hub.topic')
+    verified = verify_intent(
+        config.subscriptions, request.token, mode, topic, request.query.get('hub.lease_seconds'))
+    config.logger.info(json.dumps({
+        'event': 'web-monitor:websub_callback:verify',
+        'details': {
+            'mode': mode,
+            'topic': topic,
+            'verified': verified,
+        }
+    }, ensure_ascii=False))
+    if not verified:
+        return CallbackResponse(404)
+    return CallbackResponse(200, request.query.get('hub.challenge', ''))
+
+
+def distribute(
+    request: CallbackRequest,
+    monitor_config: WebMonitorConfig,
+    config: WebSubCallbackConfig
+) -> CallbackResponse:
+    subscription = config.subscriptions.get_by_token(request.token)
+    if subscription is None:
+        return CallbackResponse(410)
+    target = next((t for t in monitor_config.rss_targets if t.url == subscription.feed_url), None)
+    if target is None or not monitor_config.websub_enabled or not target.websub:
+        return CallbackResponse(410)
+    if not verify_signature(subscription.secret, request.headers.get('x-hub-signature'), request.body):
+        config.logger.warning(json.dumps({
+            'event': 'web-monitor:websub_callback:distribute:invalid_signature',
+            'details': {
+                'feed_url': subscription.feed_url,
+            }
+        }, ensure_ascii=False))
+        return CallbackResponse(202)
+    e = DetectRSSEntryEvent(target.url, target.selector, monitor_config.rss_keywords(target), target.fetch_mode,
+                            target.load_profile, target.wait, target.stream_mode, True,
+                            base64.b64encode(request.body).decode('ascii'), target.match_stages)
+    notify_message(config.sns_client, config.detect_rss_entry_topic, dataclasses.asdict(e), config.logger,
+                   config.envelope)
+    return CallbackResponse(202)
+
+
+def notify_message(
+    sns,
+    topic: str,
+    message: dict,
+    logger: logging.Logger,
+    message_envelope: Optional[MessageEnvelope] = None
+):
+    if message_envelope is not None:
+        j = message_envelope.wrap(message)
+    else:
+        j = json.dumps(message, ensure_ascii=False)
+    res = sns.publish(
+        TopicArn=topic,
+        Message=j,
+    )
+    logger.info(json.dumps({
+        'event': 'web-monitor:websub_callback:notify_message:message_id',
+        'details': {
+            'feed_url': message['feed_url'],
+            'pushed_bytes': len(message['pushed_content'] or ''),
+            'return': res,
+        }
+    }, ensure_ascii=False))
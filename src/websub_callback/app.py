@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import os
+import boto3
+import logging
+
+from WebMonitorConfig import WebMonitorConfig
+from MessageEnvelope import MessageEnvelope
+from WebSub import WebSubSubscriptionsOnS3
+from WebSubCallback import WebSubCallbackConfig, CallbackRequest, handle
+
+stage = os.environ['Stage']
+config_bucket = os.environ['ConfigBucket']
+config_key_name = os.environ['ConfigKeyName']
+detect_rss_entry_topic = os.environ['DetectRSSEntryTopic']
+bucket_name = os.environ['WebMonitorBucket']
+bucket = boto3.resource('s3').Bucket(bucket_name)
+envelope = MessageEnvelope(bucket)
+
+
+def lambda_handler(event, __) -> dict:
+    logger = logging.getLogger(__name__)
+    handler = logging.StreamHandler()
+    log_level = getattr(logging, 'INFO', None)
+    handler.setLevel(log_level)
+    logger.setLevel(log_level)
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    sns_client = boto3.client('sns')
+    config = WebSubCallbackConfig(
+        sns_client, detect_rss_entry_topic, WebSubSubscriptionsOnS3(bucket, logger), logger, envelope)
+    monitor_config = WebMonitorConfig.initialize(config_bucket, config_key_name)
+    return handle(CallbackRequest.from_api_gateway(event), monitor_config, config).to_api_gateway()
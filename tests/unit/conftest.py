@@ -0,0 +1,16 @@
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+
+for path in (
+    'layers/pip_modules/python',
+    'layers/browser_kit/python',
+    'detect_website_changes',
+    'detect_rss_entry',
+    'handle_events',
+    'task_scheduler',
+    'websub_callback',
+    'daemon',
+):
+    sys.path.insert(0, os.path.normpath(os.path.join(SRC, path)))
@@ -0,0 +1,217 @@
+import io
+import hashlib
+import contextlib
+import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError, ParamValidationError
+
+from HttpClient import HttpResponse
+from RSSEntryDetector import RSSEntries, FeedValidators, FeedHighWaterMark, PendingEntry
+from WebDriverWrapper import WebDriverWrapperFindElementResult, FindElementTimeout
+from WebsiteChangesDetector import WebsiteRevisions
+
+
+class MemoryRSSEntries(RSSEntries):
+    def __init__(self):
+        self.checked = set()
+        self.validators: Dict[str, FeedValidators] = {}
+        self.high_water_marks: Dict[str, FeedHighWaterMark] = {}
+        self.pending: Dict[str, List[PendingEntry]] = {}
+        self.flushed: List[str] = []
+        self.lookups: List[List[str]] = []
+
+    def has_checked(self, feed_url: str, entry_url: Optional[str] = None) -> bool:
+        return (feed_url, entry_url) in self.checked
+
+    def has_checked_many(self, feed_url: str, entry_urls: List[str]) -> List[bool]:
+        self.lookups.append(entry_urls)
+        return super().has_checked_many(feed_url, entry_urls)
+
+    def check(self, feed_url: str, entry_url: Optional[str]):
+        self.checked.add((feed_url, None))
+        if entry_url:
+            self.checked.add((feed_url, entry_url))
+
+    def get_validators(self, feed_url: str) -> Optional[FeedValidators]:
+        return self.validators.get(feed_url)
+
+    def put_validators(self, feed_url: str, validators: FeedValidators):
+        self.validators[feed_url] = validators
+
+    def get_high_water_mark(self, feed_url: str) -> Optional[FeedHighWaterMark]:
+        return self.high_water_marks.get(feed_url)
+
+    def put_high_water_mark(self, feed_url: str, high_water_mark: FeedHighWaterMark):
+        self.high_water_marks[feed_url] = high_water_mark
+
+    def get_pending_entries(self, feed_url: str) -> List[PendingEntry]:
+        return self.pending.get(feed_url, [])
+
+    def put_pending_entries(self, feed_url: str, entries: List[PendingEntry]):
+        self.pending[feed_url] = entries
+
+    def flush(self, feed_url: str):
+        self.flushed.append(feed_url)
+
+
+class FakeHttpClient:
+    def __init__(self, responses: Optional[Dict[str, HttpResponse]] = None):
+        self.responses = responses or {}
+        self.requests: List[Tuple[str, Optional[Dict[str, str]]]] = []
+        self.streams: List[FakeHttpStream] = []
+        self.chunk_size = 64
+        self.posts: List[Tuple[str, Dict[str, str]]] = []
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> HttpResponse:
+        self.requests.append((url, headers))
+        return self.responses[url]
+
+    def post(self, url: str, data: Optional[Dict[str, str]] = None, headers=None, timeout=None) -> HttpResponse:
+        self.posts.append((url, dict(data or {})))
+        return HttpResponse(202, url, {}, b'')
+
+    @contextlib.contextmanager
+    def stream(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None):
+        res = self.get(url, headers, timeout)
+        self.streams.append(FakeHttpStream(res, self.chunk_size))
+        yield self.streams[-1]
+
+
+class FakeHttpStream:
+    def __init__(self, response: HttpResponse, chunk_size: int):
+        self.status = response.status
+        self.url = response.url
+        self.headers = {k.lower(): v for k, v in response.headers.items()}
+        self.chunks_read = 0
+        self._response = response
+        self._chunk_size = chunk_size
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+    def iter_chunks(self):
+        body = self._response.body
+        for i in range(0, len(body), self._chunk_size):
+            self.chunks_read += 1
+            yield body[i:i + self._chunk_size]
+
+
+class FakePageFetcher:
+    def __init__(self, texts: Dict[str, Optional[str]]):
+        self.texts = texts
+        self.calls: List[Tuple[str, List[str]]] = []
+
+    def find_elements(self, url, selectors, options=None, deadline=None):
+        self.calls.append((url, list(selectors)))
+        return [
+            WebDriverWrapperFindElementResult(url, 'title', s, self.texts[s]) if self.texts[s] is not None
+            else FindElementTimeout(url, s, 0.0)
+            for s in selectors
+        ]
+
+    def find_element(self, url, selector, options=None, deadline=None):
+        return self.find_elements(url, [selector], options, deadline)[0]
+
+
+class MemoryRevisions(WebsiteRevisions):
+    def __init__(self):
+        self.texts: Dict[Tuple[str, str], str] = {}
+        self.gets: List[Tuple[str, str]] = []
+        self.updates: List[Tuple[str, str, str]] = []
+
+    def get(self, url: str, selector: str) -> Optional[str]:
+        self.gets.append((url, selector))
+        return self.texts.get((url, selector))
+
+    def update(self, url, selector, selected_source, digest=None, fingerprint=None):
+        self.updates.append((url, selector, selected_source))
+        self.texts[(url, selector)] = selected_source
+
+
+class FakeSNS:
+    def __init__(self):
+        self.published: List[Tuple[str, str]] = []
+
+    def publish(self, TopicArn: str, Message: str) -> dict:
+        self.published.append((TopicArn, Message))
+        return {'MessageId': f'm{len(self.published)}'}
+
+
+def rss(*items: Tuple[str, str], extra: str = '') -> bytes:
+    body = ''.join(f'<item><title>{t}</title><link>{link}</link>{extra}</item>' for t, link in items)
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{body}</channel></rss>'.encode()
+
+
+def client_error(code: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+class FakeS3:
+    def __init__(self, name: str = 'bucket'):
+        self.name = name
+        self.objects_by_key: Dict[str, dict] = {}
+        self.deleted: List[str] = []
+        self.reads: List[Tuple[str, str]] = []
+        self.meta = SimpleNamespace(client=self)
+        self.objects = SimpleNamespace(filter=self._filter)
+
+    def _put(self, key: str, body, metadata: Optional[Dict[str, str]] = None) -> dict:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        etag = '"' + hashlib.md5(body + key.encode()).hexdigest() + '"'
+        self.objects_by_key[key] = {
+            'Body': body,
+            'ETag': etag,
+            'Metadata': metadata or {},
+            'LastModified': datetime.datetime.now(datetime.timezone.utc),
+        }
+        return {'ETag': etag}
+
+    def _response(self, key: str, operation: str, code: str = 'NoSuchKey') -> dict:
+        self.reads.append((operation, key))
+        obj = self.objects_by_key.get(key)
+        if obj is None:
+            raise client_error(code, operation)
+        return {**obj, 'Body': io.BytesIO(obj['Body'])}
+
+    def _filter(self, Prefix: str = ''):
+        return [SimpleNamespace(
+            key=k,
+            last_modified=o['LastModified'],
+            get=lambda k=k: self._response(k, 'GetObject'),
+        ) for k, o in sorted(self.objects_by_key.items()) if k.startswith(Prefix)]
+
+    def Object(self, key: str):
+        return SimpleNamespace(
+            get=lambda **_: self._response(key, 'GetObject'),
+            put=lambda Body, Metadata=None, **_: self._put(key, Body, Metadata),
+        )
+
+    def get_object(self, Bucket: str, Key: str, IfNoneMatch: Optional[str] = None, **_) -> dict:
+        res = self._response(Key, 'GetObject')
+        if IfNoneMatch is not None and IfNoneMatch == res['ETag']:
+            raise client_error('304', 'GetObject')
+        return res
+
+    def head_object(self, Bucket: str, Key: str, **_) -> dict:
+        res = self._response(Key, 'HeadObject', '404')
+        del res['Body']
+        return res
+
+    def put_object(self, Bucket: str, Key: str, Body=b'', Metadata=None, **kwargs) -> dict:
+        unsupported = [k for k in ('IfMatch', 'IfNoneMatch') if k in kwargs]
+        if unsupported:
+            raise ParamValidationError(report=f'Unknown parameter in input: {unsupported[0]}')
+        return self._put(Key, Body, Metadata)
+
+    def delete_object(self, Bucket: str, Key: str, **_) -> dict:
+        self.objects_by_key.pop(Key, None)
+        self.deleted.append(Key)
+        return {}
+
+    def delete_objects(self, Delete: dict, Bucket: Optional[str] = None) -> dict:
+        for o in Delete['Objects']:
+            self.delete_object(Bucket, o['Key'])
+        return {}
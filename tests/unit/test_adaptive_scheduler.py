@@ -0,0 +1,76 @@
+import logging
+
+from TargetSchedules import AdaptiveScheduler, TargetSchedulesOnS3
+from WebMonitorConfig import AdaptiveScheduleConfig
+
+from .fakes import FakeS3
+
+logger = logging.getLogger(__name__)
+CONFIG = AdaptiveScheduleConfig(True, min_interval=600, max_interval=3600, backoff=2.0)
+
+
+def feedback(s3: FakeS3, target_id: str, checked_at: int, changed: bool):
+    s3.put_object(Bucket=s3.name, Key=f'schedules/feedback/{target_id}/{checked_at}-{int(changed)}', Body=b'')
+
+
+def test_checks_are_parsed_in_time_order():
+    s3 = FakeS3()
+    feedback(s3, 'b', 200, True)
+    feedback(s3, 'a', 100, False)
+    s3.put_object(Bucket=s3.name, Key='schedules/feedback/garbage', Body=b'')
+    checks = TargetSchedulesOnS3(s3, logger).checks()
+    assert [(c.target_id, c.checked_at, c.changed) for c in checks] == [('a', 100, False), ('b', 200, True)]
+
+
+def test_unchanged_targets_back_off_up_to_the_maximum():
+    s3 = FakeS3()
+    for t in (1000, 2000, 3000, 4000):
+        feedback(s3, 'a', t, False)
+    scheduler = AdaptiveScheduler(TargetSchedulesOnS3(s3, logger), CONFIG, logger)
+    scheduler.load()
+    state = scheduler._state['a']
+    assert state.interval == 3600
+    assert state.next_due == 4000 + 3600
+    assert state.checks == 4 and state.changes == 0
+
+
+def test_change_resets_interval_to_minimum():
+    s3 = FakeS3()
+    feedback(s3, 'a', 1000, False)
+    feedback(s3, 'a', 2000, False)
+    feedback(s3, 'a', 3000, True)
+    scheduler = AdaptiveScheduler(TargetSchedulesOnS3(s3, logger), CONFIG, logger)
+    scheduler.load()
+    assert scheduler._state['a'].interval == 600
+    assert scheduler._state['a'].last_changed == 3000
+    assert not scheduler.is_due('a', 3000)
+    assert scheduler.is_due('a', 3600 - 60)
+    assert scheduler.is_due('unknown', 0)
+
+
+def test_disabled_config_dispatches_everything():
+    s3 = FakeS3()
+    feedback(s3, 'a', 1000, False)
+    scheduler = AdaptiveScheduler(TargetSchedulesOnS3(s3, logger), AdaptiveScheduleConfig(False), logger)
+    scheduler.load()
+    assert scheduler.is_due('a', 1000)
+
+
+def test_save_keeps_seen_targets_and_deletes_folded_checks():
+    s3 = FakeS3()
+    feedback(s3, 'a', 1000, True)
+    feedback(s3, 'removed', 1000, True)
+    schedules = TargetSchedulesOnS3(s3, logger)
+    scheduler = AdaptiveScheduler(schedules, CONFIG, logger)
+    scheduler.load()
+    scheduler.is_due('a', 1000)
+    scheduler.dispatched('a', 1000)
+    scheduler.save()
+    assert schedules.checks() == []
+    saved = schedules.load()
+    assert list(saved) == ['a']
+    assert saved['a'].next_due == 1600
+
+    reloaded = AdaptiveScheduler(schedules, CONFIG, logger)
+    reloaded.load()
+    assert reloaded._state['a'].checks == 1
@@ -0,0 +1,28 @@
+from ArticleCache import ArticleCache, canonical_url
+from RSSEntryDetector import RelatedRSSEntryDetector, RSSEntry, EntryMatch
+
+from .fakes import FakeS3, FakePageFetcher
+
+ENTRY = RSSEntry('http://Example.com/a?utm_source=feed', 'title')
+
+
+def test_canonical_url_drops_tracking_parameters():
+    assert canonical_url('HTTP://Example.com/a?b=2&utm_source=x&a=1#top') == 'http://example.com/a?a=1&b=2'
+
+
+def test_other_feed_with_different_keywords_re_runs_matcher_on_cached_text():
+    fetcher = FakePageFetcher({'#main': 'the article mentions python'})
+    detector = RelatedRSSEntryDetector(fetcher, ArticleCache(FakeS3()))
+    assert detector.match(ENTRY, '#main', ['rust'], ['static'], feed_url='feed-a') is None
+    assert detector.match(ENTRY, '#main', ['python'], ['static'], feed_url='feed-b') == EntryMatch('python', 'static')
+    assert len(fetcher.calls) == 1
+
+
+def test_same_scope_is_evaluated_only_once_across_feeds():
+    fetcher = FakePageFetcher({'#main': 'python'})
+    detector = RelatedRSSEntryDetector(fetcher, ArticleCache(FakeS3()))
+    assert detector.match(ENTRY, '#main', ['python', 'go'], ['static'], feed_url='feed-a') == \
+        EntryMatch('python', 'static')
+    assert detector.match(
+        RSSEntry('http://example.com/a', 'other title'), '#main', ['go', 'python'], ['static'], feed_url='feed-b'
+    ) is None
@@ -0,0 +1,166 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import BrowserManager as browser_module
+import WebDriverWrapper as driver_module
+from BrowserManager import BrowserManager
+from WebDriverWrapper import WebDriverWrapper, LoadProfile
+
+
+class FakeDriver:
+    def __init__(self, load_profile: LoadProfile):
+        self.load_profile = load_profile
+        self.page_loads = 0
+        self.alive = True
+        self.clearable = True
+        self.cleared = 0
+        self.quit_called = False
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def clear_state(self) -> bool:
+        self.cleared += 1
+        return self.clearable
+
+    def apply_load_profile(self, load_profile: LoadProfile):
+        self.load_profile = load_profile
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self, load_profile: LoadProfile) -> FakeDriver:
+        self.drivers.append(FakeDriver(load_profile))
+        return self.drivers[-1]
+
+
+def test_driver_is_reused_with_cleared_state():
+    factory = Factory()
+    manager = BrowserManager(factory, max_page_loads=10)
+    first = manager.acquire()
+    assert manager.acquire() is first
+    assert first.cleared == 1
+    assert len(factory.drivers) == 1
+
+
+def test_driver_is_recycled_after_max_page_loads():
+    factory = Factory()
+    manager = BrowserManager(factory, max_page_loads=2)
+    first = manager.acquire()
+    first.page_loads = 2
+    second = manager.acquire()
+    assert second is not first and first.quit_called
+
+
+def test_unhealthy_driver_is_recycled():
+    factory = Factory()
+    manager = BrowserManager(factory)
+    first = manager.acquire()
+    first.alive = False
+    assert manager.acquire() is not first
+
+
+def test_driver_is_recycled_when_state_cannot_be_cleared():
+    factory = Factory()
+    manager = BrowserManager(factory)
+    first = manager.acquire()
+    first.clearable = False
+    assert manager.acquire() is not first and first.quit_called
+
+
+def test_driver_is_recycled_over_memory_limit(monkeypatch):
+    factory = Factory()
+    manager = BrowserManager(factory, max_memory_mb=100)
+    first = manager.acquire()
+    monkeypatch.setattr(browser_module, '_memory_usage_mb', lambda: 150)
+    assert manager.acquire() is not first
+
+
+def test_close_quits_driver():
+    factory = Factory()
+    manager = BrowserManager(factory)
+    driver = manager.acquire()
+    manager.close()
+    assert driver.quit_called
+    assert manager.acquire() is not driver
+
+
+def test_blocked_urls_change_reuses_driver():
+    factory = Factory()
+    manager = BrowserManager(factory)
+    first = manager.acquire()
+    blocking = LoadProfile(blocked_resource_types=('image',))
+    assert manager.acquire(blocking) is first
+    assert first.load_profile == blocking
+
+
+def test_launch_options_change_recycles_driver():
+    factory = Factory()
+    manager = BrowserManager(factory)
+    first = manager.acquire()
+    assert manager.acquire(LoadProfile(page_load_strategy='eager')) is not first
+    assert factory.drivers[-1].load_profile.page_load_strategy == 'eager'
+
+
+class FakeChrome:
+    def __init__(self, executable_path=None, chrome_options=None):
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((cmd, params))
+
+
+class LegacyChrome:
+    def __init__(self, executable_path=None, chrome_options=None):
+        pass
+
+
+class UnsupportedCdpChrome(LegacyChrome):
+    def execute_cdp_cmd(self, cmd, params):
+        raise WebDriverException('unknown command')
+
+
+def test_blocked_urls_are_updated_on_the_live_session(monkeypatch):
+    monkeypatch.setattr(driver_module, 'Chrome', FakeChrome)
+    driver = WebDriverWrapper(LoadProfile(blocked_url_patterns=('*.ads.js',)))
+    chrome = driver._web_driver
+    assert chrome.commands[-1] == ('Network.setBlockedURLs', {'urls': ['*.ads.js']})
+    driver.apply_load_profile(LoadProfile(blocked_url_patterns=('*.ads.js',)))
+    assert len(chrome.commands) == 2
+    driver.apply_load_profile(LoadProfile())
+    assert chrome.commands[-1] == ('Network.setBlockedURLs', {'urls': []})
+
+
+@pytest.mark.parametrize('chrome', [LegacyChrome, UnsupportedCdpChrome])
+def test_blocked_urls_without_cdp_support_do_not_fail(monkeypatch, chrome):
+    monkeypatch.setattr(driver_module, 'Chrome', chrome)
+    driver = WebDriverWrapper(LoadProfile(blocked_url_patterns=('*.ads.js',)))
+    driver.apply_load_profile(LoadProfile())
+    assert driver.load_profile == LoadProfile()
+
+
+def test_clear_state_clears_every_visited_origin(monkeypatch):
+    monkeypatch.setattr(driver_module, 'Chrome', FakeChrome)
+    driver = WebDriverWrapper(LoadProfile())
+    chrome = driver._web_driver
+    driver._visited('https://example.com/a')
+    driver._visited('https://login.example.org/callback?x=1')
+    driver._visited('about:blank')
+    assert driver.clear_state()
+    cleared = [p['origin'] for c, p in chrome.commands if c == 'Storage.clearDataForOrigin']
+    assert cleared == ['https://example.com', 'https://login.example.org']
+    assert chrome.commands[-1] == ('Network.clearBrowserCookies', {})
+    chrome.commands.clear()
+    assert driver.clear_state()
+    assert chrome.commands == [('Network.clearBrowserCookies', {})]
+
+
+@pytest.mark.parametrize('chrome', [LegacyChrome, UnsupportedCdpChrome])
+def test_clear_state_without_cdp_support_asks_for_a_new_driver(monkeypatch, chrome):
+    monkeypatch.setattr(driver_module, 'Chrome', chrome)
+    assert not WebDriverWrapper(LoadProfile()).clear_state()
@@ -0,0 +1,42 @@
+from WebMonitor import DetectWebsiteChangesResult, changed_chars
+from WebsiteChangesDetector import summarize_changes, text_digest
+from NotificationDigest import PendingNotification
+
+
+def test_chars_count_only_the_edited_characters():
+    summary = summarize_changes('price: 100 yen\nfooter', 'price: 120 yen\nfooter')
+    assert (summary.chars_added, summary.chars_removed) == (1, 1)
+    assert summary.diff.splitlines()[2:] == ['@@ -1,2 +1,2 @@', '-price: 100 yen', '+price: 120 yen', ' footer']
+    assert not summary.diff_truncated
+
+
+def test_inserted_and_deleted_lines_count_whole_lines():
+    assert changed_chars('a\nb', 'a\nnew line\nb') == (8, 0)
+    assert changed_chars('a\nold\nb', 'a\nb') == (0, 3)
+    assert changed_chars('same', 'same') == (0, 0)
+
+
+def test_diff_is_capped_by_lines_and_size():
+    previous = '\n'.join(f'line {i}' for i in range(100))
+    current = '\n'.join(f'line {i}!' for i in range(100))
+    summary = summarize_changes(previous, current, max_lines=10)
+    assert summary.diff_truncated and len(summary.diff.splitlines()) == 10
+    assert summary.chars_added == 100 and summary.chars_removed == 0
+
+    summary = summarize_changes(previous, current, max_chars=64)
+    assert summary.diff_truncated and len(summary.diff) <= 64
+
+
+def test_old_format_message_is_handled():
+    message = {
+        'url': 'http://example.com/', 'selector': '#main', 'title': 't', 'has_changed': True,
+        'text_previous': 'price: 100', 'text_current': 'price: 120', 'type': 'DetectWebsiteChangesResult',
+    }
+    result = DetectWebsiteChangesResult.from_message(message)
+    assert result.digest_previous == text_digest('price: 100')
+    assert (result.chars_added, result.chars_removed) == (1, 1)
+    assert PendingNotification.from_website_changes(result, 'm1') is not None
+
+    first_check = dict(message, text_previous=None)
+    assert PendingNotification.from_website_changes(DetectWebsiteChangesResult.from_message(first_check), 'm2') is None
+
@@ -0,0 +1,39 @@
+from HttpClient import HttpResponse
+from RSSEntryDetector import RSSNewEntryDetector, FeedValidators
+
+from .fakes import MemoryRSSEntries, FakeHttpClient, rss
+
+FEED_URL = 'http://example.com/feed.xml'
+
+
+def response(status: int, body: bytes = b'', headers=None) -> HttpResponse:
+    return HttpResponse(status, FEED_URL, headers or {}, body)
+
+
+def test_conditional_headers_from_validators():
+    headers = RSSNewEntryDetector._conditional_headers(FeedValidators('"abc"', 'Mon, 01 Jan 2024 00:00:00 GMT'))
+    assert headers == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert RSSNewEntryDetector._conditional_headers(FeedValidators()) == {}
+
+
+def test_validators_are_persisted_and_sent_on_next_poll():
+    entries = MemoryRSSEntries()
+    client = FakeHttpClient({FEED_URL: response(
+        200, rss(('a', 'http://example.com/a')), {'ETag': '"v1"', 'Last-Modified': 'yesterday'})})
+    detector = RSSNewEntryDetector(entries, client=client)
+    detector.detect_new_entries(FEED_URL)
+    assert entries.validators[FEED_URL] == FeedValidators('"v1"', 'yesterday')
+
+    client.responses[FEED_URL] = response(304)
+    assert detector.detect_new_entries(FEED_URL) == []
+    assert client.requests[-1][1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'}
+    assert entries.validators[FEED_URL] == FeedValidators('"v1"', 'yesterday')
+
+
+def test_duplicate_links_keep_the_first_entry():
+    entries = MemoryRSSEntries()
+    entries.check(FEED_URL, 'http://example.com/old')
+    body = rss(('first', 'http://example.com/a'), ('second', 'http://example.com/a'), ('old', 'http://example.com/old'))
+    detector = RSSNewEntryDetector(entries, client=FakeHttpClient({FEED_URL: response(200, body)}))
+    assert [e.title for e in detector.detect_new_entries(FEED_URL)] == ['first']
+    assert [e.title for e in detector.detect_pushed_entries(FEED_URL, body.replace(b'/a<', b'/b<'))] == ['first']
@@ -0,0 +1,39 @@
+import pytest
+
+import WebMonitorConfig as config_module
+from WebMonitorConfig import WebMonitorConfig
+
+from .fakes import FakeS3
+
+CONFIG_KEY = 'config.yaml'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = FakeS3('config')
+    s3.put_object(Bucket=s3.name, Key=CONFIG_KEY, Body=b'site_targets:\n  - url: http://example.com/\n    selector: body\n')
+    monkeypatch.setattr(config_module, '_s3_client', s3)
+    monkeypatch.setattr(config_module, '_cache', {})
+    return s3
+
+
+def test_config_is_cached_within_ttl(s3):
+    first = WebMonitorConfig.initialize(s3.name, CONFIG_KEY)
+    assert WebMonitorConfig.initialize(s3.name, CONFIG_KEY) is first
+    assert len(s3.reads) == 1
+    assert first.version == s3.objects_by_key[CONFIG_KEY]['ETag']
+    assert first.site_targets is first.site_targets and len(first.site_targets) == 1
+
+
+def test_unchanged_config_is_revalidated_after_ttl(s3):
+    first = WebMonitorConfig.initialize(s3.name, CONFIG_KEY, ttl=0)
+    assert WebMonitorConfig.initialize(s3.name, CONFIG_KEY, ttl=0) is first
+    assert len(s3.reads) == 2
+
+
+def test_changed_config_is_reloaded_after_ttl(s3):
+    first = WebMonitorConfig.initialize(s3.name, CONFIG_KEY, ttl=0)
+    s3.put_object(Bucket=s3.name, Key=CONFIG_KEY, Body=b'site_targets:\n  - url: http://example.org/\n    selector: body\n')
+    second = WebMonitorConfig.initialize(s3.name, CONFIG_KEY, ttl=0)
+    assert second is not first
+    assert second.site_targets[0].url == 'http://example.org/'
@@ -0,0 +1,47 @@
+import json
+import logging
+
+import pytest
+
+from EventRecords import EventRecord, process_records
+
+logger = logging.getLogger(__name__)
+
+
+def sqs_record(message_id: str, message: dict, via_sns: bool = False) -> dict:
+    body = {'Type': 'Notification', 'Message': json.dumps(message)} if via_sns else message
+    return {'messageId': message_id, 'eventSource': 'aws:sqs', 'body': json.dumps(body)}
+
+
+def sns_record(message_id: str, message: dict) -> dict:
+    return {'EventSource': 'aws:sns', 'Sns': {'MessageId': message_id, 'Message': json.dumps(message)}}
+
+
+def process(record: EventRecord):
+    if record.message.get('fail'):
+        raise ValueError(record.message_id)
+    return record.message['value']
+
+
+def test_from_record_unwraps_sns_notification_body():
+    record = EventRecord.from_record(sqs_record('m1', {'value': 1}, via_sns=True))
+    assert record == EventRecord('m1', {'value': 1}, 'aws:sqs')
+    assert EventRecord.from_record(sns_record('m2', {'value': 2})).event_source == 'aws:sns'
+
+
+def test_sqs_failures_are_reported_per_record():
+    event = {'Records': [sqs_record('m1', {'value': 1}), sqs_record('m2', {'fail': True}), sqs_record('m3', {'value': 3})]}
+    result = process_records(event, process, logger, 'test')
+    assert result['results'] == [1, 3]
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm2'}]
+
+
+def test_sns_failure_is_raised():
+    with pytest.raises(ValueError):
+        process_records({'Records': [sns_record('m1', {'fail': True})]}, process, logger, 'test')
+
+
+def test_sns_failure_is_raised_even_when_other_records_succeeded():
+    event = {'Records': [sns_record('m1', {'value': 1}), sns_record('m2', {'fail': True})]}
+    with pytest.raises(ValueError, match='m2'):
+        process_records(event, process, logger, 'test')
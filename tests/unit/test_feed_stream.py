@@ -0,0 +1,90 @@
+from HttpClient import HttpResponse
+from FeedStream import iter_entries
+from RSSEntryDetector import RSSNewEntryDetector, FeedHighWaterMark
+
+from .fakes import MemoryRSSEntries, FakeHttpClient
+
+FEED_URL = 'http://example.com/feed.xml'
+ATOM = b'''<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>t</title>
+<entry><title>A</title><link rel="self" href="http://example.com/self"/><link href="http://example.com/a"/>
+<id>tag:a</id><updated>2024-01-02T00:00:00Z</updated><category term="news"/><summary>short</summary></entry>
+</feed>'''
+
+
+def item(n: int) -> str:
+    return f'<item><title>{n}</title><link>http://example.com/{n}</link><guid>guid-{n}</guid>' \
+           f'<pubDate>Mon, 01 Jan 2024 00:{n:02d}:00 GMT</pubDate></item>'
+
+
+def feed(*numbers: int) -> bytes:
+    items = ''.join(item(n) for n in numbers)
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+
+def poll(detector: RSSNewEntryDetector, client: FakeHttpClient, body: bytes, stream_mode: str):
+    client.responses[FEED_URL] = HttpResponse(200, FEED_URL, {}, body)
+    return [e.url for e in detector.detect_new_entries(FEED_URL, stream_mode)]
+
+
+def test_iter_entries_parses_split_chunks():
+    chunks = [ATOM[i:i + 7] for i in range(0, len(ATOM), 7)]
+    entries = list(iter_entries(chunks))
+    assert len(entries) == 1
+    assert entries[0].link == 'http://example.com/a'
+    assert entries[0].guid == 'tag:a'
+    assert entries[0].published_at == 1704153600
+    assert entries[0].tags == ('news',)
+    assert entries[0].summary == 'short'
+
+
+def test_rss_guid_defaults_to_link():
+    body = b'<rss><channel><item><title>x</title><link>http://example.com/x</link></item></channel></rss>'
+    assert [e.guid for e in iter_entries([body])] == ['http://example.com/x']
+
+
+def test_guid_mode_stops_at_high_water_mark():
+    entries, client = MemoryRSSEntries(), FakeHttpClient()
+    detector = RSSNewEntryDetector(entries, client=client)
+    assert poll(detector, client, feed(*range(10, 0, -1)), 'guid') == []
+    assert entries.high_water_marks[FEED_URL] == FeedHighWaterMark('guid-10', 1704067800)
+
+    entries.checked.clear()
+    entries.checked.add((FEED_URL, None))
+    body = feed(12, 11, *range(10, 0, -1))
+    assert poll(detector, client, body, 'guid') == ['http://example.com/12', 'http://example.com/11']
+    assert entries.high_water_marks[FEED_URL].guid == 'guid-12'
+    assert client.streams[-1].chunks_read < len(body) // client.chunk_size
+
+
+def test_published_mode_stops_at_older_entries():
+    entries, client = MemoryRSSEntries(), FakeHttpClient()
+    entries.checked.add((FEED_URL, None))
+    entries.high_water_marks[FEED_URL] = FeedHighWaterMark(None, 1704067200 + 5 * 60)
+    detector = RSSNewEntryDetector(entries, client=client)
+    assert poll(detector, client, feed(7, 6, 5, 4), 'published') == ['http://example.com/7', 'http://example.com/6']
+    assert entries.high_water_marks[FEED_URL] == FeedHighWaterMark('guid-7', 1704067200 + 7 * 60)
+
+
+def test_checked_entry_stops_the_stream_without_high_water_mark():
+    entries, client = MemoryRSSEntries(), FakeHttpClient()
+    entries.check(FEED_URL, 'http://example.com/2')
+    detector = RSSNewEntryDetector(entries, client=client)
+    assert poll(detector, client, feed(3, 2, 1), 'known') == ['http://example.com/3']
+
+
+def test_repeated_links_are_reported_once_and_checked_in_batches():
+    entries, client = MemoryRSSEntries(), FakeHttpClient()
+    entries.check(FEED_URL, 'http://example.com/1')
+    detector = RSSNewEntryDetector(entries, client=client)
+    assert poll(detector, client, feed(3, 3, 2, 1), 'known') == ['http://example.com/3', 'http://example.com/2']
+    assert entries.lookups == [[f'http://example.com/{n}' for n in (3, 2, 1)]]
+
+
+def test_malformed_feed_falls_back_to_feedparser():
+    entries, client = MemoryRSSEntries(), FakeHttpClient()
+    entries.check(FEED_URL, 'http://example.com/1')
+    detector = RSSNewEntryDetector(entries, client=client)
+    body = feed(2, 1).replace(b'<title>2</title>', b'<title>2&nbsp;</title>')
+    assert poll(detector, client, body, 'guid') == ['http://example.com/2']
+    assert len(client.requests) == 2
@@ -0,0 +1,86 @@
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, ConnectTimeoutError, NewConnectionError
+
+from HttpClient import HttpClient, ResponseTooLarge, is_timeout
+from PageFetcher import StaticPageFetcher
+from WebDriverWrapper import FindElementTimeout
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        SlowHandler.hits += 1
+        time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'late')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(202)
+        self.end_headers()
+        self.wfile.write(b'x' * 64)
+
+    def log_message(self, *args):
+        pass
+
+
+class FailingClient:
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, url, headers=None, timeout=None):
+        raise self.error
+
+
+def exhausted(reason) -> requests.ConnectionError:
+    return requests.ConnectionError(MaxRetryError(None, 'http://example.com/', reason))
+
+
+@pytest.fixture
+def slow_server():
+    server = HTTPServer(('127.0.0.1', 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    SlowHandler.hits = 0
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_read_timeout_is_not_retried(slow_server):
+    client = HttpClient(retries=2, timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.get(slow_server)
+    assert time.monotonic() - started < 0.4
+    assert SlowHandler.hits == 1
+
+
+def test_post_body_is_bounded(slow_server):
+    assert HttpClient(max_body_bytes=64).post(slow_server, {'hub.mode': 'subscribe'}).status == 202
+    with pytest.raises(ResponseTooLarge):
+        HttpClient(max_body_bytes=63).post(slow_server, {'hub.mode': 'subscribe'})
+
+
+def test_exhausted_connect_retries_count_as_timeout():
+    assert is_timeout(exhausted(ConnectTimeoutError()))
+    assert not is_timeout(exhausted(NewConnectionError(None, 'refused')))
+    assert not is_timeout(requests.ConnectionError(socket.gaierror()))
+
+
+def test_static_fetcher_maps_exhausted_retries_to_timeout():
+    fetcher = StaticPageFetcher(FailingClient(exhausted(ConnectTimeoutError())))
+    result = fetcher.find_element('http://example.com/', '#main')
+    assert isinstance(result, FindElementTimeout)
+
+    fetcher = StaticPageFetcher(FailingClient(exhausted(NewConnectionError(None, 'refused'))))
+    with pytest.raises(requests.ConnectionError):
+        fetcher.find_element('http://example.com/', '#main')
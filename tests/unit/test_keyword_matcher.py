@@ -0,0 +1,30 @@
+from KeywordMatcher import KeywordMatcher, compile_keywords
+
+
+def test_config_order_wins_over_text_position():
+    matcher = compile_keywords(('release', 'beta'))
+    assert matcher.match('beta testers wanted before the release') == 'release'
+    assert matcher.match('beta testers wanted') == 'beta'
+    assert matcher.match('nothing here') is None
+
+
+def test_regular_expressions_and_empty_keywords():
+    assert compile_keywords((r'v\d+\.\d+', 'news')).match('news: v2.1 is out') == r'v\d+\.\d+'
+    assert compile_keywords(()).match('anything') is None
+
+
+def test_uncombinable_keywords_fall_back_to_individual_patterns():
+    matcher = KeywordMatcher((r'(a)\1', '(?i)sale', 'x'))
+    assert matcher._pattern is None
+    assert matcher.match('x and SALE') == '(?i)sale'
+    assert matcher.match('x aa') == r'(a)\1'
+
+
+def test_keywords_with_named_groups():
+    matcher = KeywordMatcher(('later', '(?P<word>first)'))
+    assert matcher.match('first then later') == 'later'
+    assert matcher.match('first only') == '(?P<word>first)'
+
+
+def test_compiled_matchers_are_cached():
+    assert compile_keywords(('a', 'b')) is compile_keywords(('a', 'b'))
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from LocalStorage import SQLiteStore, WebsiteRevisionsOnSQLite, RSSEntriesOnSQLite, TargetSchedulesOnSQLite, \
+    WebSubSubscriptionsOnSQLite
+from RSSEntryDetector import RSSEntry, PendingEntry, FeedValidators, FeedHighWaterMark
+from TargetSchedules import TargetSchedule
+from WebSub import WebSubSubscription, STATE_PENDING, STATE_ACTIVE
+from WebsiteChangesDetector import text_digest
+
+URL = 'http://example.com/'
+FEED_URL = 'http://example.com/feed.xml'
+
+
+@pytest.fixture
+def store(tmp_path) -> SQLiteStore:
+    return SQLiteStore(str(tmp_path / 'web-monitor.sqlite3'))
+
+
+def test_revisions_keep_history(store):
+    revisions = WebsiteRevisionsOnSQLite(store)
+    assert revisions.get(URL, '#main') is None and revisions.get_info(URL, '#main') is None
+    first = revisions.update(URL, '#main', 'v0')
+    second = revisions.update(URL, '#main', 'v1', fingerprint=0xabc)
+    assert revisions.get(URL, '#main') == 'v1'
+    info = revisions.get_info(URL, '#main')
+    assert (info.digest, info.fingerprint, info.version) == (text_digest('v1'), 0xabc, second)
+    key = revisions.revision_key(URL, '#main')
+    assert revisions.read_revision(key, first) == 'v0'
+    assert [r[0] for r in revisions.list_revisions(URL, '#main')] == [int(first), int(second)]
+    assert revisions.get(URL, '#other') is None
+
+
+def test_rss_entries_track_checked_urls_and_feed_state(store):
+    entries = RSSEntriesOnSQLite(store)
+    assert not entries.has_checked(FEED_URL)
+    entries.check_many(FEED_URL, [f'{URL}{i}' for i in range(600)])
+    assert entries.has_checked(FEED_URL)
+    assert entries.has_checked_many(FEED_URL, [f'{URL}599', f'{URL}600']) == [True, False]
+    assert entries.get_validators(FEED_URL) is None
+    entries.put_validators(FEED_URL, FeedValidators('"e1"'))
+    entries.put_high_water_mark(FEED_URL, FeedHighWaterMark('guid-1', 1700000000))
+    assert entries.get_validators(FEED_URL) == FeedValidators('"e1"')
+    assert entries.get_high_water_mark(FEED_URL) == FeedHighWaterMark('guid-1', 1700000000)
+
+
+def test_pending_entries_are_replaced_and_cleared(store):
+    entries = RSSEntriesOnSQLite(store)
+    pending = [PendingEntry(RSSEntry(f'{URL}a', 'a', tags=('news',)), 1)]
+    entries.put_pending_entries(FEED_URL, pending)
+    assert entries.get_pending_entries(FEED_URL) == pending
+    entries.put_pending_entries(FEED_URL, [])
+    assert entries.get_pending_entries(FEED_URL) == []
+
+
+def test_target_schedules_round_trip(store):
+    schedules = TargetSchedulesOnSQLite(store)
+    schedules.report('t1', True)
+    schedules.report('t2', False)
+    checks = schedules.checks()
+    assert [(c.target_id, c.changed) for c in checks] == [('t1', True), ('t2', False)]
+    schedules.delete_checks(checks[:1])
+    assert [c.target_id for c in schedules.checks()] == ['t2']
+    schedules.save({'t1': TargetSchedule(600, 1700000000)})
+    schedules.save({'t2': TargetSchedule(1200, 1700000600, checks=3)})
+    assert schedules.load() == {'t2': TargetSchedule(1200, 1700000600, checks=3)}
+
+
+def test_websub_subscriptions_round_trip(store):
+    subscriptions = WebSubSubscriptionsOnSQLite(store)
+    subscription = WebSubSubscription(FEED_URL, FEED_URL, 'http://hub.example.com/', 's', STATE_PENDING, 1700000000,
+                                      token='t1')
+    subscriptions.put(subscription)
+    assert subscriptions.get(FEED_URL) == subscription
+    assert subscriptions.get_by_token('t1') == subscription and subscriptions.get_by_token('t2') is None
+    active = WebSubSubscription(FEED_URL, FEED_URL, 'http://hub.example.com/', 's', STATE_ACTIVE, 1700000000,
+                                1700864000, 1700000010, 't1')
+    subscriptions.put(active)
+    assert subscriptions.get_many([FEED_URL, URL]) == [active, None]
+
+
+def test_websub_token_column_is_added_to_an_existing_store(tmp_path):
+    path = str(tmp_path / 'web-monitor.sqlite3')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE websub_subscriptions (subscription_id TEXT PRIMARY KEY, subscription TEXT NOT NULL)')
+    connection.close()
+    subscriptions = WebSubSubscriptionsOnSQLite(SQLiteStore(path))
+    subscriptions.put(
+        WebSubSubscription(FEED_URL, FEED_URL, 'http://hub.example.com/', 's', STATE_PENDING, 0, token='t'))
+    assert subscriptions.get_by_token('t').feed_url == FEED_URL
@@ -0,0 +1,68 @@
+from typing import Dict, List, Optional, Union
+
+import pytest
+
+from PageFetcher import FetchOptions, ElementNotFoundError
+from RSSEntryDetector import RelatedRSSEntryDetector, RSSEntry, EntryMatch, EntryTimeout, match_stages, \
+    STAGE_TITLE, STAGE_FEED, STAGE_STATIC, STAGE_BROWSER
+from WebDriverWrapper import WebDriverWrapperFindElementResult, FindElementTimeout
+
+ENTRY = RSSEntry('http://example.com/a', 'Weekly news', summary='<p>release notes</p>', tags=('golang',))
+
+
+class StagedFetcher:
+    def __init__(self, texts: Dict[str, Union[str, Exception, None]]):
+        self.texts = texts
+        self.modes: List[str] = []
+
+    def find_element(self, url, selector, options: Optional[FetchOptions] = None, deadline=None):
+        self.modes.append(options.fetch_mode)
+        text = self.texts[options.fetch_mode]
+        if isinstance(text, Exception):
+            raise text
+        if text is None:
+            return FindElementTimeout(url, selector, 0.0)
+        return WebDriverWrapperFindElementResult(url, 'title', selector, text)
+
+
+def match(fetcher: StagedFetcher, keywords: List[str], stages: Optional[List[str]] = None, fetch_mode: str = 'browser'):
+    return RelatedRSSEntryDetector(fetcher).match(ENTRY, '#main', keywords, stages, FetchOptions(fetch_mode=fetch_mode))
+
+
+@pytest.mark.parametrize('stages, fetch_mode, expected', [
+    (None, 'browser', (STAGE_TITLE, STAGE_FEED, STAGE_STATIC, STAGE_BROWSER)),
+    (None, 'auto', (STAGE_TITLE, STAGE_FEED, STAGE_STATIC, STAGE_BROWSER)),
+    (None, 'static', (STAGE_TITLE, STAGE_FEED, STAGE_STATIC)),
+    (['browser', 'unknown', 'title'], 'static', (STAGE_BROWSER, STAGE_TITLE)),
+])
+def test_match_stages(stages, fetch_mode, expected):
+    assert match_stages(stages, fetch_mode) == expected
+
+
+def test_cascade_stops_at_the_cheapest_matching_stage():
+    fetcher = StagedFetcher({'static': 'python', 'browser': 'rust'})
+    assert match(fetcher, ['news']) == EntryMatch('news', STAGE_TITLE)
+    assert match(fetcher, ['golang']) == EntryMatch('golang', STAGE_FEED)
+    assert match(fetcher, ['release']) == EntryMatch('release', STAGE_FEED)
+    assert fetcher.modes == []
+    assert match(fetcher, ['python']) == EntryMatch('python', STAGE_STATIC)
+    assert fetcher.modes == ['static']
+    assert match(fetcher, ['rust']) == EntryMatch('rust', STAGE_BROWSER)
+    assert fetcher.modes == ['static', 'static', 'browser']
+
+
+def test_static_target_never_renders_in_the_browser():
+    fetcher = StagedFetcher({'static': 'python', 'browser': 'rust'})
+    assert match(fetcher, ['rust'], fetch_mode='static') is None
+    assert fetcher.modes == ['static']
+
+
+def test_failed_static_fetch_falls_through_to_the_browser():
+    fetcher = StagedFetcher({'static': ElementNotFoundError('#main'), 'browser': 'rust'})
+    assert match(fetcher, ['rust']) == EntryMatch('rust', STAGE_BROWSER)
+
+
+def test_timeout_leaves_the_entry_unevaluated():
+    assert match(StagedFetcher({'static': None, 'browser': 'rust'}), ['rust']) == EntryMatch('rust', STAGE_BROWSER)
+    assert match(StagedFetcher({'static': None, 'browser': 'go'}), ['rust']) == EntryTimeout(ENTRY.url, STAGE_STATIC)
+    assert match(StagedFetcher({'static': 'go', 'browser': None}), ['rust']) == EntryTimeout(ENTRY.url, STAGE_BROWSER)
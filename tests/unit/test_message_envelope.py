@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import MessageEnvelope as envelope_module
+from EventRecords import EventRecord
+from MessageEnvelope import MessageEnvelope, EnvelopeIntegrityError, unwrap, describe, is_envelope, \
+    ENCODING_GZIP, ENCODING_S3
+
+from .fakes import FakeS3
+
+MESSAGE = {'url': 'http://example.com/', 'diff': '+' + 'x' * 4096, 'type': 'DetectWebsiteChangesResult'}
+
+
+@pytest.fixture
+def s3(monkeypatch) -> FakeS3:
+    s3 = FakeS3()
+    monkeypatch.setattr(envelope_module, '_s3_client', s3)
+    return s3
+
+
+def test_small_message_is_sent_as_is():
+    wrapped = MessageEnvelope(compress_threshold=64 * 1024).wrap(MESSAGE)
+    assert json.loads(wrapped) == MESSAGE
+    assert unwrap(json.loads(wrapped)) == MESSAGE
+
+
+def test_large_message_is_compressed_inline():
+    wrapped = json.loads(MessageEnvelope(compress_threshold=1024).wrap(MESSAGE))
+    assert is_envelope(wrapped) and wrapped['encoding'] == ENCODING_GZIP
+    assert len(json.dumps(wrapped)) < len(json.dumps(MESSAGE))
+    assert unwrap(wrapped) == MESSAGE
+    assert 'body' not in describe(wrapped)
+
+
+def test_oversized_message_spills_to_s3(s3):
+    envelope = MessageEnvelope(s3, compress_threshold=16, spill_threshold=16)
+    wrapped = json.loads(envelope.wrap(MESSAGE))
+    assert wrapped['encoding'] == ENCODING_S3
+    assert wrapped['key'] in s3.objects_by_key
+    assert wrapped['size'] == len(json.dumps(MESSAGE, ensure_ascii=False).encode('utf-8'))
+    assert unwrap(wrapped) == MESSAGE
+
+
+def test_spill_without_bucket_stays_inline():
+    wrapped = json.loads(MessageEnvelope(None, compress_threshold=16, spill_threshold=16).wrap(MESSAGE))
+    assert wrapped['encoding'] == ENCODING_GZIP
+
+
+def test_tampered_spilled_body_is_rejected(s3):
+    wrapped = json.loads(MessageEnvelope(s3, compress_threshold=16, spill_threshold=16).wrap(MESSAGE))
+    s3.objects_by_key[wrapped['key']]['Body'] = b'tampered'
+    with pytest.raises(EnvelopeIntegrityError):
+        unwrap(wrapped)
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        unwrap({'envelope': 'web-monitor/envelope-v1', 'encoding': 'zstd', 'body': ''})
+
+
+def test_event_record_unwraps_envelope_from_sns_notification():
+    wrapped = MessageEnvelope(compress_threshold=1024).wrap(MESSAGE)
+    body = json.dumps({'Type': 'Notification', 'Message': wrapped})
+    record = EventRecord.from_record({'messageId': 'm1', 'eventSource': 'aws:sqs', 'body': body})
+    assert record.message == MESSAGE
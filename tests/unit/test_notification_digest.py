@@ -0,0 +1,59 @@
+import NotificationDigest
+from NotificationDigest import PendingNotification, coalesce, render, render_fitted, compiled_template
+from WebMonitor import DetectRSSEntryResult, DetectWebsiteChangesResult
+from WebMonitorConfig import WebMonitorConfig, DigestConfig
+
+FORMAT = {'site_template': '"$title changed: $url"', 'rss_template': '"$title $url"'}
+
+
+def monitor_config(digest=None, version='"v1"') -> WebMonitorConfig:
+    message_format = dict(FORMAT, digest=digest) if digest is not None else FORMAT
+    return WebMonitorConfig({'message_format': message_format}, version)
+
+
+def rss(n: int, keyword: str = 'python', feed: str = 'http://example.com/feed') -> PendingNotification:
+    e = DetectRSSEntryResult(f'http://example.com/{n}', feed, 'body', f'title {n}', keyword)
+    return PendingNotification.from_rss_entry(e, f'm{n}', 'keyword')
+
+
+def test_digest_is_opt_in():
+    assert not monitor_config().digest.enabled
+    digest = monitor_config({'max_items': 3}).digest
+    assert digest.enabled and digest.max_items == 3 and digest.max_length == 280
+
+
+def test_coalesce_groups_dedupes_and_splits():
+    pending = [rss(1), rss(2, 'go'), rss(1), rss(3), rss(4)]
+    batches = coalesce(pending, 2)
+    assert [[p.message_id for p in b] for b in batches] == [['m1', 'm3'], ['m4'], ['m2']]
+
+
+def test_single_item_uses_kind_template():
+    site = PendingNotification.from_website_changes(
+        DetectWebsiteChangesResult('http://example.com/', '#main', 'Site', True, digest_previous='a'), 'm0')
+    config = monitor_config()
+    assert render([site], config, config.digest) == 'Site changed: http://example.com/'
+    assert render([rss(1)], config, config.digest) == 'title 1 http://example.com/1'
+
+
+def test_digest_renders_items_under_group():
+    config = monitor_config({'template': '$count for $group:\n$items'})
+    status = render([rss(1), rss(2)], config, config.digest)
+    assert status == '2 for python:\ntitle 1 http://example.com/1\ntitle 2 http://example.com/2'
+
+
+def test_long_digest_is_split_to_fit():
+    config = monitor_config({'max_items': 10, 'max_length': 100})
+    batch = coalesce([rss(n) for n in range(10)], config.digest.max_items)[0]
+    statuses = render_fitted(batch, config, config.digest)
+    assert len(statuses) > 1
+    assert all(len(s) <= 100 for s in statuses)
+    assert sum(s.count('http://') for s in statuses) == 10
+
+
+def test_compiled_template_is_cached_without_version():
+    config = monitor_config(version=None)
+    NotificationDigest._templates.clear()
+    first = compiled_template(config, 'rss_template', config.rss_template)
+    assert compiled_template(config, 'rss_template', config.rss_template) is first
+    assert compiled_template(monitor_config(version='"v2"'), 'rss_template', config.rss_template) is not first
@@ -0,0 +1,96 @@
+import json
+import logging
+
+from TargetSchedules import TargetSchedulesOnS3, site_target_id
+from TaskScheduler import TaskSchedulerConfig, page_event, handle as schedule
+from WebMonitor import DetectWebsiteChangesEvent, SiteSelector
+from WebMonitorConfig import WebMonitorConfig
+from WebsiteChangesDetector import WebsiteChangesDetector, SelectorCheck
+from WebsiteChangesHandler import DetectWebsiteChangesConfig, handle as check_page
+
+from .fakes import FakeS3, FakeSNS, FakePageFetcher, MemoryRevisions
+
+logger = logging.getLogger(__name__)
+URL = 'http://example.com/'
+
+
+def site(selector: str, url: str = URL, fetch_mode: str = 'static') -> dict:
+    return {'url': url, 'selector': selector, 'title': selector, 'fetch_mode': fetch_mode}
+
+
+def test_detect_changes_many_fetches_the_page_once():
+    revisions = MemoryRevisions()
+    fetcher = FakePageFetcher({'#a': 'a0', '#b': 'b0'})
+    detector = WebsiteChangesDetector(fetcher, revisions)
+    checks = [SelectorCheck('#a'), SelectorCheck('#b')]
+    assert [r.has_changed for r in detector.detect_changes_many(URL, checks)] == [True, True]
+
+    fetcher.texts['#a'] = 'a1'
+    results = detector.detect_changes_many(URL, checks)
+    assert [(r.selector, r.has_changed) for r in results] == [('#a', True), ('#b', False)]
+    assert results[0].diff is not None and results[1].diff is None
+    assert fetcher.calls == [(URL, ['#a', '#b'])] * 2
+    assert [u[1] for u in revisions.updates] == ['#a', '#b', '#a']
+
+
+def test_timed_out_selector_keeps_its_revision():
+    revisions = MemoryRevisions()
+    revisions.texts[(URL, '#b')] = 'b0'
+    detector = WebsiteChangesDetector(FakePageFetcher({'#a': 'a0', '#b': None}), revisions)
+    results = detector.detect_changes_many(URL, [SelectorCheck('#a'), SelectorCheck('#b')])
+    assert [(r.has_changed, r.timed_out) for r in results] == [(True, False), (False, True)]
+    assert revisions.texts[(URL, '#b')] == 'b0'
+
+
+def test_handle_notifies_changed_selectors_and_reports_each_check():
+    s3, sns = FakeS3(), FakeSNS()
+    revisions = MemoryRevisions()
+    revisions.texts.update({(URL, '#a'): 'a0', (URL, '#b'): 'b0'})
+    detector = WebsiteChangesDetector(FakePageFetcher({'#a': 'a1', '#b': 'b0', '#c': None}), revisions)
+    config = DetectWebsiteChangesConfig(sns, 'next', logger, TargetSchedulesOnS3(s3, logger))
+    event = DetectWebsiteChangesEvent(URL, '#a', None, selectors=[SiteSelector('#a'), SiteSelector('#b'),
+                                                                  SiteSelector('#c')], adaptive_schedule=True)
+    check_page(event, detector, config)
+    assert [json.loads(m)['selector'] for _, m in sns.published] == ['#a']
+    checks = TargetSchedulesOnS3(s3, logger).checks()
+    assert sorted((c.target_id, c.changed) for c in checks) == sorted([
+        (site_target_id(URL, '#a'), True), (site_target_id(URL, '#b'), False)])
+
+
+def test_page_event_lists_selectors_only_for_grouped_sites():
+    monitor_config = WebMonitorConfig({'site_targets': [site('#a'), site('#b')]}, 'v1')
+    single = page_event(monitor_config.site_targets[:1])
+    assert single.selectors is None and single.site_selectors == [SiteSelector('#a', '#a')]
+    grouped = page_event(monitor_config.site_targets)
+    assert [s.selector for s in grouped.site_selectors] == ['#a', '#b']
+
+
+def test_sites_are_grouped_by_page_and_fetch_options():
+    monitor_config = WebMonitorConfig({'site_targets': [
+        site('#a'), site('#b'), site('#c', fetch_mode='browser'), site('body', url='http://example.org/'),
+    ]}, 'v1')
+    sns = FakeSNS()
+    schedule(monitor_config, TaskSchedulerConfig(sns, 'sites', 'rss', logger, TargetSchedulesOnS3(FakeS3(), logger)))
+    events = [DetectWebsiteChangesEvent.from_message(json.loads(m)) for _, m in sns.published]
+    assert [(e.url, e.fetch_mode, [s.selector for s in e.site_selectors]) for e in events] == [
+        (URL, 'static', ['#a', '#b']),
+        (URL, 'browser', ['#c']),
+        ('http://example.org/', 'static', ['body']),
+    ]
+
+
+def test_disabled_adaptive_schedule_skips_schedule_storage():
+    s3, sns = FakeS3(), FakeSNS()
+    schedules = TargetSchedulesOnS3(s3, logger)
+    schedule(WebMonitorConfig({'site_targets': [site('#a')]}, 'v1'),
+             TaskSchedulerConfig(sns, 'sites', 'rss', logger, schedules))
+    event = DetectWebsiteChangesEvent.from_message(json.loads(sns.published[0][1]))
+    assert not event.adaptive_schedule
+    detector = WebsiteChangesDetector(FakePageFetcher({'#a': 'a0'}), MemoryRevisions())
+    check_page(event, detector, DetectWebsiteChangesConfig(sns, 'next', logger, schedules))
+    assert s3.objects_by_key == {} and s3.reads == []
+
+    schedule(WebMonitorConfig({'site_targets': [site('#a')], 'adaptive_schedule': {}}, 'v1'),
+             TaskSchedulerConfig(sns, 'sites', 'rss', logger, schedules))
+    assert DetectWebsiteChangesEvent.from_message(json.loads(sns.published[-1][1])).adaptive_schedule
+    assert s3.objects_by_key
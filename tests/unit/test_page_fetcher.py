@@ -0,0 +1,60 @@
+import pytest
+
+from HttpClient import HttpStatusError
+from WebDriverWrapper import WebDriverWrapperFindElementResult, normalize_text
+from PageFetcher import PageFetcher, StaticPageFetcher, FetchOptions, ElementNotFoundError, FETCH_MODE_AUTO
+
+
+class FakeStaticFetcher:
+    def __init__(self, error):
+        self.error = error
+
+    def find_elements(self, url, selectors, deadline=None):
+        raise self.error
+
+
+class FakeDriver:
+    def __init__(self):
+        self.calls = []
+
+    def find_elements(self, url, selectors, wait, deadline):
+        self.calls.append(url)
+        return [WebDriverWrapperFindElementResult(url, 'title', s, 'rendered') for s in selectors]
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.driver = FakeDriver()
+
+    def acquire(self, load_profile):
+        return self.driver
+
+
+def test_normalize_text_collapses_whitespace_and_blank_lines():
+    assert normalize_text('  Version 2   views: 10 \n\n\t next  \n') == 'Version 2 views: 10\nnext'
+
+
+def test_static_text_matches_browser_inner_text_form():
+    html = b'<html><head><title> Page </title></head><body><div id="main">Version 2 <span>views: 10</span>' \
+           b'<p>second</p><ul><li>a</li><li>b</li></ul><script>var x;</script><!-- c --></div></body></html>'
+    result = StaticPageFetcher.parse('http://example.com/', html, '#main')
+    assert result.title == 'Page'
+    assert result.selected_text == 'Version 2 views: 10\nsecond\na\nb'
+    assert result.selected_text == normalize_text('Version 2 views: 10\n\nsecond\n\na\nb\n')
+
+
+def test_static_parse_many_raises_when_selector_is_missing():
+    with pytest.raises(ElementNotFoundError):
+        StaticPageFetcher.parse_many('http://example.com/', b'<div id="a">x</div>', ['#a', '#b'])
+
+
+@pytest.mark.parametrize('error', [
+    ElementNotFoundError('missing'),
+    HttpStatusError('http://example.com/', 403),
+])
+def test_auto_mode_falls_back_to_browser(error):
+    browser = FakeBrowser()
+    fetcher = PageFetcher(browser, FakeStaticFetcher(error))
+    results = fetcher.find_elements('http://example.com/', ['#a'], FetchOptions(fetch_mode=FETCH_MODE_AUTO))
+    assert results[0].selected_text == 'rendered'
+    assert browser.driver.calls == ['http://example.com/']
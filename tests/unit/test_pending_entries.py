@@ -0,0 +1,57 @@
+from PageFetcher import FetchOptions, FETCH_MODE_BROWSER
+from WebDriverWrapper import FindElementTimeout, WebDriverWrapperFindElementResult
+from RSSEntryDetector import RSSNewEntryDetector, RelatedRSSEntryDetector, RSSEntriesManifestOnS3, RSSEntry, \
+    PendingEntry, EntryMatch, EntryTimeout, PENDING_ENTRY_MAX_ATTEMPTS, _FeedManifest
+
+from .fakes import MemoryRSSEntries, FakeHttpClient
+
+FEED_URL = 'http://example.com/feed.xml'
+ENTRY = RSSEntry('http://example.com/a', 'title', 'summary', '', ('tag',))
+
+
+class TimingOutFetcher:
+    def __init__(self, text=None):
+        self.text = text
+
+    def find_element(self, url, selector, options=None, deadline=None):
+        if self.text is None:
+            return FindElementTimeout(url, selector, 1.0)
+        return WebDriverWrapperFindElementResult(url, 'title', selector, self.text)
+
+
+def test_match_reports_timeout_separately_from_no_match():
+    options = FetchOptions(fetch_mode=FETCH_MODE_BROWSER)
+    detector = RelatedRSSEntryDetector(TimingOutFetcher())
+    assert detector.match(ENTRY, 'body', ['keyword'], ['title', 'browser'], options) == \
+        EntryTimeout(ENTRY.url, 'browser')
+    assert detector.match(ENTRY, 'body', ['title'], ['title', 'browser'], options) == EntryMatch('title', 'title')
+    assert RelatedRSSEntryDetector(TimingOutFetcher('text')).match(
+        ENTRY, 'body', ['keyword'], ['browser'], options) is None
+
+
+def test_timed_out_entries_are_retried_up_to_max_attempts():
+    entries = MemoryRSSEntries()
+    detector = RSSNewEntryDetector(entries, client=FakeHttpClient())
+    detector.defer_entries(FEED_URL, [])
+    assert entries.flushed == []
+    for attempt in range(1, PENDING_ENTRY_MAX_ATTEMPTS):
+        detector.defer_entries(FEED_URL, [ENTRY])
+        assert entries.pending[FEED_URL] == [PendingEntry(ENTRY, attempt)]
+        assert detector.pending_entries(FEED_URL) == [ENTRY]
+    detector.defer_entries(FEED_URL, [ENTRY])
+    assert detector.pending_entries(FEED_URL) == []
+
+
+def test_evaluated_entries_leave_the_pending_list():
+    entries = MemoryRSSEntries()
+    detector = RSSNewEntryDetector(entries, client=FakeHttpClient())
+    detector.defer_entries(FEED_URL, [ENTRY])
+    detector.defer_entries(FEED_URL, [])
+    assert detector.pending_entries(FEED_URL) == []
+    assert entries.flushed == [FEED_URL, FEED_URL]
+
+
+def test_pending_entries_survive_manifest_encoding():
+    manifest = _FeedManifest({}, pending=[PendingEntry(ENTRY, 2)])
+    decoded = RSSEntriesManifestOnS3._decode(RSSEntriesManifestOnS3._encode(manifest), None)
+    assert decoded.pending == [PendingEntry(ENTRY, 2)]
@@ -0,0 +1,76 @@
+import threading
+
+import requests
+
+from HttpClient import HttpResponse
+from AsyncFetchEngine import AsyncFetchEngine, FetchRequest
+from PageFetcher import StaticPageFetcher
+from RSSEntryDetector import RSSNewEntryDetector
+
+from .fakes import MemoryRSSEntries, FakeHttpClient, rss
+
+PAGE = b'<html><head><title>t</title></head><body><div id="a">first</div><div id="b">second</div></body></html>'
+
+
+class ConcurrencyProbe(FakeHttpClient):
+    def __init__(self, responses):
+        super().__init__(responses)
+        self._lock = threading.Lock()
+        self._barrier = threading.Barrier(2, timeout=5)
+        self.active = 0
+        self.peak = 0
+
+    def get(self, url, headers=None, timeout=None):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if url not in self.responses:
+                raise requests.ConnectionError(url)
+            self._barrier.wait()
+            return super().get(url, headers, timeout)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_engine_fetches_through_the_given_client_concurrently():
+    urls = ['http://a.example.com/', 'http://b.example.com/']
+    client = ConcurrencyProbe({u: HttpResponse(200, u, {}, b'ok') for u in urls})
+    results = AsyncFetchEngine(client).fetch_all([FetchRequest(u) for u in urls])
+    assert sorted(r.url for r in results) == urls
+    assert all(r.ok for r in results)
+    assert client.peak == 2
+
+
+def test_engine_reports_errors_instead_of_raising():
+    results = AsyncFetchEngine(ConcurrencyProbe({})).fetch_all([FetchRequest('http://down.example.com/')])
+    assert not results[0].ok and 'ConnectionError' in results[0].error
+
+
+def test_prefetched_page_serves_every_target_in_the_batch():
+    url = 'http://example.com/'
+    client = FakeHttpClient({url: HttpResponse(200, url, {}, PAGE)})
+    fetcher = StaticPageFetcher(client)
+    fetcher.prefetch([url, url])
+    assert fetcher.find_element(url, '#a').selected_text == 'first'
+    assert fetcher.find_element(url, '#b').selected_text == 'second'
+    assert len(client.requests) == 1
+
+    fetcher.prefetch([])
+    fetcher.find_element(url, '#a')
+    assert len(client.requests) == 2
+
+
+def test_prefetched_feed_is_reused_and_cleared_per_batch():
+    feed_url = 'http://example.com/feed.xml'
+    client = FakeHttpClient({feed_url: HttpResponse(200, feed_url, {}, rss(('a', 'http://example.com/a')))})
+    detector = RSSNewEntryDetector(MemoryRSSEntries(), AsyncFetchEngine(client), client)
+    detector.prefetch([feed_url])
+    detector.detect_new_entries(feed_url)
+    detector.detect_new_entries(feed_url)
+    assert len(client.requests) == 1
+
+    detector.prefetch([])
+    detector.detect_new_entries(feed_url)
+    assert len(client.requests) == 2
@@ -0,0 +1,92 @@
+import logging
+
+from ChangeSignificance import Normalizer, simhash, similarity
+from WebsiteChangesDetector import WebsiteChangesDetector, WebsiteRevisionsOnS3, SelectorCheck, text_digest
+
+from .fakes import FakeS3, FakePageFetcher, MemoryRevisions
+
+URL = 'http://example.com/'
+
+
+def revisions_on(s3: FakeS3) -> WebsiteRevisionsOnS3:
+    revisions = WebsiteRevisionsOnS3(s3, logging.getLogger(__name__))
+    revisions._client = s3
+    return revisions
+
+
+def operations(s3: FakeS3):
+    return [operation for operation, _ in s3.reads]
+
+
+def test_update_stores_digest_in_metadata():
+    s3 = FakeS3()
+    revisions = revisions_on(s3)
+    revisions.update(URL, '#main', 'text')
+    assert revisions.get_info(URL, '#main').digest == text_digest('text')
+    assert operations(s3) == ['HeadObject']
+
+
+def test_unchanged_page_is_not_downloaded():
+    s3 = FakeS3()
+    revisions = revisions_on(s3)
+    revisions.update(URL, '#main', 'text')
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'text'}), revisions)
+    result = detector.detect_changes(URL, '#main', None)
+    assert not result.has_changed
+    assert 'GetObject' not in operations(s3)
+
+
+def test_changed_page_downloads_previous_revision_once():
+    s3 = FakeS3()
+    revisions = revisions_on(s3)
+    revisions.update(URL, '#main', 'before')
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'after'}), revisions)
+    result = detector.detect_changes(URL, '#main', None)
+    assert result.has_changed
+    assert result.digest_previous == text_digest('before')
+    assert result.digest_current == text_digest('after')
+    assert operations(s3).count('GetObject') == 1
+    assert revisions.get(URL, '#main') == 'after'
+
+
+def test_first_check_does_not_download():
+    s3 = FakeS3()
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'text'}), revisions_on(s3))
+    result = detector.detect_changes(URL, '#main', None)
+    assert result.has_changed and result.digest_previous is None
+    assert operations(s3) == ['HeadObject']
+
+
+def test_legacy_object_without_digest_is_compared_normalized():
+    s3 = FakeS3()
+    s3.put_object(Bucket=s3.name, Key=WebsiteRevisionsOnS3._object_key(URL, '#main'), Body=b'views:  10\n\n')
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'views: 12'}), revisions_on(s3))
+    check = SelectorCheck('#main', normalizer=Normalizer.from_dict({'mask_numbers': True, 'collapse_whitespace': True}))
+    result = detector.detect_changes_many(URL, [check])[0]
+    assert not result.has_changed
+    assert result.digest_previous == result.digest_current
+    assert operations(s3) == ['HeadObject', 'GetObject']
+
+
+def test_default_get_info_is_compared_normalized_and_text_reused():
+    revisions = MemoryRevisions()
+    revisions.texts[(URL, '#main')] = 'Price  100'
+    normalizer = Normalizer.from_dict({'collapse_whitespace': True})
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'Price 100'}), revisions)
+    assert not detector.detect_changes_many(URL, [SelectorCheck('#main', normalizer=normalizer)])[0].has_changed
+
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'Price 120'}), revisions)
+    result = detector.detect_changes_many(URL, [SelectorCheck('#main', normalizer=normalizer)])[0]
+    assert result.has_changed and result.digest_current == text_digest('Price 120')
+    assert result.diff.splitlines()[-2:] == ['-Price  100', '+Price 120']
+    assert len(revisions.gets) == 2
+
+
+def test_simhash_tracks_similarity():
+    text = ' '.join(f'word{i}' for i in range(300))
+    edited = text.replace('word150', 'changed')
+    assert similarity(simhash(text), simhash(edited)) > 0.9
+    assert similarity(simhash(text), simhash(' '.join(f'other{i}' for i in range(300)))) < 0.8
+    japanese = 'ウェブサイトの更新を監視して変更があれば通知します。' * 5
+    assert similarity(simhash(japanese), simhash(japanese + '追記')) > 0.9
+    assert simhash('') == simhash('')
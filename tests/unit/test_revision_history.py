@@ -0,0 +1,98 @@
+import hashlib
+import logging
+
+import pytest
+
+from ChangeSignificance import Normalizer
+from RevisionHistory import WebsiteRevisionHistoryOnS3, encode_delta, apply_delta
+from WebsiteChangesDetector import WebsiteChangesDetector, WebsiteRevisionsOnS3, SelectorCheck
+
+from .fakes import FakeS3, FakePageFetcher
+
+URL = 'http://example.com/'
+PREFIX = WebsiteRevisionHistoryOnS3._prefix(URL, '#main')
+PAGE = ''.join(hashlib.sha256(str(i).encode()).hexdigest() + '\n' for i in range(50))
+
+
+def history_on(s3: FakeS3, **kwargs) -> WebsiteRevisionHistoryOnS3:
+    history = WebsiteRevisionHistoryOnS3(s3, logging.getLogger(__name__), **kwargs)
+    history._client = s3
+    history._legacy._client = s3
+    return history
+
+
+def index_reads(s3: FakeS3):
+    return [k for operation, k in s3.reads if operation == 'GetObject' and k == PREFIX + 'index.json']
+
+
+@pytest.mark.parametrize('base, text', [
+    ('a\nb\nc\n', 'a\nB\nc\nd\n'),
+    ('a\nb\nc', 'c'),
+    ('', 'new\ntext'),
+    ('old\n', ''),
+    ('日本語\n本文\n', '日本語\n追記\n本文'),
+])
+def test_apply_delta_restores_text(base, text):
+    assert apply_delta(base, encode_delta(base, text)) == text
+
+
+def test_delta_copies_unchanged_lines():
+    ops = encode_delta('a\nb\nc\n', 'a\nb\nc\nd\n')
+    assert ops == [['c', 0, 3], ['i', 'd\n']]
+
+
+def test_revisions_are_stored_as_keyframes_and_deltas():
+    s3 = FakeS3()
+    history = history_on(s3, keyframe_interval=2)
+    texts = [PAGE + f'rev {i}\n' for i in range(4)]
+    for text in texts:
+        history.update(URL, '#main', text)
+    entries = history.list_revisions(URL, '#main')
+    assert [(e.revision, e.keyframe) for e in entries] == [(0, 0), (1, 0), (2, 2), (3, 2)]
+    fresh = history_on(s3)
+    assert [fresh.get_revision(URL, '#main', i) for i in range(4)] == texts
+    assert fresh.get(URL, '#main') == texts[-1]
+
+
+def test_index_is_loaded_once_per_check():
+    s3 = FakeS3()
+    history = history_on(s3)
+    history.update(URL, '#main', 'before')
+    s3.reads.clear()
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'after'}), history)
+    result = detector.detect_changes_many(URL, [SelectorCheck('#main', normalizer=Normalizer())])[0]
+    assert result.has_changed
+    assert len(index_reads(s3)) == 1
+    assert (result.version_previous, result.version_current) == ('0', '1')
+
+
+def test_update_uses_plain_puts():
+    s3 = FakeS3()
+    history = history_on(s3)
+    assert [history.update(URL, '#main', f'v{i}') for i in range(3)] == ['0', '1', '2']
+    assert history_on(s3).get(URL, '#main') == 'v2'
+    assert history_on(s3).get_revision(URL, '#main', 1) == 'v1'
+
+
+def test_legacy_revision_is_migrated_and_resolvable():
+    s3 = FakeS3()
+    legacy = WebsiteRevisionsOnS3(s3, logging.getLogger(__name__))
+    legacy._client = s3
+    legacy.update(URL, '#main', 'legacy text')
+    history = history_on(s3)
+    detector = WebsiteChangesDetector(FakePageFetcher({'#main': 'new text'}), history)
+    result = detector.detect_changes(URL, '#main', None)
+    assert result.revision_key == PREFIX
+    assert (result.version_previous, result.version_current) == ('0', '1')
+    assert history.read_revision(result.revision_key, result.version_previous) == 'legacy text'
+    assert history.read_revision(result.revision_key, result.version_current) == 'new text'
+    assert WebsiteRevisionsOnS3._object_key(URL, '#main') not in s3.objects_by_key
+
+
+def test_pruned_revisions_are_deleted_after_the_index_is_saved():
+    s3 = FakeS3()
+    history = history_on(s3, keyframe_interval=2, max_revisions=3)
+    for i in range(5):
+        history.update(URL, '#main', PAGE + f'rev {i}\n')
+    assert [e.revision for e in history.list_revisions(URL, '#main')] == [2, 3, 4]
+    assert f'{PREFIX}00000000.k' in s3.deleted and f'{PREFIX}00000001.d' in s3.deleted
@@ -0,0 +1,64 @@
+import json
+import logging
+import hashlib
+
+from HttpClient import HttpResponse
+from RSSEntryDetector import RSSEntriesManifestOnS3, RSSNewEntryDetector, FeedValidators, FeedHighWaterMark, \
+    _FeedManifest
+
+from .fakes import FakeS3, FakeHttpClient
+
+FEED_URL = 'http://example.com/feed.xml'
+LEGACY_PREFIX = hashlib.sha256(FEED_URL.encode()).hexdigest() + '/'
+
+
+def manifest_store(s3: FakeS3) -> RSSEntriesManifestOnS3:
+    store = RSSEntriesManifestOnS3(s3, logging.getLogger(__name__))
+    store._client = s3
+    return store
+
+
+def legacy_objects(s3: FakeS3, *entry_urls: str):
+    for u in entry_urls:
+        s3.put_object(Bucket=s3.name, Key=LEGACY_PREFIX + hashlib.sha256(u.encode()).hexdigest(), Body=b'')
+    s3.put_object(Bucket=s3.name, Key=LEGACY_PREFIX + 'validators',
+                  Body=json.dumps({'etag': '"v1"', 'modified': None}).encode())
+
+
+def test_encode_decode_roundtrip():
+    entries = {RSSEntriesManifestOnS3._entry_hash('http://example.com/a'): 1700000000}
+    manifest = _FeedManifest(entries, FeedValidators('"v1"', 'yesterday'), FeedHighWaterMark('guid', 1700000000))
+    decoded = RSSEntriesManifestOnS3._decode(RSSEntriesManifestOnS3._encode(manifest), '"etag"')
+    assert decoded.entries == entries
+    assert decoded.validators == FeedValidators('"v1"', 'yesterday')
+    assert decoded.high_water_mark == FeedHighWaterMark('guid', 1700000000)
+    assert decoded.exists and decoded.object_etag == '"etag"'
+
+
+def test_flush_merges_entries_written_concurrently():
+    s3 = FakeS3()
+    first, second = manifest_store(s3), manifest_store(s3)
+    first.check(FEED_URL, 'http://example.com/a')
+    first.flush(FEED_URL)
+    second.has_checked(FEED_URL)
+    first.check(FEED_URL, 'http://example.com/b')
+    first.flush(FEED_URL)
+    second.check(FEED_URL, 'http://example.com/c')
+    second.flush(FEED_URL)
+    assert manifest_store(s3).has_checked_many(
+        FEED_URL, ['http://example.com/a', 'http://example.com/b', 'http://example.com/c']) == [True, True, True]
+
+
+def test_migration_is_flushed_on_not_modified_and_legacy_objects_are_deleted():
+    s3 = FakeS3()
+    legacy_objects(s3, 'http://example.com/a', 'http://example.com/b')
+    client = FakeHttpClient({FEED_URL: HttpResponse(304, FEED_URL, {}, b'')})
+    detector = RSSNewEntryDetector(manifest_store(s3), client=client)
+    assert detector.detect_new_entries(FEED_URL) == []
+    assert client.requests[0][1] == {'If-None-Match': '"v1"'}
+    assert [k for k in s3.objects_by_key if k.startswith(LEGACY_PREFIX)] == []
+    assert len(s3.deleted) == 3
+
+    store = manifest_store(s3)
+    assert store.has_checked_many(FEED_URL, ['http://example.com/a', 'http://example.com/b']) == [True, True]
+    assert store.get_validators(FEED_URL) == FeedValidators('"v1"')
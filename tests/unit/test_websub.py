@@ -0,0 +1,115 @@
+import time
+import logging
+import dataclasses
+
+import pytest
+
+from LocalStorage import SQLiteStore, WebSubSubscriptionsOnSQLite
+from WebMonitorConfig import WebMonitorConfig
+from WebSub import WebSubSubscriber, WebSubSubscriptionsOnS3, WebSubLinks, sign, verify_signature, verify_intent, \
+    subscription_id, STATE_PENDING, STATE_ACTIVE, STATE_DENIED, PENDING_TIMEOUT_SECONDS
+from WebSubCallback import WebSubCallbackConfig, CallbackRequest, handle
+
+from .fakes import FakeS3, FakeSNS, FakeHttpClient
+
+logger = logging.getLogger(__name__)
+FEED_URL = 'http://example.com/feed.xml'
+LINKS = WebSubLinks('http://hub.example.com/', FEED_URL)
+
+
+@pytest.fixture
+def subscriptions() -> WebSubSubscriptionsOnS3:
+    s3 = FakeS3()
+    subscriptions = WebSubSubscriptionsOnS3(s3, logger)
+    subscriptions._client = s3
+    return subscriptions
+
+
+def subscribe(subscriptions, lease_seconds: int = 3600):
+    client = FakeHttpClient()
+    subscriber = WebSubSubscriber(subscriptions, 'http://callback.example.com/websub/', logger, lease_seconds, client)
+    return subscriber.ensure_subscribed(FEED_URL, LINKS), client
+
+
+def test_signature_is_checked_with_the_given_algorithm():
+    body = b'<feed/>'
+    assert verify_signature('secret', sign('secret', body), body)
+    assert verify_signature('secret', sign('secret', body, 'sha1'), body)
+    assert not verify_signature('other', sign('secret', body), body)
+    assert not verify_signature('secret', sign('secret', body), body + b' ')
+    assert not verify_signature('secret', 'md5=' + sign('secret', body).split('=')[1], body)
+    assert not verify_signature('secret', None, body)
+
+
+def test_callback_url_carries_a_random_token(subscriptions):
+    subscription, client = subscribe(subscriptions)
+    callback = client.posts[0][1]['hub.callback']
+    assert callback == f'http://callback.example.com/websub/{subscription.token}'
+    assert subscription_id(FEED_URL) not in callback
+    assert subscriptions.get_by_token(subscription.token) == subscription
+    assert subscriptions.get_by_token(subscription_id(FEED_URL)) is None
+
+
+def test_pending_subscription_is_verified_once(subscriptions):
+    subscription, _ = subscribe(subscriptions)
+    assert not verify_intent(subscriptions, 'guessed', 'subscribe', FEED_URL, '3600')
+    assert not verify_intent(subscriptions, subscription.token, 'subscribe', 'http://other/', '3600')
+    assert verify_intent(subscriptions, subscription.token, 'subscribe', FEED_URL, '3600')
+    assert subscriptions.get(FEED_URL).state == STATE_ACTIVE
+    assert not verify_intent(subscriptions, subscription.token, 'subscribe', FEED_URL, '3600')
+    assert not verify_intent(subscriptions, subscription.token, 'denied', FEED_URL, None)
+    assert subscriptions.get(FEED_URL).state == STATE_ACTIVE
+
+
+def test_stale_verification_is_rejected(subscriptions):
+    subscription, _ = subscribe(subscriptions)
+    subscriptions.put(dataclasses.replace(subscription, requested_at=int(time.time()) - PENDING_TIMEOUT_SECONDS - 1))
+    assert not verify_intent(subscriptions, subscription.token, 'subscribe', FEED_URL, '3600')
+    assert verify_intent(subscriptions, subscription.token, 'denied', FEED_URL, None)
+    assert subscriptions.get(FEED_URL).state == STATE_DENIED
+
+
+def test_lease_is_clamped_to_the_requested_lease(subscriptions):
+    subscription, _ = subscribe(subscriptions, lease_seconds=3600)
+    assert verify_intent(subscriptions, subscription.token, 'subscribe', FEED_URL, str(365 * 24 * 3600))
+    active = subscriptions.get(FEED_URL)
+    assert active.lease_expires_at - active.verified_at == 3600
+
+
+def test_renewal_keeps_the_callback_and_awaits_verification(subscriptions):
+    subscription, _ = subscribe(subscriptions)
+    verify_intent(subscriptions, subscription.token, 'subscribe', FEED_URL, '3600')
+    subscriptions.put(dataclasses.replace(subscriptions.get(FEED_URL), requested_at=0, lease_expires_at=1))
+    renewed, client = subscribe(subscriptions)
+    assert (renewed.state, renewed.token, renewed.secret) == (STATE_PENDING, subscription.token, subscription.secret)
+    assert client.posts[0][1]['hub.callback'].endswith(subscription.token)
+
+
+def test_legacy_subscription_without_token_is_replaced(subscriptions):
+    now = int(time.time())
+    legacy = WebSubSubscriptionsOnS3._object_key(subscription_id(FEED_URL))
+    subscriptions._client.put_object(Bucket='bucket', Key=legacy, Body=(
+        '{"feed_url": "%s", "topic": "%s", "hub": "%s", "secret": "s", "state": "active", "requested_at": 0, '
+        '"lease_expires_at": %d, "verified_at": 0}' % (FEED_URL, FEED_URL, LINKS.hub, now + 30 * 24 * 3600)
+    ).encode())
+    subscription, client = subscribe(subscriptions)
+    assert subscription.token and subscription.state == STATE_PENDING
+    assert len(client.posts) == 1
+
+
+def test_callback_distributes_only_for_known_tokens(tmp_path):
+    subscriptions = WebSubSubscriptionsOnSQLite(SQLiteStore(str(tmp_path / 'web-monitor.sqlite3')))
+    subscription, _ = subscribe(subscriptions)
+    monitor_config = WebMonitorConfig({'websub': {'enabled': True}, 'rss_targets': [
+        {'url': FEED_URL, 'selector': 'body', 'websub': True}]}, 'v1')
+    sns = FakeSNS()
+    config = WebSubCallbackConfig(sns, 'rss', subscriptions, logger)
+    body = b'<rss/>'
+
+    def post(token: str, signature: str) -> int:
+        request = CallbackRequest('POST', token, {}, {'x-hub-signature': signature}, body)
+        return handle(request, monitor_config, config).status
+
+    assert post(subscription_id(FEED_URL), sign(subscription.secret, body)) == 410
+    assert post(subscription.token, sign('forged', body)) == 202 and not sns.published
+    assert post(subscription.token, sign(subscription.secret, body)) == 202 and len(sns.published) == 1